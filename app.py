@@ -1,15 +1,36 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, Response
 import sqlite3
-import pandas as pd
+import time
 from datetime import datetime, timedelta
-import json
 import os
-from reddit_scraper import RedditScraper
-from favorites_api import favorites_api
+import metrics
+import queries
+from favorites_api import favorites_api, favorite_ids
 
 app = Flask(__name__)
 app.register_blueprint(favorites_api)
 
+REQUEST_DURATION = metrics.histogram(
+    'http_request_duration_seconds', 'Flask 路由处理耗时（秒）', ('method', 'route', 'status'))
+REQUESTS_TOTAL = metrics.counter(
+    'http_requests_total', 'Flask 请求数', ('method', 'route', 'status'))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """为所有路由（包括蓝图）记录耗时和请求数"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        # 使用路由模板而不是实际路径，避免 /post/<id> 产生大量标签
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = {'method': request.method, 'route': route, 'status': str(response.status_code)}
+        REQUEST_DURATION.observe(time.perf_counter() - start, **labels)
+        REQUESTS_TOTAL.inc(**labels)
+    return response
+
 # 数据库配置
 DB_PATH = "reddit_data/reddit_data.db"
 
@@ -64,60 +85,16 @@ def posts():
     try:
         conn = get_db_connection()
         
-        # 分页参数
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        # 筛选参数
-        subreddit = request.args.get('subreddit', '')
-        search_pattern = request.args.get('search_pattern', '')
-        min_score = request.args.get('min_score', 0, type=int)
-        sort = request.args.get('sort', 'extracted_at_desc')
-        
-        # 构建查询
-        query = 'SELECT * FROM posts WHERE 1=1'
-        params = []
+        # 分页和筛选参数
+        page, per_page = queries.parse_pagination(request.args)
+        filters = queries.parse_post_filters(request.args)
         
-        if subreddit:
-            query += ' AND subreddit = ?'
-            params.append(subreddit)
-        
-        if search_pattern:
-            query += ' AND search_pattern = ?'
-            params.append(search_pattern)
-        
-        if min_score > 0:
-            query += ' AND score >= ?'
-            params.append(min_score)
-        
-        # 排序映射
-        sort_mapping = {
-            'extracted_at_desc': 'extracted_at DESC',
-            'extracted_at_asc': 'extracted_at ASC',
-            'created_utc_desc': 'created_utc DESC',
-            'created_utc_asc': 'created_utc ASC',
-            'score_desc': 'score DESC',
-            'score_asc': 'score ASC'
-        }
-
-        # 排序和分页
-        sort_clause = sort_mapping.get(sort, 'extracted_at DESC')
-        query += f' ORDER BY {sort_clause} LIMIT ? OFFSET ?'
-        params.extend([per_page, (page - 1) * per_page])
-        
-        posts = conn.execute(query, params).fetchall()
+        posts, total_count = queries.list_posts(conn, filters, page, per_page, with_favorites=True)
         
         # 获取筛选选项
-        subreddits = conn.execute('SELECT DISTINCT subreddit FROM posts ORDER BY subreddit').fetchall()
-        patterns = conn.execute('SELECT DISTINCT search_pattern FROM posts ORDER BY search_pattern').fetchall()
-        
-        # 获取总数用于分页
-        count_query = query.replace('SELECT *', 'SELECT COUNT(*)').split(' ORDER BY')[0]
-        total_count = conn.execute(count_query, params[:-2]).fetchone()[0]
+        subreddits, patterns = queries.filter_options(conn)
         
         conn.close()
-
-        # print("debug", posts)
         
         return render_template('posts.html', 
                              posts=posts, 
@@ -126,12 +103,7 @@ def posts():
                              page=page,
                              per_page=per_page,
                              total_count=total_count,
-                             current_filters={
-                                 'subreddit': subreddit,
-                                 'search_pattern': search_pattern,
-                                 'min_score': min_score,
-                                 'sort': sort
-                             })
+                             current_filters=filters)
     
     except Exception as e:
         import traceback
@@ -144,23 +116,14 @@ def post_detail(post_id):
     try:
         conn = get_db_connection()
         
-        # 获取帖子详情
-        post = conn.execute('SELECT * FROM posts WHERE id = ?', (post_id,)).fetchone()
+        # 获取帖子详情和评论，收藏状态来自内存中的收藏 id 集合
+        post, comments, is_favorited = queries.get_post_detail(conn, post_id, favorite_ids)
+        
+        conn.close()
         
         if not post:
             return "帖子未找到", 404
         
-        # 获取评论
-        comments = conn.execute(
-            'SELECT * FROM comments WHERE post_id = ? ORDER BY score DESC',
-            (post_id,)
-        ).fetchall()
-        
-        # 检查帖子是否已收藏
-        is_favorited = conn.execute('SELECT post_id FROM favorites WHERE post_id = ?', (post_id,)).fetchone() is not None
-        
-        conn.close()
-        
         return render_template('post_detail.html', post=post, comments=comments, is_favorited=is_favorited)
     
     except Exception as e:
@@ -185,7 +148,7 @@ def favorites():
         '''
         params = [per_page, (page - 1) * per_page]
         
-        posts = conn.execute(query, params).fetchall()
+        posts = queries.restore_archived_text(conn, conn.execute(query, params).fetchall(), 'post')
         
         # 获取总数用于分页
         total_count = conn.execute('SELECT COUNT(*) FROM favorites').fetchone()[0]
@@ -209,54 +172,11 @@ def analytics():
     try:
         conn = get_db_connection()
         
-        # 按子版块统计
-        subreddit_stats = conn.execute('''
-            SELECT subreddit, 
-                   COUNT(*) as post_count,
-                   AVG(score) as avg_score,
-                   SUM(num_comments) as total_comments
-            FROM posts 
-            GROUP BY subreddit 
-            ORDER BY post_count DESC
-        ''').fetchall()
-        
-        # 按搜索模式统计
-        pattern_stats = conn.execute('''
-            SELECT search_pattern,
-                   COUNT(*) as post_count,
-                   AVG(score) as avg_score,
-                   AVG(num_comments) as avg_comments
-            FROM posts 
-            GROUP BY search_pattern 
-            ORDER BY post_count DESC
-        ''').fetchall()
-        
-        # 时间趋势分析
-        time_stats = conn.execute('''
-            SELECT DATE(created_utc) as date,
-                   COUNT(*) as post_count,
-                   AVG(score) as avg_score
-            FROM posts 
-            WHERE created_utc >= datetime('now', '-30 days')
-            GROUP BY DATE(created_utc)
-            ORDER BY date
-        ''').fetchall()
-        
-        # 高质量帖子（分数>=10且评论>=5）
-        high_quality_posts = conn.execute('''
-            SELECT * FROM posts 
-            WHERE score >= 10 AND num_comments >= 5 
-            ORDER BY score DESC 
-            LIMIT 10
-        ''').fetchall()
+        stats = queries.analytics_stats(conn)
         
         conn.close()
         
-        return render_template('analytics.html',
-                             subreddit_stats=subreddit_stats,
-                             pattern_stats=pattern_stats,
-                             time_stats=time_stats,
-                             high_quality_posts=high_quality_posts)
+        return render_template('analytics.html', **stats)
     
     except Exception as e:
         return f"数据库错误: {e}"
@@ -265,41 +185,93 @@ def analytics():
 def api_search():
     """搜索API"""
     try:
-        conn = get_db_connection()
-        
         keyword = request.args.get('q', '')
         limit = request.args.get('limit', 50, type=int)
         
         if not keyword:
             return jsonify([])
         
-        posts = conn.execute('''
-            SELECT * FROM posts 
-            WHERE title LIKE ? OR content LIKE ?
-            ORDER BY score DESC 
-            LIMIT ?
-        ''', (f'%{keyword}%', f'%{keyword}%', limit)).fetchall()
-        
+        conn = get_db_connection()
+        result = queries.search_posts(conn, keyword, limit)
         conn.close()
         
-        # 转换为JSON格式
-        result = []
-        for post in posts:
-            result.append({
-                'id': post['id'],
-                'title': post['title'],
-                'content': post['content'][:200] + '...' if len(post['content']) > 200 else post['content'],
-                'score': post['score'],
-                'num_comments': post['num_comments'],
-                'subreddit': post['subreddit'],
-                'url': post['url']
-            })
-        
         return jsonify(result)
     
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/export')
+def api_export():
+    """按 /posts 的筛选条件流式导出帖子（format=ndjson/csv/parquet，comments=1 时包含评论）"""
+    import export
+
+    fmt = request.args.get('format', 'ndjson')
+    filters = queries.parse_post_filters(request.args)
+    with_comments = request.args.get('comments', '0') in ('1', 'true')
+    limit = request.args.get('limit', None, type=int)
+    chunk_size = request.args.get('chunk_size', 1000, type=int)
+
+    try:
+        body = export.stream_export(DB_PATH, fmt, filters, with_comments, limit, chunk_size)
+    except (ValueError, ImportError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 不设置 Content-Length，响应以分块传输的方式边查询边发送
+    mimetype, extension = export.FORMATS[fmt]
+    filename = f"reddit_posts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return Response(body, content_type=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+def _make_scraper():
+    """按环境变量创建爬虫，缺少 Reddit API 配置时返回 None"""
+    from reddit_scraper import RedditScraper
+
+    # 获取Reddit API配置
+    client_id = os.getenv("CLIENT_ID")
+    client_secret = os.getenv("CLIENT_SECRET")
+    proxy_url = os.getenv("PROXY_URL")
+
+    if not client_id or not client_secret:
+        return None
+
+    return RedditScraper(
+        client_id=client_id,
+        client_secret=client_secret,
+        user_agent="SaaSOpportunityFinder/1.0",
+        proxy_url=proxy_url,
+        cache_path=os.getenv("REDDIT_CACHE"),
+        cache_mode=os.getenv("REDDIT_CACHE_MODE") or 'read-write'
+    )
+
+def _missing_config():
+    return jsonify({
+        'success': False,
+        'error': '缺少Reddit API配置，请检查环境变量CLIENT_ID和CLIENT_SECRET'
+    })
+
+def _run_scrape_job(scraper, store, run_id, params, profile=False):
+    """执行（或恢复）一次已创建/已认领的爬取，返回 JSON 响应"""
+    from reddit_scraper import run_crawl
+
+    result = run_crawl(scraper, store, run_id, params, profile=profile)
+    posts = result['posts']
+
+    if posts:
+        files = [result['posts_file'], result['json_file'], result['metrics_file']]
+        return jsonify({
+            'success': True,
+            'run_id': run_id,
+            'posts_count': len(posts),
+            'comments_count': len(result['comments']),
+            'files': [f for f in files if f] + result['profile_files']
+        })
+    else:
+        return jsonify({
+            'success': False,
+            'run_id': run_id,
+            'error': '未找到匹配的帖子，请尝试调整搜索条件'
+        })
+
 @app.route('/scrape', methods=['GET', 'POST'])
 def scrape():
     """爬取数据页面"""
@@ -308,12 +280,19 @@ def scrape():
 
     if request.method == 'POST':
         try:
+            # 爬虫依赖（praw / pandas / dotenv）只在首次爬取时加载
+            from dotenv import load_dotenv
+            from checkpoints import CheckpointStore
+            from reddit_scraper import crawl_params
+            load_dotenv()
+
             # 获取表单数据
             subreddits = request.form.getlist('subreddits')
             patterns = request.form.getlist('patterns')
             limit = int(request.form.get('limit', 50))
             time_filter = request.form.get('time_filter', 'month')
             get_comments = request.form.get('get_comments', 'false') == 'true'
+            profile = request.form.get('profile', 'false') == 'true'
 
             # 验证参数
             if not subreddits:
@@ -322,60 +301,23 @@ def scrape():
             if not patterns:
                 return jsonify({'success': False, 'error': '请至少选择一个搜索关键词'})
 
-            # 获取Reddit API配置
-            client_id = os.getenv("CLIENT_ID")
-            client_secret = os.getenv("CLIENT_SECRET")
-            proxy_url = os.getenv("PROXY_URL")
-
-            if not client_id or not client_secret:
-                return jsonify({
-                    'success': False,
-                    'error': '缺少Reddit API配置，请检查环境变量CLIENT_ID和CLIENT_SECRET'
-                })
-
-            # 初始化爬虫
-            scraper = RedditScraper(
-                client_id=client_id,
-                client_secret=client_secret,
-                user_agent="SaaSOpportunityFinder/1.0",
-                proxy_url=proxy_url
-            )
-
-            # 临时修改搜索模式，只使用用户选择的
-            original_patterns = scraper.search_patterns
-            scraper.search_patterns = patterns
-
-            # 开始爬取
-            posts = scraper.search_posts(
-                subreddit_names=subreddits,
-                limit=limit,
-                time_filter=time_filter
-            )
-
-            comments = []
-            if get_comments and posts:
-                # 获取前20个帖子的评论
-                post_ids = [post['id'] for post in posts[:20]]
-                comments = scraper.get_comments(post_ids, max_comments=30)
-
-            # 恢复原始搜索模式
-            scraper.search_patterns = original_patterns
-
-            # 保存数据
-            if posts:
-                posts_file, json_file = scraper.save_to_files(posts, comments)
-
-                return jsonify({
-                    'success': True,
-                    'posts_count': len(posts),
-                    'comments_count': len(comments),
-                    'files': [posts_file, json_file] if json_file else [posts_file]
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': '未找到匹配的帖子，请尝试调整搜索条件'
-                })
+            # 先检查配置并初始化爬虫，失败时不会留下 running 状态的爬取记录
+            scraper = _make_scraper()
+            if scraper is None:
+                return _missing_config()
+
+            # 创建爬取记录，中断后可通过 /scrape/<run_id>/resume 继续
+            store = CheckpointStore("reddit_data")
+            params = crawl_params({
+                'subreddits': subreddits,
+                'patterns': patterns,
+                'limit': limit,
+                'time_filter': time_filter,
+                'get_comments': get_comments,
+            })
+            run_id = store.create_run(params)
+
+            return _run_scrape_job(scraper, store, run_id, params, profile)
 
         except Exception as e:
             import traceback
@@ -385,5 +327,57 @@ def scrape():
                 'error': f'爬取过程中发生错误: {str(e)}'
             })
 
+@app.route('/scrape/<run_id>/resume', methods=['POST'])
+def resume_scrape(run_id):
+    """从检查点恢复中断的爬取任务（force=true 时不检查爬取是否仍在运行）"""
+    try:
+        from dotenv import load_dotenv
+        from checkpoints import CheckpointStore
+        load_dotenv()
+
+        store = CheckpointStore("reddit_data")
+        run = store.get_run(run_id)
+        if run is None:
+            return jsonify({'success': False, 'error': '爬取记录不存在'}), 404
+
+        scraper = _make_scraper()
+        if scraper is None:
+            return _missing_config()
+
+        # 同一爬取可能正由其他请求或进程（如命令行 --resume）执行
+        force = request.form.get('force', 'false') == 'true'
+        if not store.claim_run(run_id, force=force):
+            return jsonify({
+                'success': False,
+                'run_id': run_id,
+                'error': '该爬取任务正在运行，不能恢复'
+            }), 409
+
+        profile = request.form.get('profile', 'false') == 'true'
+        return _run_scrape_job(scraper, store, run_id, run['params'], profile)
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'run_id': run_id,
+            'error': f'爬取过程中发生错误: {str(e)}'
+        })
+
+@app.route('/scrape/runs')
+def scrape_runs():
+    """最近的爬取记录及进度"""
+    from checkpoints import CheckpointStore
+
+    store = CheckpointStore("reddit_data", read_only=True)
+    return jsonify(store.list_runs(request.args.get('limit', 20, type=int)))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 指标"""
+    return Response(metrics.REGISTRY.render_prometheus(),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
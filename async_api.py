@@ -0,0 +1,235 @@
+"""异步 JSON 读取 API（ASGI）
+
+为只读的 JSON 接口提供一个 ASGI 应用，可以用 uvicorn 等 ASGI 服务器运行：
+
+  - GET /api/posts            帖子列表（筛选/排序/分页参数与 /posts 页面相同）
+  - GET /api/post/<id>        帖子详情、评论和收藏状态
+  - GET /api/analytics        /analytics 页面的统计数据
+  - GET /api/search?q=        与 Flask 的 /api/search 相同
+  - GET /metrics              Prometheus 指标（本进程的 asgi_* 等指标）
+
+sqlite3 没有异步接口，查询交给一个固定大小的线程池执行，
+每个线程持有一个只读连接（mode=ro），事件循环本身不会被数据库调用阻塞，
+多个读取可以并发进行。查询逻辑与 Flask 页面共用 queries.py。
+
+用法:
+    uvicorn async_api:app --host 0.0.0.0 --port 8001
+    python async_api.py --port 8001 --pool-size 16
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qsl
+
+import metrics
+import queries
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "reddit_data/reddit_data.db"
+PROMETHEUS_CONTENT_TYPE = b'text/plain; version=0.0.4; charset=utf-8'
+
+ASYNC_REQUEST_DURATION = metrics.histogram(
+    'asgi_request_duration_seconds', '异步 API 路由处理耗时（秒）', ('method', 'route', 'status'))
+ASYNC_REQUESTS_TOTAL = metrics.counter(
+    'asgi_requests_total', '异步 API 请求数', ('method', 'route', 'status'))
+
+
+class ReadPool:
+    """只读 SQLite 连接池：固定数量的线程，每个线程一个连接"""
+
+    def __init__(self, db_file, size=8):
+        self.db_file = db_file
+        self.size = size
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='sqlite-read')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            uri = f"file:{os.path.abspath(self.db_file)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, func, args):
+        return func(self._conn(), *args)
+
+    async def run(self, func, *args):
+        """在线程池中执行 func(conn, *args)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._call, func, args))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+def _rows(rows):
+    return [dict(row) for row in rows]
+
+
+class ReadAPI:
+    """
+    只读 JSON API 的 ASGI 应用
+
+    Args:
+        db_file: SQLite 数据库路径
+        pool_size: 读取线程数（同时进行的查询数）
+    """
+
+    def __init__(self, db_file=DB_PATH, pool_size=8):
+        self.db_file = db_file
+        self.pool_size = pool_size
+        self.pool = None
+        # (方法, 路径正则, 路由模板, 处理函数)
+        self.routes = [
+            ('GET', re.compile(r'^/api/posts/?$'), '/api/posts', self.list_posts),
+            ('GET', re.compile(r'^/api/post/([^/]+)/?$'), '/api/post/<post_id>', self.post_detail),
+            ('GET', re.compile(r'^/api/analytics/?$'), '/api/analytics', self.analytics),
+            ('GET', re.compile(r'^/api/search/?$'), '/api/search', self.search),
+            ('GET', re.compile(r'^/metrics/?$'), '/metrics', self.metrics),
+        ]
+
+    def startup(self):
+        if self.pool is None:
+            self.pool = ReadPool(self.db_file, self.pool_size)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    async def list_posts(self, args):
+        page, per_page = queries.parse_pagination(args)
+        filters = queries.parse_post_filters(args)
+        posts, total_count = await self.pool.run(queries.list_posts, filters, page, per_page, True)
+        return 200, {
+            'posts': _rows(posts),
+            'page': page,
+            'per_page': per_page,
+            'total_count': total_count,
+            'filters': filters,
+        }
+
+    async def post_detail(self, args, post_id):
+        post, comments, is_favorited = await self.pool.run(queries.get_post_detail, post_id)
+        if not post:
+            return 404, {'error': '帖子未找到'}
+        return 200, {'post': dict(post), 'comments': _rows(comments), 'is_favorited': is_favorited}
+
+    async def analytics(self, args):
+        stats = await self.pool.run(queries.analytics_stats)
+        return 200, {name: _rows(rows) for name, rows in stats.items()}
+
+    async def search(self, args):
+        keyword = args.get('q', '')
+        if not keyword:
+            return 200, []
+        limit = queries.int_arg(args, 'limit', 50)
+        return 200, await self.pool.run(queries.search_posts, keyword, limit)
+
+    async def metrics(self, args):
+        # 返回字符串时按纯文本响应
+        return 200, metrics.REGISTRY.render_prometheus()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        # 不支持 lifespan 的服务器在第一次请求时初始化连接池
+        self.startup()
+        start = time.perf_counter()
+        method = scope['method']
+        route = 'unmatched'
+        status, payload = 404, {'error': '接口不存在'}
+
+        for route_method, pattern, template, handler in self.routes:
+            match = pattern.match(scope['path'])
+            if not match:
+                continue
+            route = template
+            if method != route_method:
+                status, payload = 405, {'error': '不支持的请求方法'}
+                break
+            args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+            try:
+                status, payload = await handler(args, *match.groups())
+            except Exception as e:
+                logger.exception(f"{method} {scope['path']} 出错")
+                status, payload = 500, {'error': str(e)}
+            break
+
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), PROMETHEUS_CONTENT_TYPE
+        else:
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            content_type = b'application/json; charset=utf-8'
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', content_type),
+                (b'content-length', str(len(body)).encode('ascii')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+        labels = {'method': method, 'route': route, 'status': str(status)}
+        ASYNC_REQUEST_DURATION.observe(time.perf_counter() - start, **labels)
+        ASYNC_REQUESTS_TOTAL.inc(**labels)
+
+
+app = ReadAPI(os.getenv("REDDIT_DB", DB_PATH), int(os.getenv("READ_POOL_SIZE", 8)))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='异步 JSON 读取 API')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--pool-size', type=int, default=8, help='读取线程数')
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("需要安装 uvicorn: uv pip install 'crawl[asgi]'")
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(ReadAPI(args.db, args.pool_size), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""本地模拟 Reddit API 服务器
+
+实现 praw 爬取时用到的三个接口：
+  - POST /api/v1/access_token        OAuth（client_credentials）
+  - GET  /r/<sub>/search             子版块搜索（分页）
+  - GET  /comments/<id>/             帖子及评论
+
+支持配置每个请求的延迟以及 X-Ratelimit-* 响应头，
+praw 客户端通过 oauth_url / reddit_url 指向该服务器即可。
+
+用法:
+    with MockRedditServer(SyntheticCorpus(), latency=0.05) as server:
+        scraper = RedditScraper('id', 'secret', 'bench/1.0', **server.praw_kwargs())
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.synthetic import SyntheticCorpus
+
+SEARCH_RE = re.compile(r'^/r/([^/]+)/search/?$')
+COMMENTS_RE = re.compile(r'^/comments/([^/]+)/?')
+
+
+def _listing(children, after=None):
+    return {
+        'kind': 'Listing',
+        'data': {
+            'after': after,
+            'before': None,
+            'dist': len(children),
+            'children': children,
+        },
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        server = self.server.mock
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        remaining, used, reset = server.ratelimit_headers()
+        self.send_header('X-Ratelimit-Remaining', str(remaining))
+        self.send_header('X-Ratelimit-Used', str(used))
+        self.send_header('X-Ratelimit-Reset', str(reset))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method):
+        server = self.server.mock
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+
+        endpoint = 'other'
+        if url.path.rstrip('/') == '/api/v1/access_token':
+            endpoint = 'token'
+        elif SEARCH_RE.match(url.path):
+            endpoint = 'search'
+        elif COMMENTS_RE.match(url.path):
+            endpoint = 'comments'
+        server.record(endpoint)
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if endpoint == 'token':
+            return self._send_json({
+                'access_token': 'mock-token',
+                'token_type': 'bearer',
+                'expires_in': 86400,
+                'scope': '*',
+            })
+
+        if endpoint == 'search':
+            subreddit = SEARCH_RE.match(url.path).group(1)
+            limit = int(params.get('limit', 25))
+            posts, after = server.corpus.search(subreddit, params.get('q', ''), limit, params.get('after'))
+            return self._send_json(_listing([{'kind': 't3', 'data': p} for p in posts], after))
+
+        if endpoint == 'comments':
+            post_id = COMMENTS_RE.match(url.path).group(1)
+            submission = server.corpus.submission('mock', post_id, 0)
+            submission.update(id=post_id, name=f"t3_{post_id}")
+            comments = [{'kind': 't1', 'data': c} for c in server.corpus.comments(post_id)]
+            return self._send_json([
+                _listing([{'kind': 't3', 'data': submission}]),
+                _listing(comments),
+            ])
+
+        return self._send_json({'error': 404, 'message': 'Not Found'}, status=404)
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+
+class MockRedditServer:
+    """在后台线程中运行的模拟 Reddit 服务器
+
+    Args:
+        corpus: SyntheticCorpus 实例
+        latency: 每个请求的额外延迟（秒）
+        ratelimit_remaining: 每个限流窗口允许的请求数
+        ratelimit_window: 限流窗口长度（秒）
+        host / port: 监听地址，port=0 表示随机端口
+    """
+
+    def __init__(self, corpus=None, latency=0.0, ratelimit_remaining=1000,
+                 ratelimit_window=600, host='127.0.0.1', port=0):
+        self.corpus = corpus or SyntheticCorpus()
+        self.latency = latency
+        self.ratelimit_remaining = ratelimit_remaining
+        self.ratelimit_window = ratelimit_window
+        self.host = host
+        self.port = port
+        self.requests = {}
+        self._used = 0
+        self._window_start = time.time()
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    def record(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            now = time.time()
+            if now - self._window_start >= self.ratelimit_window:
+                self._window_start = now
+                self._used = 0
+            self._used += 1
+
+    def ratelimit_headers(self):
+        with self._lock:
+            remaining = max(self.ratelimit_remaining - self._used, 0)
+            reset = max(int(self.ratelimit_window - (time.time() - self._window_start)), 0)
+            return float(remaining), self._used, reset
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def praw_kwargs(self):
+        """将 praw 指向本服务器所需的配置"""
+        return {
+            'oauth_url': self.url,
+            'reddit_url': self.url,
+            'short_url': self.url,
+            'check_for_updates': False,
+            'check_for_async': False,
+        }
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地模拟 Reddit API 服务器')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--ratelimit', type=int, default=1000, help='每个窗口允许的请求数')
+    args = parser.parse_args()
+
+    server = MockRedditServer(latency=args.latency, ratelimit_remaining=args.ratelimit, port=args.port)
+    server.start()
+    print(f"模拟 Reddit 服务器已启动: {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
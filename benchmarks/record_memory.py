@@ -0,0 +1,122 @@
+"""帖子记录内存基准测试
+
+对比旧的「每条记录一个 dict + 两个 datetime」与 PostRecord 的内存占用。
+
+用法:
+    python -m benchmarks.record_memory --count 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from records import PostRecord
+
+SUBREDDITS = ['entrepreneur', 'startups', 'SaaS', 'productivity', 'smallbusiness']
+PATTERNS = ['is there a tool', 'looking for a tool', 'pain point', 'struggling with']
+
+
+def _fake_fields(i, rng):
+    """生成一条合成帖子的原始字段"""
+    post_id = f"p{i:07x}"
+    subreddit = SUBREDDITS[i % len(SUBREDDITS)]
+    return (
+        post_id,
+        f"Is there a tool for thing number {i}?",
+        '',  # 正文通常较长且与记录结构无关，这里只衡量记录本身的开销
+        rng.randint(0, 500),
+        rng.randint(0, 200),
+        1700000000.0 + i,
+        f"user{i % 5000}",
+        subreddit,
+        f"https://reddit.com/r/{subreddit}/comments/{post_id}/",
+        PATTERNS[i % len(PATTERNS)],
+        round(rng.random(), 2),
+        True,
+        f"self.{subreddit}",
+    )
+
+
+def build_dicts(count, seed=0):
+    """旧实现：每条记录一个 dict，每条记录调用一次 datetime.now()"""
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        f = _fake_fields(i, rng)
+        posts.append({
+            'id': f[0],
+            'title': f[1],
+            'content': f[2],
+            'score': f[3],
+            'num_comments': f[4],
+            'created_utc': datetime.fromtimestamp(f[5]),
+            'author': f[6],
+            'subreddit': f[7],
+            'url': f[8],
+            'search_pattern': f[9],
+            'upvote_ratio': f[10],
+            'is_self': f[11],
+            'domain': f[12],
+            'extracted_at': datetime.now(),
+        })
+    return posts
+
+
+def build_records(count, seed=0):
+    """新实现：PostRecord + 批次共享的 extracted_at"""
+    rng = random.Random(seed)
+    extracted_at = datetime.now()
+    return [PostRecord(*_fake_fields(i, rng), extracted_at) for i in range(count)]
+
+
+def measure(builder, count):
+    """返回 (每条记录字节数, 构建耗时秒)
+
+    合成数据中的字符串在两种实现中完全相同，因此差值反映的是记录结构本身的开销。
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = builder(count)
+    elapsed = time.perf_counter() - start
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    gc.collect()
+    return current / count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='帖子记录内存基准测试')
+    parser.add_argument('--count', type=int, default=1_000_000, help='合成帖子数量')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    dict_bytes, dict_time = measure(build_dicts, args.count)
+    record_bytes, record_time = measure(build_records, args.count)
+
+    result = {
+        'count': args.count,
+        'dict_bytes_per_record': round(dict_bytes, 1),
+        'record_bytes_per_record': round(record_bytes, 1),
+        'saved_ratio': round(1 - record_bytes / dict_bytes, 3),
+        'dict_build_seconds': round(dict_time, 3),
+        'record_build_seconds': round(record_time, 3),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"记录数: {args.count}")
+        print(f"dict 实现:       {dict_bytes:8.1f} 字节/条, 构建 {dict_time:.2f}s")
+        print(f"PostRecord 实现: {record_bytes:8.1f} 字节/条, 构建 {record_time:.2f}s")
+        print(f"节省: {result['saved_ratio'] * 100:.1f}%")
+
+    return result
+
+
+if __name__ == '__main__':
+    main()
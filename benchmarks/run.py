@@ -0,0 +1,422 @@
+"""基准测试套件
+
+所有测试都只使用本地的模拟 Reddit 服务器和合成数据，不访问真实的 Reddit。
+结果写入 benchmarks/results/<时间戳>.json，可用 --compare 与之前的结果比较。
+
+用法:
+    python -m benchmarks.run                          # 运行全部
+    python -m benchmarks.run search_posts flask_routes
+    python -m benchmarks.run --latency 0.05 --compare benchmarks/results/20250101_120000.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.mock_reddit import MockRedditServer
+from benchmarks.synthetic import SyntheticCorpus, SUBREDDITS, PATTERNS, write_json_files, build_database
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """注册基准测试"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _make_scraper(server):
+    from reddit_scraper import RedditScraper
+
+    scraper = RedditScraper('bench-id', 'bench-secret', 'RedditInsightsBench/1.0', **server.praw_kwargs())
+    scraper.search_delay = 0
+    scraper.comment_delay = 0
+    return scraper
+
+
+@benchmark('search_posts')
+def bench_search_posts(args, corpus):
+    subreddits = SUBREDDITS[:args.subreddits]
+    with MockRedditServer(corpus, latency=args.latency) as server:
+        scraper = _make_scraper(server)
+        scraper.search_patterns = PATTERNS[:args.patterns]
+        start = time.perf_counter()
+        posts = scraper.search_posts(subreddits, limit=args.limit, time_filter='month')
+        elapsed = time.perf_counter() - start
+        requests = dict(server.requests)
+
+    return {
+        'seconds': elapsed,
+        'posts': len(posts),
+        'posts_per_second': len(posts) / elapsed if elapsed else 0.0,
+        'requests': requests,
+    }
+
+
+@benchmark('get_comments')
+def bench_get_comments(args, corpus):
+    post_ids = [r.id for r in corpus.post_records(args.comment_posts)]
+    with MockRedditServer(corpus, latency=args.latency) as server:
+        scraper = _make_scraper(server)
+        start = time.perf_counter()
+        comments = scraper.get_comments(post_ids, max_comments=corpus.comments_per_post)
+        elapsed = time.perf_counter() - start
+
+    return {
+        'seconds': elapsed,
+        'comments': len(comments),
+        'comments_per_second': len(comments) / elapsed if elapsed else 0.0,
+    }
+
+
+@benchmark('save_to_files')
+def bench_save_to_files(args, corpus):
+    from reddit_scraper import RedditScraper
+
+    posts = corpus.post_records(args.rows)
+    comments = corpus.comment_records([p.id for p in posts[:args.rows // 10]])
+    # 保存不依赖网络，因此跳过 praw 初始化
+    scraper = RedditScraper.__new__(RedditScraper)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        scraper.save_to_files(posts, comments, output_dir=tmp, save_to_sqlite=False)
+        files_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scraper.save_to_sqlite(posts, comments, db_path=tmp)
+        sqlite_elapsed = time.perf_counter() - start
+
+    return {
+        'rows': len(posts),
+        'comment_rows': len(comments),
+        'files_seconds': files_elapsed,
+        'sqlite_seconds': sqlite_elapsed,
+        'sqlite_rows_per_second': (len(posts) + len(comments)) / sqlite_elapsed if sqlite_elapsed else 0.0,
+    }
+
+
+@benchmark('import_all_files')
+def bench_import_all_files(args, corpus):
+    from utils import import_all_files_to_sqlite
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = max(args.rows // 1000, 1)
+        write_json_files(corpus, tmp, files=files, posts_per_file=min(args.rows, 1000))
+        start = time.perf_counter()
+        posts_imported, _ = import_all_files_to_sqlite(tmp)
+        elapsed = time.perf_counter() - start
+
+    return {
+        'seconds': elapsed,
+        'files': files,
+        'posts': posts_imported,
+        'rows_per_second': posts_imported / elapsed if elapsed else 0.0,
+    }
+
+
+@benchmark('sharded_crawl')
+def bench_sharded_crawl(args, corpus):
+    from sharded_crawl import run_sharded_crawl
+
+    # 多进程扩展性只有在存在网络延迟时才有意义，默认给每个请求 20ms 延迟
+    latency = args.latency or 0.02
+    subreddits = SUBREDDITS[:args.subreddits]
+    patterns = PATTERNS[:args.patterns]
+    results = {}
+
+    with MockRedditServer(corpus, latency=latency) as server:
+        for workers in args.shard_workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                result = run_sharded_crawl(
+                    subreddits, patterns,
+                    workers=workers,
+                    limit=args.limit,
+                    output_dir=tmp,
+                    queue_db=os.path.join(tmp, 'crawl_queue.db'),
+                    credentials=[{'client_id': f'bench-{i}', 'client_secret': 'bench'} for i in range(workers)],
+                    reddit_kwargs=server.praw_kwargs(),
+                    search_delay=0,
+                    poll_interval=0.05,
+                )
+            results[f'workers_{workers}'] = {
+                'seconds': result['seconds'],
+                'items': result['items'],
+                'posts': result['posts'],
+                'items_per_second': result['items'] / result['seconds'] if result['seconds'] else 0.0,
+            }
+
+    base = results[f'workers_{args.shard_workers[0]}']['seconds']
+    for value in results.values():
+        value['speedup'] = base / value['seconds'] if value['seconds'] else 0.0
+    return results
+
+
+@benchmark('flask_routes')
+def bench_flask_routes(args, corpus):
+    import app as app_module
+    import favorites_api
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = build_database(corpus, os.path.join(tmp, 'reddit_data.db'), posts=args.rows)
+        post_id = corpus.post_records(1)[0].id
+        app_module.DB_PATH = db_file
+        favorites_api.DB_PATH = db_file
+
+        routes = [
+            '/',
+            '/posts',
+            '/posts?subreddit=SaaS&sort=score_desc&page=3',
+            f'/post/{post_id}',
+            '/favorites',
+            '/analytics',
+            '/api/search?q=tool',
+        ]
+
+        results = {}
+        for route in routes:
+            def worker(n):
+                client = app_module.app.test_client()
+                latencies = []
+                for _ in range(n):
+                    start = time.perf_counter()
+                    response = client.get(route)
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{route} 返回 {response.status_code}")
+                return latencies
+
+            per_worker = max(args.requests // args.concurrency, 1)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                chunks = list(pool.map(worker, [per_worker] * args.concurrency))
+            elapsed = time.perf_counter() - start
+            latencies = [x for chunk in chunks for x in chunk]
+
+            results[route] = {
+                'requests': len(latencies),
+                'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+                'p50_seconds': _percentile(latencies, 50),
+                'p95_seconds': _percentile(latencies, 95),
+                'p99_seconds': _percentile(latencies, 99),
+                'mean_seconds': statistics.fmean(latencies),
+            }
+
+    return results
+
+
+def _free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _load_test(port, route, clients, total):
+    """clients 个并发客户端（各自保持一个 keep-alive 连接）共发出 total 个请求"""
+    import http.client
+
+    def client(n):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        latencies = []
+        try:
+            for _ in range(n):
+                start = time.perf_counter()
+                conn.request('GET', route)
+                response = conn.getresponse()
+                response.read()
+                latencies.append(time.perf_counter() - start)
+                if response.status != 200:
+                    raise RuntimeError(f"{route} 返回 {response.status}")
+        finally:
+            conn.close()
+        return latencies
+
+    per_client = max(total // clients, 1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        chunks = list(pool.map(client, [per_client] * clients))
+    elapsed = time.perf_counter() - start
+    latencies = [x for chunk in chunks for x in chunk]
+
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_seconds': _percentile(latencies, 50),
+        'p99_seconds': _percentile(latencies, 99),
+        'mean_seconds': statistics.fmean(latencies),
+    }
+
+
+@benchmark('api_load')
+def bench_api_load(args, corpus):
+    """真实 HTTP 服务器下的 JSON 接口压测：Flask（多线程 werkzeug）vs ASGI（uvicorn + 只读线程池）"""
+    import threading
+
+    try:
+        import uvicorn
+        from werkzeug.serving import make_server
+    except ImportError as e:
+        # uvicorn 是可选依赖（crawl[asgi]），基础安装时跳过本项
+        print(f"  跳过 api_load: {e}（需要安装 uv pip install 'crawl[asgi]'）")
+        return {'skipped': str(e)}
+
+    import app as app_module
+    import favorites_api
+    from async_api import ReadAPI
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = build_database(corpus, os.path.join(tmp, 'reddit_data.db'), posts=args.rows)
+        post_id = corpus.post_records(1)[0].id
+        app_module.DB_PATH = db_file
+        favorites_api.DB_PATH = db_file
+
+        # Flask 只有 /api/search 是 JSON 接口，其余对比同名页面（查询相同，多一次模板渲染）
+        routes = [
+            ('/api/search?q=tool', '/api/search?q=tool'),
+            ('/posts?subreddit=SaaS&sort=score_desc&page=3', '/api/posts?subreddit=SaaS&sort=score_desc&page=3'),
+            (f'/post/{post_id}', f'/api/post/{post_id}'),
+            ('/analytics', '/api/analytics'),
+        ]
+
+        flask_port = _free_port()
+        flask_server = make_server('127.0.0.1', flask_port, app_module.app, threaded=True)
+        flask_thread = threading.Thread(target=flask_server.serve_forever, daemon=True)
+        flask_thread.start()
+
+        asgi_port = _free_port()
+        config = uvicorn.Config(ReadAPI(db_file, args.read_pool_size), host='127.0.0.1',
+                                port=asgi_port, log_level='warning', backlog=args.api_clients * 2)
+        asgi_server = uvicorn.Server(config)
+        # 在子线程中运行，不能安装信号处理器
+        asgi_server.install_signal_handlers = lambda: None
+        asgi_thread = threading.Thread(target=asgi_server.run, daemon=True)
+        asgi_thread.start()
+        while not asgi_server.started:
+            time.sleep(0.01)
+
+        results = {}
+        try:
+            for flask_route, asgi_route in routes:
+                results[asgi_route] = {
+                    'flask': _load_test(flask_port, flask_route, args.api_clients, args.api_requests),
+                    'asgi': _load_test(asgi_port, asgi_route, args.api_clients, args.api_requests),
+                }
+        finally:
+            flask_server.shutdown()
+            asgi_server.should_exit = True
+            asgi_thread.join()
+
+    return results
+
+
+def _flatten(data, prefix=''):
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def compare(current, previous, threshold):
+    """比较两次结果，返回退化项列表
+
+    名称以 seconds 结尾的指标越小越好，以 per_second 结尾的越大越好。
+    """
+    regressions = []
+    old = dict(_flatten(previous.get('results', {})))
+    for name, value in _flatten(current.get('results', {})):
+        base = old.get(name)
+        if not base or not value:
+            continue
+        if name.endswith('per_second'):
+            ratio = base / value
+        elif name.endswith('seconds'):
+            ratio = value / base
+        else:
+            continue
+        marker = '退化' if ratio > threshold else ''
+        print(f"  {name:70s} {base:12.4f} -> {value:12.4f}  x{ratio:5.2f} {marker}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reddit 爬虫基准测试套件')
+    parser.add_argument('benchmarks', nargs='*', help=f"要运行的测试（默认全部）: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟服务器每个请求的延迟（秒）')
+    parser.add_argument('--subreddits', type=int, default=3)
+    parser.add_argument('--patterns', type=int, default=3)
+    parser.add_argument('--limit', type=int, default=100, help='每个搜索模式的结果限制')
+    parser.add_argument('--comment-posts', type=int, default=20, help='获取评论的帖子数')
+    parser.add_argument('--rows', type=int, default=10000, help='保存/导入/数据库基准的行数')
+    parser.add_argument('--requests', type=int, default=400, help='每个路由的请求总数')
+    parser.add_argument('--concurrency', type=int, default=8, help='Web 路由并发客户端数')
+    parser.add_argument('--api-clients', type=int, default=128, help='api_load 并发客户端数')
+    parser.add_argument('--api-requests', type=int, default=5000, help='api_load 每个路由的请求总数')
+    parser.add_argument('--read-pool-size', type=int, default=8, help='api_load 中 ASGI 只读线程数')
+    parser.add_argument('--shard-workers', type=int, nargs='+', default=[1, 2, 4], help='分片爬取测试的工作进程数')
+    parser.add_argument('--output', help='结果文件路径（默认 benchmarks/results/<时间戳>.json）')
+    parser.add_argument('--compare', help='与之前的结果文件比较')
+    parser.add_argument('--threshold', type=float, default=1.2, help='判定为退化的比例')
+    args = parser.parse_args()
+
+    names = args.benchmarks or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准测试: {', '.join(unknown)}")
+
+    corpus = SyntheticCorpus(seed=args.seed, results_per_query=args.limit)
+    results = {}
+    for name in names:
+        print(f"运行 {name} ...")
+        results[name] = BENCHMARKS[name](args, corpus)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"与 {args.compare} 比较:")
+        regressions = compare(report, previous, args.threshold)
+        if regressions:
+            print(f"发现 {len(regressions)} 项退化")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
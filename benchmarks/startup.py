@@ -0,0 +1,97 @@
+"""启动耗时基准测试
+
+使用 `python -X importtime` 测量各入口模块的导入耗时，并与
+benchmarks/startup_budget.json 中的预算比较。超出预算或加载了禁止的
+模块（例如 pandas / praw）时以非零状态退出。
+
+用法:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(ROOT, 'benchmarks', 'startup_budget.json')
+
+
+def measure_import(module, runs=3):
+    """返回 (最小导入耗时毫秒, 已加载的顶层模块集合)"""
+    best_us = None
+    loaded = set()
+    code = f"import sys, {module}; print(','.join(sorted({{m.split('.')[0] for m in sys.modules}})))"
+
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+
+        # importtime 输出格式: "import time: self [us] | cumulative | imported package"
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            parts = [p.strip() for p in line[len('import time:'):].split('|')]
+            if len(parts) == 3 and parts[2] == module:
+                cumulative = int(parts[1])
+                if best_us is None or cumulative < best_us:
+                    best_us = cumulative
+
+        loaded = set(proc.stdout.strip().split(','))
+
+    return (best_us or 0) / 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='入口模块启动耗时基准测试')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    parser.add_argument('--runs', type=int, default=3, help='每个模块测量次数（取最小值）')
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE, 'r', encoding='utf-8') as f:
+        budget = json.load(f)
+
+    results = {}
+    failed = False
+    for module, limits in budget.items():
+        try:
+            elapsed_ms, loaded = measure_import(module, runs=args.runs)
+        except RuntimeError as e:
+            results[module] = {'error': str(e)}
+            failed = True
+            continue
+
+        forbidden = sorted(set(limits.get('forbidden', [])) & loaded)
+        over_budget = elapsed_ms > limits['max_import_ms']
+        failed = failed or over_budget or bool(forbidden)
+        results[module] = {
+            'import_ms': round(elapsed_ms, 1),
+            'budget_ms': limits['max_import_ms'],
+            'over_budget': over_budget,
+            'forbidden_loaded': forbidden,
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        for module, r in results.items():
+            if 'error' in r:
+                print(f"{module}: 错误 {r['error']}")
+                continue
+            status = 'OK'
+            if r['over_budget']:
+                status = '超出预算'
+            if r['forbidden_loaded']:
+                status = f"加载了禁止的模块: {', '.join(r['forbidden_loaded'])}"
+            print(f"{module:16s} {r['import_ms']:8.1f} ms / 预算 {r['budget_ms']} ms  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
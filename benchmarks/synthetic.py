@@ -0,0 +1,189 @@
+"""合成数据生成器
+
+生成可复现的帖子/评论数据，供模拟 Reddit 服务器和各项基准测试使用。
+同样的 seed 总是得到同样的数据。
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+from datetime import datetime
+
+from records import PostRecord, CommentRecord
+
+SUBREDDITS = [
+    'entrepreneur', 'startups', 'SaaS', 'productivity', 'smallbusiness',
+    'webdev', 'digitalnomad', 'freelance', 'marketing', 'analytics',
+]
+
+PATTERNS = [
+    'is there a tool', 'looking for a tool', 'how do you handle',
+    'pain point', 'struggling with', 'what tools do you use',
+]
+
+PRODUCTS = ['Notion', 'Trello', 'Airtable', 'Zapier', 'Slack', 'Jira', 'Asana', 'Figma']
+
+WORDS = (
+    'invoice client project team workflow spreadsheet email calendar report '
+    'customer pipeline budget deadline meeting backlog onboarding support '
+    'analytics dashboard automation'
+).split()
+
+BASE_TS = 1735689600.0  # 2025-01-01
+
+
+def _rng(*parts):
+    """由任意键派生确定性的随机数生成器"""
+    digest = hashlib.sha1('|'.join(map(str, parts)).encode('utf-8')).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+class SyntheticCorpus:
+    """可复现的合成语料
+
+    Args:
+        seed: 随机种子
+        results_per_query: 每个 (子版块, 关键词) 搜索的结果总数
+        relevant_ratio: 标题/正文真正包含搜索关键词的帖子比例
+        comments_per_post: 每个帖子的评论数
+        body_words: 正文长度（词数）
+    """
+
+    def __init__(self, seed=0, results_per_query=100, relevant_ratio=0.6,
+                 comments_per_post=30, body_words=80):
+        self.seed = seed
+        self.results_per_query = results_per_query
+        self.relevant_ratio = relevant_ratio
+        self.comments_per_post = comments_per_post
+        self.body_words = body_words
+
+    def post_id(self, subreddit, query, index):
+        digest = hashlib.sha1(f"{self.seed}|{subreddit}|{query}|{index}".encode('utf-8')).hexdigest()
+        return digest[:7]
+
+    def submission(self, subreddit, query, index):
+        """返回 Reddit API 格式的帖子数据（t3 的 data 字段）"""
+        post_id = self.post_id(subreddit, query, index)
+        rng = _rng(self.seed, post_id)
+        relevant = rng.random() < self.relevant_ratio
+        title = _sentence(rng, 6)
+        if relevant:
+            title = f"{query.capitalize()} {title}?"
+        permalink = f"/r/{subreddit}/comments/{post_id}/{title[:30].replace(' ', '_').lower()}/"
+        return {
+            'id': post_id,
+            'name': f"t3_{post_id}",
+            'title': title,
+            'selftext': _sentence(rng, self.body_words),
+            'score': int(rng.paretovariate(1.2)) - 1,
+            'num_comments': self.comments_per_post,
+            'created_utc': BASE_TS + rng.randint(0, 30 * 86400),
+            'author': f"user{rng.randint(1, 5000)}",
+            'subreddit': subreddit,
+            'permalink': permalink,
+            'url': f"https://www.reddit.com{permalink}",
+            'upvote_ratio': round(rng.uniform(0.5, 1.0), 2),
+            'is_self': True,
+            'domain': f"self.{subreddit}",
+        }
+
+    def search(self, subreddit, query, limit=25, after=None):
+        """模拟分页搜索，返回 (帖子列表, 下一页 after)"""
+        start = 0
+        if after:
+            ids = [self.post_id(subreddit, query, i) for i in range(self.results_per_query)]
+            start = ids.index(after[3:]) + 1 if after[3:] in ids else self.results_per_query
+        end = min(start + limit, self.results_per_query)
+        posts = [self.submission(subreddit, query, i) for i in range(start, end)]
+        next_after = posts[-1]['name'] if posts and end < self.results_per_query else None
+        return posts, next_after
+
+    def comments(self, post_id):
+        """返回 Reddit API 格式的评论数据（t1 的 data 字段列表）"""
+        result = []
+        for i in range(self.comments_per_post):
+            rng = _rng(self.seed, post_id, i)
+            comment_id = f"{post_id}c{i:03d}"
+            body = _sentence(rng, rng.randint(5, 40))
+            if rng.random() < 0.2:
+                body += f" I use {rng.choice(PRODUCTS)} for this."
+            # 约三分之一为回复，其余为顶层评论
+            parent = f"t1_{post_id}c{i - 1:03d}" if i and rng.random() < 0.33 else f"t3_{post_id}"
+            result.append({
+                'id': comment_id,
+                'name': f"t1_{comment_id}",
+                'body': body,
+                'score': int(rng.paretovariate(1.5)) - 1,
+                'created_utc': BASE_TS + rng.randint(0, 30 * 86400),
+                'author': f"user{rng.randint(1, 5000)}",
+                'parent_id': parent,
+                'link_id': f"t3_{post_id}",
+                'replies': '',
+                'depth': 0,
+            })
+        return result
+
+    def post_records(self, count, extracted_at=None):
+        """生成 count 条 PostRecord"""
+        extracted_at = extracted_at or datetime.now()
+        records = []
+        i = 0
+        while len(records) < count:
+            subreddit = SUBREDDITS[i % len(SUBREDDITS)]
+            query = PATTERNS[(i // len(SUBREDDITS)) % len(PATTERNS)]
+            data = self.submission(subreddit, query, i)
+            records.append(PostRecord(
+                data['id'], data['title'], data['selftext'], data['score'],
+                data['num_comments'], data['created_utc'], data['author'],
+                subreddit, f"https://reddit.com{data['permalink']}", query,
+                data['upvote_ratio'], data['is_self'], data['domain'], extracted_at,
+            ))
+            i += 1
+        return records
+
+    def comment_records(self, post_ids):
+        """为给定帖子生成 CommentRecord"""
+        return [
+            CommentRecord(c['id'], post_id, c['body'], c['score'], c['created_utc'], c['author'])
+            for post_id in post_ids
+            for c in self.comments(post_id)
+        ]
+
+
+def write_json_files(corpus, output_dir, files=10, posts_per_file=1000):
+    """写出 save_to_files 格式的 reddit_posts_*.json 文件，供导入基准使用"""
+    os.makedirs(output_dir, exist_ok=True)
+    records = corpus.post_records(files * posts_per_file)
+    paths = []
+    for n in range(files):
+        path = os.path.join(output_dir, f"reddit_posts_20250101_{n:06d}.json")
+        chunk = records[n * posts_per_file:(n + 1) * posts_per_file]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([r.to_dict() for r in chunk], f, ensure_ascii=False, default=str)
+        paths.append(path)
+    return paths
+
+
+def build_database(corpus, db_file, posts=10000, comment_posts=1000):
+    """构建与线上结构一致的 SQLite 数据库，供 Web 路由基准使用
+
+    表结构、索引和写入路径与爬虫相同（ensure_schema + insert_records），
+    post_comment_stats 评论聚合随评论一起写入。
+    """
+    from reddit_scraper import ensure_schema, insert_records
+
+    os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+    post_records = corpus.post_records(posts)
+    comment_records = corpus.comment_records([p.id for p in post_records[:comment_posts]])
+
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        insert_records(conn, post_records, comment_records)
+        conn.executemany('INSERT OR IGNORE INTO favorites (post_id) VALUES (?)',
+                         ((r.id,) for r in post_records[:50]))
+    return db_file
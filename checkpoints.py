@@ -0,0 +1,219 @@
+"""可恢复的爬取
+
+每次爬取对应 crawl_runs 中的一条记录（包含参数，可按 id 重新启动），
+每个 (子版块, 搜索模式) 组合在 crawl_checkpoints 中记录进度：
+列表的 after 游标、已遍历的帖子数、已写入的帖子数以及是否完成。
+
+搜索过程中每取完一页就把该页的相关帖子写入 posts 表并更新检查点（同一事务），
+中断后恢复时跳过已完成的组合，未完成的组合从 after 游标继续，不会重新请求已完成的部分。
+
+正在运行的爬取每写入一页都会更新 crawl_runs.updated_at，状态为 running 且
+STALE_RUN_SECONDS 内有更新的爬取视为仍在运行，不能被恢复（claim_run 返回 False）；
+进程崩溃遗留的 running 状态超过该时间后可以恢复，确认原进程已退出时可用 force 立即恢复。
+"""
+import json
+import logging
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+from records import PostRecord
+
+logger = logging.getLogger(__name__)
+
+# running 状态的爬取超过这么久没有更新，视为已中断（获取评论等阶段不更新进度，留足余量）
+STALE_RUN_SECONDS = 600
+
+
+class CheckpointStore:
+    """
+    crawl_runs / crawl_checkpoints / crawl_run_posts 表的读写
+
+    read_only 为 True 时不创建目录和表，只读打开数据库（用于列出爬取记录）
+    """
+
+    def __init__(self, output_dir="reddit_data", read_only=False):
+        self.db_file = f"{output_dir}/reddit_data.db"
+        self.read_only = read_only
+        if read_only:
+            return
+
+        from reddit_scraper import ensure_schema
+
+        os.makedirs(output_dir, exist_ok=True)
+        with sqlite3.connect(self.db_file) as conn:
+            ensure_schema(conn)
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS crawl_runs (
+                    id TEXT PRIMARY KEY,
+                    params TEXT,
+                    status TEXT,
+                    error TEXT,
+                    created_at TIMESTAMP,
+                    updated_at TIMESTAMP
+                );
+
+                CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+                    run_id TEXT,
+                    subreddit TEXT,
+                    pattern TEXT,
+                    after TEXT,
+                    fetched INTEGER DEFAULT 0,
+                    flushed INTEGER DEFAULT 0,
+                    done BOOLEAN DEFAULT 0,
+                    updated_at TIMESTAMP,
+                    PRIMARY KEY (run_id, subreddit, pattern),
+                    FOREIGN KEY (run_id) REFERENCES crawl_runs (id)
+                );
+
+                CREATE TABLE IF NOT EXISTS crawl_run_posts (
+                    run_id TEXT,
+                    post_id TEXT,
+                    PRIMARY KEY (run_id, post_id),
+                    FOREIGN KEY (run_id) REFERENCES crawl_runs (id),
+                    FOREIGN KEY (post_id) REFERENCES posts (id)
+                );
+            ''')
+
+    def _connect(self):
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.db_file)}?mode=ro", uri=True)
+        else:
+            conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _has_runs(self):
+        if not os.path.exists(self.db_file):
+            return False
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'crawl_runs'").fetchone() is not None
+
+    def create_run(self, params):
+        """创建一次爬取记录，返回 run_id"""
+        run_id = uuid.uuid4().hex[:12]
+        now = datetime.now()
+        with self._connect() as conn:
+            conn.execute('INSERT INTO crawl_runs VALUES (?, ?, ?, ?, ?, ?)',
+                         (run_id, json.dumps(params, ensure_ascii=False), 'running', None, now, now))
+        return run_id
+
+    def get_run(self, run_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM crawl_runs WHERE id = ?', (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run['params'] = json.loads(run['params'])
+        return run
+
+    def list_runs(self, limit=20):
+        if self.read_only and not self._has_runs():
+            return []
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT r.id, r.status, r.error, r.created_at, r.updated_at,
+                       COUNT(c.subreddit) AS pairs_started,
+                       COALESCE(SUM(c.done), 0) AS pairs_done,
+                       COALESCE(SUM(c.flushed), 0) AS posts_flushed
+                FROM crawl_runs r
+                LEFT JOIN crawl_checkpoints c ON c.run_id = r.id
+                GROUP BY r.id
+                ORDER BY r.created_at DESC
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_run(self, run_id, stale_seconds=STALE_RUN_SECONDS, force=False):
+        """
+        把爬取标记为 running 以便恢复，返回是否成功
+
+        爬取仍在运行（running 且 stale_seconds 内有更新）时返回 False；检查和更新在同一条语句中完成，
+        两个进程同时恢复同一个爬取时只有一个成功。force 为 True 时不检查（确认原进程已退出时使用）
+        """
+        now = datetime.now()
+        query = "UPDATE crawl_runs SET status = 'running', error = NULL, updated_at = ? WHERE id = ?"
+        params = [now, run_id]
+        if not force:
+            query += " AND (status != 'running' OR updated_at < ?)"
+            params.append(now - timedelta(seconds=stale_seconds))
+        with self._connect() as conn:
+            cursor = conn.execute(query, params)
+        return cursor.rowcount > 0
+
+    def set_status(self, run_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute('UPDATE crawl_runs SET status = ?, error = ?, updated_at = ? WHERE id = ?',
+                         (status, error, datetime.now(), run_id))
+
+    def checkpoint(self, run_id):
+        return RunCheckpoint(self, run_id)
+
+
+class PairState:
+    """单个组合的进度"""
+
+    __slots__ = ('after', 'fetched', 'flushed', 'done')
+
+    def __init__(self, after=None, fetched=0, flushed=0, done=False):
+        self.after = after
+        self.fetched = fetched
+        self.flushed = flushed
+        self.done = bool(done)
+
+
+class RunCheckpoint:
+    """绑定到某次爬取的检查点，传给 RedditScraper.search_posts 使用"""
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+        self._states = {}
+        with store._connect() as conn:
+            rows = conn.execute('''
+                SELECT subreddit, pattern, after, fetched, flushed, done
+                FROM crawl_checkpoints WHERE run_id = ?
+            ''', (run_id,)).fetchall()
+        for row in rows:
+            self._states[(row['subreddit'], row['pattern'])] = PairState(
+                row['after'], row['fetched'], row['flushed'], row['done'])
+
+    def state(self, subreddit, pattern):
+        return self._states.get((subreddit, pattern)) or PairState()
+
+    def flush(self, subreddit, pattern, posts, after, fetched, done=False):
+        """在同一事务中写入帖子并推进检查点"""
+        from reddit_scraper import insert_records
+
+        state = self.state(subreddit, pattern)
+        state.after = after
+        state.fetched = fetched
+        state.flushed += len(posts)
+        state.done = done
+        self._states[(subreddit, pattern)] = state
+
+        with self.store._connect() as conn:
+            if posts:
+                insert_records(conn, posts)
+                conn.executemany('INSERT OR IGNORE INTO crawl_run_posts VALUES (?, ?)',
+                                 ((self.run_id, post.id) for post in posts))
+            conn.execute('''
+                INSERT OR REPLACE INTO crawl_checkpoints
+                    (run_id, subreddit, pattern, after, fetched, flushed, done, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (self.run_id, subreddit, pattern, after, fetched, state.flushed, done, datetime.now()))
+            conn.execute('UPDATE crawl_runs SET updated_at = ? WHERE id = ?', (datetime.now(), self.run_id))
+
+    def load_posts(self):
+        """读取本次爬取已写入的全部帖子"""
+        columns = ', '.join(f"p.{field}" for field in PostRecord.FIELDS)
+        with self.store._connect() as conn:
+            rows = conn.execute(f'''
+                SELECT {columns} FROM posts p
+                JOIN crawl_run_posts r ON r.post_id = p.id
+                WHERE r.run_id = ?
+                ORDER BY p.extracted_at, p.id
+            ''', (self.run_id,)).fetchall()
+        return [PostRecord.from_row(row) for row in rows]
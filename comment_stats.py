@@ -0,0 +1,272 @@
+"""帖子评论聚合
+
+评论写入数据库时（insert_records / 文件导入）同步计算每个帖子的评论聚合，
+保存在 post_comment_stats 表中，/analytics 按评论热度排序时不需要扫描 comments 表：
+
+  - 评论数、评论作者数、评论总分/最高分/平均分、最高分评论 id
+  - 提到产品或链接的评论数（工具推荐），以及提到的产品（名称 -> 次数）和链接
+  - engagement = 评论数 + 评论总分（负分按 0 计），用于排序
+
+评论正文被 retention.py 归档（body 为 NULL）的帖子不重新计算，保留归档前写入的聚合。
+
+产品名和链接用一个合并后的正则在评论正文上单次扫描得到，产品词表见 PRODUCT_LEXICON。
+链接包括 http(s)://、www. 开头的地址和 notion.so 这样的裸域名，只算作链接，不会再算一次 Notion。
+同时是普通英文单词的产品名（Zoom、Excel、Slack 等，见 CASE_SENSITIVE_PRODUCTS）只在首字母大写时匹配。
+
+用法:
+    python comment_stats.py --rebuild                      # 为已有评论重建聚合
+    python comment_stats.py --rebuild --lexicon products.txt
+"""
+import json
+import logging
+import re
+import sqlite3
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 评论中常见的 SaaS / 效率工具，匹配时不区分大小写（CASE_SENSITIVE_PRODUCTS 除外），输出使用这里的写法
+PRODUCT_LEXICON = (
+    'Airtable', 'Asana', 'Basecamp', 'Calendly', 'ChatGPT', 'Claude', 'ClickUp', 'Coda',
+    'Confluence', 'Discord', 'Dropbox', 'Excel', 'Figma', 'Freshdesk', 'GitHub', 'GitLab',
+    'Google Docs', 'Google Sheets', 'Gumroad', 'HubSpot', 'Intercom', 'Jira', 'Loom',
+    'Mailchimp', 'Miro', 'Monday.com', 'n8n', 'Notion', 'Obsidian',
+    'Pipedrive', 'Power Automate', 'QuickBooks', 'Retool', 'Salesforce', 'Shopify',
+    'Slack', 'Stripe', 'Todoist', 'Trello', 'Typeform', 'Webflow', 'WordPress', 'Xero',
+    'Zapier', 'Zendesk', 'Zoho', 'Zoom',
+)
+
+# 同时是普通单词的产品名，只按这里的写法（区分大小写）匹配，"zoom in"、"excel at" 不计入
+CASE_SENSITIVE_PRODUCTS = frozenset((
+    'Asana', 'Basecamp', 'Claude', 'Coda', 'Confluence', 'Discord', 'Excel', 'Intercom',
+    'Loom', 'Notion', 'Obsidian', 'Retool', 'Slack', 'Stripe', 'Zoom',
+))
+
+# 单个帖子最多保存的链接数
+MAX_URLS = 20
+
+_URL_PATTERN = r"(?:https?://|www\.)[^\s<>()\[\]{}\"'`]+"
+# 没有 http(s):// 和 www. 前缀的域名，如 notion.so、airtable.com/templates
+_DOMAIN_PATTERN = (r"(?<![\w.@-])(?:[\w-]+\.)+(?:com|io|so|ai|app|co|net|org|dev)(?![\w-])"
+                   r"(?:/[^\s<>()\[\]{}\"'`]*)?")
+_URL_TRAILING = '.,;:!?*_~'
+
+COMMENT_STATS_DURATION = metrics.histogram(
+    'comment_stats_update_seconds', '写入评论时更新帖子评论聚合的耗时（秒）')
+COMMENT_STATS_POSTS = metrics.counter(
+    'comment_stats_posts_total', '更新评论聚合的帖子数')
+
+
+def ensure_table(conn):
+    """创建 post_comment_stats 表和评论索引（如果不存在）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS post_comment_stats (
+            post_id TEXT PRIMARY KEY,
+            comment_count INTEGER,
+            unique_authors INTEGER,
+            total_score INTEGER,
+            top_score INTEGER,
+            avg_score REAL,
+            top_comment_id TEXT,
+            recommendation_count INTEGER,
+            products TEXT,
+            urls TEXT,
+            first_comment_at TIMESTAMP,
+            last_comment_at TIMESTAMP,
+            engagement INTEGER,
+            updated_at TIMESTAMP,
+            FOREIGN KEY (post_id) REFERENCES posts (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_post_comment_stats_engagement '
+                 'ON post_comment_stats (engagement DESC)')
+    # 帖子详情按分数列出评论、聚合按帖子读取评论都走这个索引
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_post_score ON comments (post_id, score DESC)')
+
+
+def load_lexicon(path):
+    """从文本文件读取产品词表（每行一个名称，# 开头为注释）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return tuple(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+
+@lru_cache(maxsize=8)
+def build_matcher(lexicon=PRODUCT_LEXICON):
+    """把链接和词表中的全部产品名合并成一个正则，返回 (正则, 小写名称 -> 规范名称)"""
+    canonical = {name.lower(): name for name in lexicon}
+
+    def alternation(names):
+        # 长的名称放在前面，保证 "Google Sheets" 优先于可能存在的 "Google"
+        return '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True)) or '(?!)'
+
+    insensitive = alternation(n for n in canonical.values() if n not in CASE_SENSITIVE_PRODUCTS)
+    sensitive = alternation(n for n in canonical.values() if n in CASE_SENSITIVE_PRODUCTS)
+    # 产品名后面紧跟 ".xx" 时是域名（notion.so），交给后面的 domain 分支
+    pattern = re.compile(
+        rf"(?P<url>{_URL_PATTERN})"
+        rf"|(?<![\w.-])(?P<product>{insensitive}|(?-i:{sensitive}))(?![\w-]|\.\w)"
+        rf"|(?P<domain>{_DOMAIN_PATTERN})",
+        re.IGNORECASE,
+    )
+    return pattern, canonical
+
+
+def extract_mentions(text, lexicon=PRODUCT_LEXICON):
+    """返回 (产品名列表, 链接列表)，按出现顺序，可能重复"""
+    pattern, canonical = build_matcher(lexicon)
+    products = []
+    urls = []
+    for match in pattern.finditer(text or ''):
+        if match.lastgroup == 'product':
+            products.append(canonical[match.group('product').lower()])
+        else:
+            urls.append(match.group(match.lastgroup).rstrip(_URL_TRAILING))
+    return products, urls
+
+
+def aggregate(post_id, comments, lexicon=PRODUCT_LEXICON):
+    """
+    计算单个帖子的评论聚合
+
+    Args:
+        comments: 可迭代的 (comment_id, body, score, author, created_utc)
+
+    Returns:
+        post_comment_stats 的一行（tuple）
+    """
+    count = 0
+    total_score = 0
+    top_score = None
+    top_comment_id = None
+    authors = set()
+    recommendations = 0
+    products = Counter()
+    urls = []
+    first_at = last_at = None
+
+    for comment_id, body, score, author, created_utc in comments:
+        score = score or 0
+        count += 1
+        total_score += score
+        if top_score is None or score > top_score:
+            top_score, top_comment_id = score, comment_id
+        if author:
+            authors.add(author)
+        if created_utc is not None:
+            first_at = created_utc if first_at is None else min(first_at, created_utc)
+            last_at = created_utc if last_at is None else max(last_at, created_utc)
+
+        found_products, found_urls = extract_mentions(body, lexicon)
+        if found_products or found_urls:
+            recommendations += 1
+        products.update(found_products)
+        for url in found_urls:
+            if url not in urls and len(urls) < MAX_URLS:
+                urls.append(url)
+
+    return (
+        post_id,
+        count,
+        len(authors),
+        total_score,
+        top_score,
+        total_score / count if count else 0.0,
+        top_comment_id,
+        recommendations,
+        json.dumps(dict(products.most_common()), ensure_ascii=False),
+        json.dumps(urls, ensure_ascii=False),
+        first_at,
+        last_at,
+        count + max(total_score, 0),
+        datetime.now(),
+    )
+
+
+def _write(conn, rows):
+    conn.executemany('''
+        INSERT OR REPLACE INTO post_comment_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+
+def _grouped(cursor, lexicon):
+    for post_id, comments in groupby(cursor, key=lambda row: row[0]):
+        comments = [row[1:] for row in comments]
+        # 有评论正文已归档时无法重新提取产品和链接，跳过，保留已有的聚合
+        if any(body is None for _, body, _, _, _ in comments):
+            continue
+        yield aggregate(post_id, comments, lexicon)
+
+
+@COMMENT_STATS_DURATION.timed()
+def update_post_stats(conn, post_ids, lexicon=PRODUCT_LEXICON):
+    """重新计算指定帖子的评论聚合（不提交事务），在写入评论后调用"""
+    post_ids = list(post_ids)
+    updated = 0
+    # SQLite 默认最多 999 个绑定参数
+    for start in range(0, len(post_ids), 500):
+        chunk = post_ids[start:start + 500]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor = conn.execute(f'''
+            SELECT post_id, comment_id, body, score, author, created_utc
+            FROM comments WHERE post_id IN ({placeholders})
+            ORDER BY post_id
+        ''', chunk)
+        rows = list(_grouped(cursor, lexicon))
+        _write(conn, rows)
+        updated += len(rows)
+    COMMENT_STATS_POSTS.inc(updated)
+    return updated
+
+
+def rebuild(conn, lexicon=PRODUCT_LEXICON, batch_size=1000):
+    """为 comments 表中的全部帖子重建评论聚合，返回帖子数（评论已归档的帖子保留原有聚合）"""
+    ensure_table(conn)
+    conn.execute('''
+        DELETE FROM post_comment_stats
+        WHERE post_id NOT IN (SELECT post_id FROM comments WHERE body IS NULL)
+    ''')
+    cursor = conn.execute('''
+        SELECT post_id, comment_id, body, score, author, created_utc
+        FROM comments ORDER BY post_id
+    ''')
+    batch = []
+    total = 0
+    for row in _grouped(cursor, lexicon):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _write(conn, batch)
+            total += len(batch)
+            batch = []
+    _write(conn, batch)
+    total += len(batch)
+    COMMENT_STATS_POSTS.inc(total)
+    return total
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='帖子评论聚合')
+    parser.add_argument('--rebuild', action='store_true', help='为已有评论重建聚合')
+    parser.add_argument('--db', default='reddit_data/reddit_data.db')
+    parser.add_argument('--lexicon', help='产品词表文件（每行一个名称）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    lexicon = load_lexicon(args.lexicon) if args.lexicon else PRODUCT_LEXICON
+    with sqlite3.connect(args.db) as conn:
+        total = rebuild(conn, lexicon)
+    logger.info(f"已重建 {total} 个帖子的评论聚合")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""批量导出
+
+按 /posts 的筛选条件导出帖子，可选 LEFT JOIN 评论（每条评论一行，没有评论的帖子评论列为空），
+支持 NDJSON、CSV 和 Parquet（需要 pyarrow）三种格式。
+
+查询结果通过游标 fetchmany 分批读取、逐批编码输出，内存占用只与 chunk_size 有关，
+导出上百万行也不会把结果集整体读入内存。/api/export 直接把生成器作为响应体，以分块传输返回。
+
+用法:
+    python export.py --subreddit SaaS --min-score 10 > saas.ndjson
+    python export.py --format csv --comments -o posts_with_comments.csv
+    python export.py --format parquet --sort score_desc -o posts.parquet
+"""
+import csv
+import io
+import json
+import logging
+import sqlite3
+import sys
+
+import metrics
+import queries
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "reddit_data/reddit_data.db"
+
+# 格式 -> (Content-Type, 文件扩展名)
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Parquet 列类型，未列出的列按字符串处理（时间戳在 SQLite 中本来就是字符串）
+PARQUET_TYPES = {
+    'score': 'int64',
+    'num_comments': 'int64',
+    'comment_score': 'int64',
+    'upvote_ratio': 'float64',
+    'is_self': 'bool_',
+}
+
+EXPORT_ROWS = metrics.counter(
+    'export_rows_total', '导出的行数', ('format',))
+
+
+def export_query(filters, with_comments=False, limit=None):
+    """返回 (SQL, 参数)；limit 限制的是帖子数，而不是 JOIN 后的行数"""
+    where, params = queries.post_filter_clause(filters, 'p.')
+    order = queries.post_order_clause(filters, 'p.')
+
+    query = f'SELECT p.* FROM posts p {where} {order}'
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+
+    if with_comments:
+        query = f'''
+            SELECT p.*,
+                   c.comment_id,
+                   c.body AS comment_body,
+                   c.score AS comment_score,
+                   c.created_utc AS comment_created_utc,
+                   c.author AS comment_author
+            FROM ({query}) p
+            LEFT JOIN comments c ON c.post_id = p.id
+            {order}, p.id, c.score DESC
+        '''
+    return query, params
+
+
+def iter_batches(cursor, chunk_size=1000):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+# 已归档的正文列：(类型, 正文列, id 列)
+ARCHIVED_COLUMNS = (
+    ('post', 'content', 'id'),
+    ('comment', 'comment_body', 'comment_id'),
+)
+
+
+def restore_archived(conn, columns, batches):
+    """按批从归档库补全 retention.py 归档的帖子正文和评论正文"""
+    targets = [(kind, columns.index(text), columns.index(key)) for kind, text, key in ARCHIVED_COLUMNS
+               if text in columns and key in columns]
+    for rows in batches:
+        for kind, text_index, id_index in targets:
+            missing = [row[id_index] for row in rows if row[text_index] is None and row[id_index] is not None]
+            texts = queries.archived_texts(conn, kind, missing) if missing else {}
+            if not texts:
+                continue
+            rows = [
+                row[:text_index] + (texts[row[id_index]],) + row[text_index + 1:]
+                if row[text_index] is None and row[id_index] in texts else row
+                for row in rows
+            ]
+        yield rows
+
+
+def iter_ndjson(columns, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + '\n' for row in rows
+        ).encode('utf-8')
+
+
+def iter_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # 没有任何结果时仍输出表头
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink:
+    """只追加的内存缓冲，pyarrow 每写完一个 row group 就取走已写入的数据"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_column(values, type_name):
+    if type_name == 'bool_':
+        return [None if v is None else bool(v) for v in values]
+    if type_name in ('int64', 'float64'):
+        return list(values)
+    return [v if v is None or isinstance(v, str) else str(v) for v in values]
+
+
+def iter_parquet(columns, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = [PARQUET_TYPES.get(name, 'string') for name in columns]
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in zip(columns, types)])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+
+    # 每批写成一个 row group，写完立即输出
+    for rows in batches:
+        arrays = [
+            pa.array(_parquet_column(values, type_name), type=field.type)
+            for values, type_name, field in zip(zip(*rows), types, schema)
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.take()
+
+    writer.close()
+    yield sink.take()
+
+
+ENCODERS = {
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+    'parquet': iter_parquet,
+}
+
+
+def stream_export(db_file, fmt='ndjson', filters=None, with_comments=False, limit=None, chunk_size=1000):
+    """
+    返回按块产出导出内容（bytes）的生成器
+
+    参数在调用时立即校验（未知格式或 chunk_size 小于 1 抛出 ValueError，缺少 pyarrow 抛出 ImportError），
+    数据库连接在生成器结束或被关闭时释放。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}，可选 {', '.join(FORMATS)}")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size 必须大于 0: {chunk_size}")
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ImportError("导出 Parquet 需要安装 pyarrow: uv pip install 'crawl[parquet]'")
+
+    filters = filters or queries.parse_post_filters({})
+    # 生成器可能在其他线程中被迭代（如 WSGI 服务器的响应线程）
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    try:
+        cursor = conn.execute(*export_query(filters, with_comments, limit))
+    except Exception:
+        conn.close()
+        raise
+    columns = [d[0] for d in cursor.description]
+
+    def generate():
+        rows_exported = 0
+
+        def counted(batches):
+            nonlocal rows_exported
+            for rows in batches:
+                rows_exported += len(rows)
+                yield rows
+
+        try:
+            batches = restore_archived(conn, columns, iter_batches(cursor, chunk_size))
+            yield from ENCODERS[fmt](columns, counted(batches))
+        finally:
+            conn.close()
+            EXPORT_ROWS.inc(rows_exported, format=fmt)
+            logger.info(f"导出完成: {rows_exported} 行 ({fmt})")
+
+    return generate()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='按 /posts 的筛选条件导出帖子')
+    parser.add_argument('--format', choices=list(FORMATS), default='ndjson')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--subreddit', default='')
+    parser.add_argument('--search-pattern', default='')
+    parser.add_argument('--min-score', type=int, default=0)
+    parser.add_argument('--sort', default='extracted_at_desc', choices=list(queries.POST_SORTS))
+    parser.add_argument('--comments', action='store_true', help='包含评论（每条评论一行）')
+    parser.add_argument('--limit', type=int, help='最多导出的帖子数')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='每批读取的行数')
+    parser.add_argument('-o', '--output', help='输出文件（默认标准输出）')
+    args = parser.parse_args()
+    if args.chunk_size < 1:
+        parser.error('--chunk-size 必须大于 0')
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    filters = {
+        'subreddit': args.subreddit,
+        'search_pattern': args.search_pattern,
+        'min_score': args.min_score,
+        'sort': args.sort,
+    }
+    chunks = stream_export(args.db, args.format, filters, args.comments, args.limit, args.chunk_size)
+
+    if args.output:
+        with open(args.output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+    else:
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+
+
+if __name__ == '__main__':
+    main()
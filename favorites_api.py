@@ -1,18 +1,85 @@
 from flask import Blueprint, request, jsonify
 import sqlite3
-from datetime import datetime
+import threading
+import time
 
 # 创建一个 Blueprint
 favorites_api = Blueprint('favorites_api', __name__)
 
 DB_PATH = "reddit_data/reddit_data.db"
 
+# 单次批量请求最多处理的帖子数（IN 查询的参数个数限制）
+MAX_BATCH_SIZE = 500
+
+# 收藏 id 缓存的有效期（秒）：其他进程（多个 worker、命令行）写入的收藏最多延迟这么久可见
+CACHE_TTL = 5
+
 def get_db_connection():
     """获取数据库连接"""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
+class FavoriteIds:
+    """
+    已收藏帖子 id 的进程内缓存
+
+    首次使用时从数据库加载，通过本模块的接口写入收藏后失效，超过 CACHE_TTL 秒后也会重新加载，
+    帖子详情等页面判断收藏状态时不再单独查询数据库。
+    """
+
+    def __init__(self):
+        self._ids = None
+        self._db_path = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            # DB_PATH 可能被替换（如基准测试），此时重新加载
+            now = time.monotonic()
+            if self._ids is None or self._db_path != DB_PATH or now - self._loaded_at >= CACHE_TTL:
+                conn = get_db_connection()
+                try:
+                    self._ids = frozenset(row[0] for row in conn.execute('SELECT post_id FROM favorites'))
+                finally:
+                    conn.close()
+                self._db_path = DB_PATH
+                self._loaded_at = now
+            return self._ids
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+
+    def __contains__(self, post_id):
+        return post_id in self.get()
+
+favorite_ids = FavoriteIds()
+
+def _add_favorites(conn, post_ids):
+    """收藏帖子（已收藏的保持不变，不存在的帖子跳过），返回新增数"""
+    cursor = conn.executemany('''
+        INSERT INTO favorites (post_id)
+        SELECT id FROM posts WHERE id = ?
+        ON CONFLICT (post_id) DO NOTHING
+    ''', ((post_id,) for post_id in post_ids))
+    return cursor.rowcount
+
+def _remove_favorites(conn, post_ids):
+    """取消收藏，返回删除数"""
+    cursor = conn.executemany('DELETE FROM favorites WHERE post_id = ?', ((post_id,) for post_id in post_ids))
+    return cursor.rowcount
+
+def _post_id_list(data, key):
+    """读取请求体中的帖子 id 列表（去重并保持顺序），缺省为空列表，不是字符串列表时返回 None"""
+    post_ids = data.get(key)
+    if post_ids is None:
+        return []
+    if not isinstance(post_ids, list) or not all(isinstance(post_id, str) and post_id for post_id in post_ids):
+        return None
+    return list(dict.fromkeys(post_ids))
+
 @favorites_api.route('/api/favorite', methods=['POST'])
 def toggle_favorite():
     """切换帖子的收藏状态"""
@@ -24,26 +91,78 @@ def toggle_favorite():
 
     try:
         conn = get_db_connection()
-        
-        # 检查帖子是否已收藏
-        existing = conn.execute('SELECT post_id FROM favorites WHERE post_id = ?', (post_id,)).fetchone()
-        
-        if existing:
-            # 如果已收藏，则取消收藏
-            conn.execute('DELETE FROM favorites WHERE post_id = ?', (post_id,))
-            conn.commit()
+        try:
+            # 先尝试删除，没有删除任何行说明未收藏，再插入；两步在同一事务中完成
+            with conn:
+                if _remove_favorites(conn, [post_id]):
+                    status = 'unfavorited'
+                elif _add_favorites(conn, [post_id]):
+                    status = 'favorited'
+                else:
+                    status = None
+        finally:
             conn.close()
-            return jsonify({'success': True, 'status': 'unfavorited'})
-        else:
-            # 如果未收藏，则添加收藏
-            conn.execute('INSERT INTO favorites (post_id) VALUES (?)', (post_id,))
-            conn.commit()
+            favorite_ids.invalidate()
+
+        if status is None:
+            return jsonify({'success': False, 'error': '帖子不存在或数据库约束失败'}), 404
+        return jsonify({'success': True, 'status': status})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@favorites_api.route('/api/favorites/batch', methods=['POST'])
+def batch_favorites():
+    """
+    批量收藏/取消收藏
+
+    请求体: {"favorite": [post_id, ...], "unfavorite": [post_id, ...]}
+    所有修改在同一事务中完成，重复收藏和取消未收藏的帖子不会报错。
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': '请求体必须是 JSON 对象'}), 400
+
+    to_add = _post_id_list(data, 'favorite')
+    to_remove = _post_id_list(data, 'unfavorite')
+    if to_add is None or to_remove is None:
+        return jsonify({'success': False, 'error': 'favorite 和 unfavorite 必须是帖子 id 字符串列表'}), 400
+
+    if not to_add and not to_remove:
+        return jsonify({'success': False, 'error': '缺少 favorite 或 unfavorite'}), 400
+
+    if len(to_add) + len(to_remove) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'error': f'单次最多处理 {MAX_BATCH_SIZE} 个帖子'}), 400
+
+    try:
+        conn = get_db_connection()
+        try:
+            with conn:
+                missing = []
+                if to_add:
+                    placeholders = ', '.join('?' * len(to_add))
+                    existing = {row[0] for row in conn.execute(
+                        f'SELECT id FROM posts WHERE id IN ({placeholders})', to_add)}
+                    missing = [post_id for post_id in to_add if post_id not in existing]
+                favorited = _add_favorites(conn, to_add) if to_add else 0
+                unfavorited = _remove_favorites(conn, to_remove) if to_remove else 0
+        finally:
             conn.close()
-            return jsonify({'success': True, 'status': 'favorited'})
-            
-    except sqlite3.IntegrityError:
-        # 可能是帖子ID不存在于posts表中
-        conn.close()
-        return jsonify({'success': False, 'error': '帖子不存在或数据库约束失败'}), 404
+            favorite_ids.invalidate()
+
+        return jsonify({
+            'success': True,
+            'favorited': favorited,
+            'unfavorited': unfavorited,
+            'missing': missing
+        })
+
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+@favorites_api.route('/api/favorites/status')
+def favorite_status():
+    """查询多个帖子的收藏状态: /api/favorites/status?ids=a,b,c"""
+    ids = [post_id for post_id in request.args.get('ids', '').split(',') if post_id]
+    favorited = favorite_ids.get()
+    return jsonify({post_id: post_id in favorited for post_id in ids})
@@ -0,0 +1,188 @@
+"""Reddit API 响应的磁盘缓存
+
+CachedSession 是一个 requests.Session，通过 requestor_kwargs['session'] 交给 praw 使用。
+GET 请求按 (URL, 参数) 缓存在 SQLite 中，不同接口使用不同的有效期：
+
+  - read-write（默认）: 有效期内命中缓存，否则请求网络并写入缓存
+  - offline: 只从缓存回放（忽略有效期），未命中时抛出 CacheMiss，
+             OAuth 令牌请求返回一个本地伪造的令牌，整次爬取以磁盘速度重放
+  - refresh: 总是请求网络并更新缓存
+
+缓存时会去掉 X-Ratelimit-* 响应头，避免回放时触发 prawcore 的限流等待。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import metrics
+
+# (路径正则, 有效期秒数)，按顺序匹配，第一个命中的生效
+DEFAULT_TTLS = (
+    (re.compile(r'/search/?$'), 6 * 3600),
+    (re.compile(r'^/comments/'), 24 * 3600),
+    (re.compile(r'/about/?$'), 7 * 24 * 3600),
+    (re.compile(r'.*'), 3600),
+)
+
+MODES = ('read-write', 'offline', 'refresh')
+
+CACHE_REQUESTS = metrics.counter(
+    'http_cache_requests_total', 'Reddit API 响应缓存查询结果', ('endpoint', 'result'))
+
+
+class CacheMiss(Exception):
+    """离线模式下请求的响应不在缓存中"""
+
+
+def _endpoint(path):
+    if path.rstrip('/').endswith('/search'):
+        return 'search'
+    if path.startswith('/comments/'):
+        return 'comments'
+    if path.rstrip('/').endswith('/access_token'):
+        return 'token'
+    return 'other'
+
+
+def make_key(method, url, params=None):
+    """缓存键：方法 + 去掉查询串的 URL + 排序后的参数（查询串中的参数也合并进来）"""
+    parts = urlsplit(url)
+    items = []
+    if parts.query:
+        items.extend(tuple(p.split('=', 1)) if '=' in p else (p, '') for p in parts.query.split('&'))
+    if params:
+        items.extend((str(k), str(v)) for k, v in dict(params).items())
+    base = f"{parts.scheme}://{parts.netloc}{parts.path}"
+    return f"{method.upper()} {base}?{urlencode(sorted(items))}"
+
+
+class ResponseCache:
+    """基于 SQLite 的响应存储"""
+
+    def __init__(self, db_file="reddit_data/http_cache.db"):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                created_at REAL
+            )
+        ''')
+
+    def _conn(self):
+        # sqlite 连接不能跨线程使用，每个线程各自持有一个
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, max_age=None):
+        """返回 (status, headers, body) 或 None；max_age 为 None 时忽略有效期"""
+        row = self._conn().execute(
+            'SELECT status, headers, body, created_at FROM http_cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if max_age is not None and time.time() - row[3] > max_age:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def set(self, key, url, status, headers, body):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?)',
+            (key, url, status, json.dumps(headers), body, time.time()),
+        )
+
+    def purge(self, older_than):
+        """删除早于 older_than 秒的缓存，返回删除条数"""
+        cursor = self._conn().execute(
+            'DELETE FROM http_cache WHERE created_at < ?', (time.time() - older_than,))
+        return cursor.rowcount
+
+
+def _build_response(url, status, headers, body):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.url = url
+    response.encoding = 'utf-8'
+    response.reason = 'OK' if status == 200 else ''
+    return response
+
+
+class CachedSession(requests.Session):
+    """
+    带磁盘缓存的 requests.Session
+
+    Args:
+        cache: ResponseCache 实例或缓存数据库路径
+        mode: 'read-write' / 'offline' / 'refresh'
+        ttls: [(路径正则, 有效期秒数), ...]，默认 DEFAULT_TTLS
+    """
+
+    def __init__(self, cache="reddit_data/http_cache.db", mode='read-write', ttls=DEFAULT_TTLS):
+        super().__init__()
+        if mode not in MODES:
+            raise ValueError(f"未知的缓存模式: {mode}，可选 {MODES}")
+        self.cache = cache if isinstance(cache, ResponseCache) else ResponseCache(cache)
+        self.mode = mode
+        self.ttls = ttls
+
+    def _ttl(self, path):
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+        return 0
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        path = urlsplit(url).path
+        endpoint = _endpoint(path)
+
+        if method.upper() != 'GET':
+            if self.mode == 'offline':
+                if endpoint == 'token':
+                    CACHE_REQUESTS.inc(endpoint=endpoint, result='offline')
+                    body = json.dumps({
+                        'access_token': 'offline-replay',
+                        'token_type': 'bearer',
+                        'expires_in': 86400,
+                        'scope': '*',
+                    }).encode('utf-8')
+                    return _build_response(url, 200, {'Content-Type': 'application/json'}, body)
+                raise CacheMiss(f"离线模式不支持 {method} {url}")
+            return super().request(method, url, params=params, data=data, **kwargs)
+
+        key = make_key(method, url, params)
+        if self.mode != 'refresh':
+            max_age = None if self.mode == 'offline' else self._ttl(path)
+            hit = self.cache.get(key, max_age)
+            if hit is not None:
+                CACHE_REQUESTS.inc(endpoint=endpoint, result='hit')
+                return _build_response(url, *hit)
+            if self.mode == 'offline':
+                CACHE_REQUESTS.inc(endpoint=endpoint, result='offline_miss')
+                raise CacheMiss(f"缓存中没有 {key}")
+
+        CACHE_REQUESTS.inc(endpoint=endpoint, result='miss')
+        response = super().request(method, url, params=params, data=data, **kwargs)
+        if response.status_code == 200:
+            headers = {k: v for k, v in response.headers.items()
+                       if not k.lower().startswith('x-ratelimit')
+                       and k.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')}
+            self.cache.set(key, url, response.status_code, headers, response.content)
+        return response
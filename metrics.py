@@ -0,0 +1,295 @@
+"""轻量级运行时指标
+
+提供计数器和直方图两种指标（计时器是基于直方图的上下文管理器/装饰器），
+可以导出为 Prometheus 文本格式（/metrics），也可以导出为单次爬取的 JSON 报告。
+
+单次爬取的报告用 collect() 收集：在 with collect() 块内（同一线程）更新的指标
+同时记录到一个新的注册表，多个爬取并发运行时各自的报告互不混入。
+"""
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认直方图分桶（秒），覆盖从微秒级的匹配到十秒级的 API 请求
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+# 当前线程中正在收集的注册表（collect() 可以嵌套）
+_scopes = threading.local()
+
+
+def _active_scopes():
+    return getattr(_scopes, 'stack', ())
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"标签不匹配: 需要 {labelnames}, 实际 {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _report_key(labelnames, key):
+    return ','.join(f"{name}={value}" for name, value in zip(labelnames, key))
+
+
+class Counter:
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self._add(key, amount)
+        for registry in _active_scopes():
+            registry.mirror(self)._add(key, amount)
+
+    def _add(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return {_report_key(self.labelnames, k): v for k, v in self._values.items()}
+
+
+class Histogram:
+    """分桶直方图，主要用于记录耗时（秒）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各分桶计数（非累计，最后一个为 +Inf）, 总和, 次数]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        self._add(key, value)
+        for registry in _active_scopes():
+            registry.mirror(self)._add(key, value)
+
+    def _add(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """计时上下文管理器"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """计时装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, key, ('le', le))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                _report_key(self.labelnames, k): {
+                    'buckets': list(v[0]),
+                    'sum': v[1],
+                    'count': v[2],
+                }
+                for k, v in self._values.items()
+            }
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已以不同的类型或标签注册")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def mirror(self, metric):
+        """本注册表中与 metric 同名、同类型的指标（不存在时创建）"""
+        if isinstance(metric, Histogram):
+            return self.histogram(metric.name, metric.help, metric.labelnames, metric.buckets)
+        return self.counter(metric.name, metric.help, metric.labelnames)
+
+    def render_prometheus(self):
+        """导出为 Prometheus 文本格式"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """导出所有指标的当前值（可 JSON 序列化）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {'type': metric.kind, 'values': metric.snapshot()}
+            for metric in metrics
+        }
+
+
+def diff_snapshots(current, baseline):
+    """计算两个快照之间的增量，用于生成单次爬取的报告"""
+    result = {}
+    for name, metric in current.items():
+        base_values = baseline.get(name, {}).get('values', {})
+        values = {}
+        for key, value in metric['values'].items():
+            base = base_values.get(key)
+            if metric['type'] == 'counter':
+                delta = value - (base or 0)
+                if delta:
+                    values[key] = delta
+            else:
+                if base is None:
+                    delta = value
+                else:
+                    delta = {
+                        'buckets': [a - b for a, b in zip(value['buckets'], base['buckets'])],
+                        'sum': value['sum'] - base['sum'],
+                        'count': value['count'] - base['count'],
+                    }
+                if delta['count']:
+                    values[key] = delta
+        if values:
+            result[name] = {'type': metric['type'], 'values': values}
+    return result
+
+
+# 全局注册表
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.counter(name, help, labelnames)
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.histogram(name, help, labelnames, buckets)
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+@contextmanager
+def collect():
+    """
+    收集当前线程在 with 块内更新的指标，返回只包含这些更新的注册表
+
+    全局注册表照常更新；用于生成单次爬取的报告（write_report(path, registry=...)）
+    """
+    registry = Registry()
+    previous = _active_scopes()
+    _scopes.stack = previous + (registry,)
+    try:
+        yield registry
+    finally:
+        _scopes.stack = previous
+
+
+def write_report(path, since=None, registry=None):
+    """
+    将指标写入 JSON 报告
+
+    registry 为 collect() 返回的注册表时只写入其中的指标，否则写入全局注册表；
+    传入 since 快照时只记录该快照之后的增量
+    """
+    current = (registry or REGISTRY).snapshot()
+    data = diff_snapshots(current, since) if since is not None else current
+
+    # 为直方图补充平均值，方便直接阅读
+    for metric in data.values():
+        if metric['type'] == 'histogram':
+            for value in metric['values'].values():
+                value['avg'] = value['sum'] / value['count'] if value['count'] else 0.0
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'metrics': data,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,221 @@
+"""爬取性能分析
+
+CrawlProfiler 同时运行 cProfile 和一个采样分析器：
+  - cProfile 结果写入 .prof 文件，并生成按累计耗时排序的 Top-N 摘要
+  - 采样分析器定期抓取爬取线程的调用栈，写出 collapsed-stack 文件，
+    可直接用 flamegraph.pl 或 https://www.speedscope.app 生成火焰图
+  - phase() 记录每个阶段（搜索 / 评论 / 保存）的墙钟时间和 CPU 时间
+
+采样结果还会按调用栈归类（praw 懒加载、网络、pandas、SQLite 等），
+用来判断一次慢爬取的时间到底花在了哪里。
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# 采样归类规则：从栈顶（最内层）向外匹配，第一个命中的类别生效
+SAMPLE_CATEGORIES = (
+    ('praw_lazy_fetch', lambda path, func: 'praw' in path and func in ('_fetch', '_fetch_data')),
+    ('network', lambda path, func: any(p in path for p in ('prawcore', 'requests', 'urllib3', 'socket.py', 'ssl.py'))),
+    ('pandas', lambda path, func: 'pandas' in path),
+    ('sqlite', lambda path, func: func in ('save_to_sqlite', 'import_all_files_to_sqlite')),
+    ('json', lambda path, func: os.sep + 'json' + os.sep in path),
+    ('praw', lambda path, func: 'praw' in path),
+)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """对指定线程定期采样调用栈"""
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        labels = []
+        category = None
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            if category is None:
+                path, func = frame.f_code.co_filename, frame.f_code.co_name
+                for name, match in SAMPLE_CATEGORIES:
+                    if match(path, func):
+                        category = name
+                        break
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(labels))] += 1
+        self.categories[category or 'other'] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='crawl-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_collapsed(self, path):
+        """写出 collapsed-stack 格式（每行: 栈;帧 次数）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class CrawlProfiler:
+    """爬取运行的性能分析器
+
+    Args:
+        output_dir: 输出目录（与爬取结果放在一起）
+        top_n: 摘要中列出的函数数量
+        interval: 采样间隔（秒）
+    """
+
+    def __init__(self, output_dir="reddit_data", top_n=30, interval=0.005):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.interval = interval
+        self.phases = []
+        self._profile = cProfile.Profile()
+        self._sampler = None
+        self._start_wall = None
+        self._start_cpu = None
+        self.total_wall = 0.0
+        self.total_cpu = 0.0
+
+    def __enter__(self):
+        self._sampler = SamplingProfiler(interval=self.interval)
+        self._sampler.start()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.thread_time()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._profile.disable()
+        self.total_wall = time.perf_counter() - self._start_wall
+        self.total_cpu = time.thread_time() - self._start_cpu
+        self._sampler.stop()
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        """记录一个阶段的墙钟时间和 CPU 时间"""
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.thread_time() - start_cpu
+            self.phases.append({
+                'phase': name,
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                # 墙钟时间中不占用 CPU 的部分，主要是网络等待和 sleep
+                'wait_seconds': round(max(wall - cpu, 0.0), 4),
+            })
+
+    def _top_n_text(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        stream.write('\n')
+        stats.sort_stats('tottime').print_stats(self.top_n)
+        return stream.getvalue()
+
+    def summary(self):
+        samples = self._sampler.samples if self._sampler else 0
+        categories = self._sampler.categories if self._sampler else Counter()
+        return {
+            'total_wall_seconds': round(self.total_wall, 4),
+            'total_cpu_seconds': round(self.total_cpu, 4),
+            'phases': self.phases,
+            'samples': samples,
+            'sample_interval_seconds': self.interval,
+            'categories': {
+                name: {'samples': count, 'share': round(count / samples, 4) if samples else 0.0}
+                for name, count in categories.most_common()
+            },
+        }
+
+    def write(self, timestamp=None):
+        """写出所有分析结果，返回文件路径列表"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.output_dir, f"crawl_profile_{timestamp}")
+
+        prof_file = f"{base}.prof"
+        self._profile.dump_stats(prof_file)
+
+        collapsed_file = self._sampler.write_collapsed(f"{base}.collapsed")
+
+        summary = self.summary()
+        json_file = f"{base}.json"
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        summary_file = f"{base}_summary.txt"
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            f.write(f"总耗时: 墙钟 {summary['total_wall_seconds']:.2f}s, CPU {summary['total_cpu_seconds']:.2f}s\n\n")
+            f.write("=== 阶段耗时 ===\n")
+            for phase in self.phases:
+                f.write(f"{phase['phase']:12s} 墙钟 {phase['wall_seconds']:8.2f}s  "
+                        f"CPU {phase['cpu_seconds']:8.2f}s  等待 {phase['wait_seconds']:8.2f}s\n")
+            f.write(f"\n=== 采样归类（{summary['samples']} 个样本）===\n")
+            for name, value in summary['categories'].items():
+                f.write(f"{name:16s} {value['samples']:8d}  {value['share'] * 100:5.1f}%\n")
+            f.write(f"\n=== Top {self.top_n} 函数 ===\n")
+            f.write(self._top_n_text())
+
+        return [summary_file, json_file, collapsed_file, prof_file]
+
+
+class NullProfiler:
+    """未开启分析时使用的空实现"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def write(self, timestamp=None):
+        return []
+
+
+def maybe_profile(enabled, output_dir="reddit_data"):
+    """根据开关返回 CrawlProfiler 或 NullProfiler"""
+    return CrawlProfiler(output_dir) if enabled else NullProfiler()
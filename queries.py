@@ -0,0 +1,278 @@
+"""Web 层共用的数据库查询
+
+Flask 页面（app.py）和异步 JSON API（async_api.py）使用同一套筛选、排序和统计查询，
+所有函数都接收一个已打开的 sqlite3 连接（row_factory 为 sqlite3.Row）。
+
+retention.py 归档过的帖子正文（content）和评论正文（body）在主库中为 NULL，
+返回帖子和评论的查询都通过 restore_archived_text 从同目录的 archive.db 读回。
+"""
+import os
+
+import retention
+
+# 排序映射
+POST_SORTS = {
+    'extracted_at_desc': 'extracted_at DESC',
+    'extracted_at_asc': 'extracted_at ASC',
+    'created_utc_desc': 'created_utc DESC',
+    'created_utc_asc': 'created_utc ASC',
+    'score_desc': 'score DESC',
+    'score_asc': 'score ASC'
+}
+
+
+# 归档类型 -> (正文列, id 列)
+ARCHIVED_TEXT = {
+    'post': ('content', 'id'),
+    'comment': ('body', 'comment_id'),
+}
+
+
+def archive_file(conn):
+    """连接所在数据库同目录下的 archive.db（内存数据库返回 None）"""
+    for _, name, path in conn.execute('PRAGMA database_list'):
+        if name == 'main':
+            return os.path.join(os.path.dirname(path), 'archive.db') if path else None
+    return None
+
+
+def archived_texts(conn, kind, ids):
+    """从归档库读取正文，返回 {id: 文本}；没有归档库时返回空 dict"""
+    path = archive_file(conn)
+    if path is None:
+        return {}
+    return retention.load_archived_text(path, kind, ids)
+
+
+def restore_archived_text(conn, rows, kind):
+    """
+    用归档库中的正文补全已归档的帖子（kind='post'）或评论（kind='comment'）
+
+    没有需要补全的行时原样返回，否则返回 dict 列表
+    """
+    column, id_column = ARCHIVED_TEXT[kind]
+    missing = [row[id_column] for row in rows if row[column] is None]
+    if not missing:
+        return rows
+    texts = archived_texts(conn, kind, missing)
+    if not texts:
+        return rows
+    restored = []
+    for row in rows:
+        row = dict(row)
+        if row[column] is None:
+            row[column] = texts.get(row[id_column])
+        restored.append(row)
+    return restored
+
+
+def int_arg(args, name, default):
+    """与 request.args.get(name, default, type=int) 相同：无法解析时返回默认值"""
+    try:
+        return int(args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_post_filters(args):
+    """从查询参数（request.args 或普通 dict）解析 /posts 的筛选条件"""
+    return {
+        'subreddit': args.get('subreddit', ''),
+        'search_pattern': args.get('search_pattern', ''),
+        'min_score': int_arg(args, 'min_score', 0),
+        'sort': args.get('sort', 'extracted_at_desc'),
+    }
+
+
+def parse_pagination(args, per_page=20):
+    """返回 (page, per_page)"""
+    return int_arg(args, 'page', 1), int_arg(args, 'per_page', per_page)
+
+
+def post_filter_clause(filters, prefix=''):
+    """返回 (WHERE 子句, 参数列表)，WHERE 子句总是以 'WHERE 1=1' 开头
+
+    prefix 为列名前缀（如 'p.'），用于与其他表 JOIN 的查询
+    """
+    where = 'WHERE 1=1'
+    params = []
+
+    if filters.get('subreddit'):
+        where += f' AND {prefix}subreddit = ?'
+        params.append(filters['subreddit'])
+
+    if filters.get('search_pattern'):
+        where += f' AND {prefix}search_pattern = ?'
+        params.append(filters['search_pattern'])
+
+    if filters.get('min_score', 0) > 0:
+        where += f' AND {prefix}score >= ?'
+        params.append(filters['min_score'])
+
+    return where, params
+
+
+def post_order_clause(filters, prefix=''):
+    return f'ORDER BY {prefix}' + POST_SORTS.get(filters.get('sort'), 'extracted_at DESC')
+
+
+def list_posts(conn, filters, page=1, per_page=20, with_favorites=False):
+    """
+    按筛选条件分页查询帖子，返回 (帖子列表, 总数)
+
+    with_favorites 为 True 时通过 LEFT JOIN favorites 为每个帖子附加 is_favorited 列，
+    整页的收藏状态在同一个查询中得到。
+    """
+    where, params = post_filter_clause(filters, 'p.')
+    if with_favorites:
+        select = ('SELECT p.*, f.post_id IS NOT NULL AS is_favorited '
+                  'FROM posts p LEFT JOIN favorites f ON f.post_id = p.id')
+    else:
+        select = 'SELECT p.* FROM posts p'
+    posts = conn.execute(
+        f'{select} {where} {post_order_clause(filters, "p.")} LIMIT ? OFFSET ?',
+        params + [per_page, (page - 1) * per_page]
+    ).fetchall()
+    total_count = conn.execute(f'SELECT COUNT(*) FROM posts p {where}', params).fetchone()[0]
+    return restore_archived_text(conn, posts, 'post'), total_count
+
+
+def filter_options(conn):
+    """筛选下拉框的选项，返回 (子版块列表, 搜索模式列表)"""
+    subreddits = conn.execute('SELECT DISTINCT subreddit FROM posts ORDER BY subreddit').fetchall()
+    patterns = conn.execute('SELECT DISTINCT search_pattern FROM posts ORDER BY search_pattern').fetchall()
+    return subreddits, patterns
+
+
+def get_post_detail(conn, post_id, favorite_ids=None):
+    """
+    返回 (帖子, 按分数排序的评论, 是否已收藏)，帖子不存在时返回 (None, [], False)
+
+    favorite_ids 为已收藏 id 的集合（见 favorites_api.favorite_ids），给出时不再查询 favorites 表。
+    已归档的正文从归档库读回。
+    """
+    post = conn.execute('SELECT * FROM posts WHERE id = ?', (post_id,)).fetchone()
+    if not post:
+        return None, [], False
+    post = restore_archived_text(conn, [post], 'post')[0]
+
+    comments = conn.execute(
+        'SELECT * FROM comments WHERE post_id = ? ORDER BY score DESC',
+        (post_id,)
+    ).fetchall()
+    comments = restore_archived_text(conn, comments, 'comment')
+
+    # 检查帖子是否已收藏
+    if favorite_ids is not None:
+        is_favorited = post_id in favorite_ids
+    else:
+        is_favorited = conn.execute('SELECT post_id FROM favorites WHERE post_id = ?', (post_id,)).fetchone() is not None
+    return post, comments, is_favorited
+
+
+def analytics_stats(conn):
+    """数据分析页面的全部统计"""
+    # 按子版块统计
+    subreddit_stats = conn.execute('''
+        SELECT subreddit,
+               COUNT(*) as post_count,
+               AVG(score) as avg_score,
+               SUM(num_comments) as total_comments
+        FROM posts
+        GROUP BY subreddit
+        ORDER BY post_count DESC
+    ''').fetchall()
+
+    # 按搜索模式统计
+    pattern_stats = conn.execute('''
+        SELECT search_pattern,
+               COUNT(*) as post_count,
+               AVG(score) as avg_score,
+               AVG(num_comments) as avg_comments
+        FROM posts
+        GROUP BY search_pattern
+        ORDER BY post_count DESC
+    ''').fetchall()
+
+    # 时间趋势分析
+    time_stats = conn.execute('''
+        SELECT DATE(created_utc) as date,
+               COUNT(*) as post_count,
+               AVG(score) as avg_score
+        FROM posts
+        WHERE created_utc >= datetime('now', '-30 days')
+        GROUP BY DATE(created_utc)
+        ORDER BY date
+    ''').fetchall()
+
+    # 高质量帖子（分数>=10且评论>=5）
+    high_quality_posts = conn.execute('''
+        SELECT * FROM posts
+        WHERE score >= 10 AND num_comments >= 5
+        ORDER BY score DESC
+        LIMIT 10
+    ''').fetchall()
+
+    # 评论热度排行和评论中提到最多的产品（来自写入评论时计算的 post_comment_stats，不扫描 comments 表）
+    engagement_posts = []
+    top_products = []
+    has_comment_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'post_comment_stats'").fetchone()
+    if has_comment_stats:
+        engagement_posts = conn.execute('''
+            SELECT p.id, p.title, p.subreddit, p.score, p.search_pattern,
+                   s.comment_count, s.unique_authors, s.top_score, s.total_score,
+                   s.recommendation_count, s.products, s.engagement
+            FROM post_comment_stats s
+            JOIN posts p ON p.id = s.post_id
+            ORDER BY s.engagement DESC
+            LIMIT 10
+        ''').fetchall()
+
+        top_products = conn.execute('''
+            SELECT m.key AS product,
+                   SUM(m.value) AS mentions,
+                   COUNT(*) AS post_count
+            FROM post_comment_stats s, json_each(s.products) m
+            GROUP BY m.key
+            ORDER BY mentions DESC
+            LIMIT 15
+        ''').fetchall()
+
+    return {
+        'subreddit_stats': subreddit_stats,
+        'pattern_stats': pattern_stats,
+        'time_stats': time_stats,
+        'high_quality_posts': high_quality_posts,
+        'engagement_posts': engagement_posts,
+        'top_products': top_products,
+    }
+
+
+def search_posts(conn, keyword, limit=50):
+    """
+    标题或正文包含关键词的帖子（按分数排序），返回 /api/search 的 JSON 结构
+
+    已归档帖子的正文不在主库中，只按标题匹配，返回的正文摘要从归档库读回
+    """
+    posts = conn.execute('''
+        SELECT * FROM posts
+        WHERE title LIKE ? OR content LIKE ?
+        ORDER BY score DESC
+        LIMIT ?
+    ''', (f'%{keyword}%', f'%{keyword}%', limit)).fetchall()
+    posts = restore_archived_text(conn, posts, 'post')
+
+    result = []
+    for post in posts:
+        content = post['content'] or ''
+        result.append({
+            'id': post['id'],
+            'title': post['title'],
+            'content': content[:200] + '...' if len(content) > 200 else content,
+            'score': post['score'],
+            'num_comments': post['num_comments'],
+            'subreddit': post['subreddit'],
+            'url': post['url']
+        })
+    return result
@@ -0,0 +1,196 @@
+import json
+from datetime import datetime
+
+
+def _to_datetime(value):
+    """SQLite 中的 TIMESTAMP 以字符串保存，读回时转换为 datetime"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def _to_timestamp(value):
+    if isinstance(value, (int, float)) or value is None:
+        return value
+    return _to_datetime(value).timestamp()
+
+
+class PostRecord:
+    """帖子记录 - 使用 __slots__ 减少每条记录的内存占用
+
+    created_utc 以原始时间戳保存，只有在访问或写入时才转换为 datetime；
+    extracted_at 由同一批次的所有记录共享同一个对象。
+    """
+
+    # 字段顺序与 posts 表的列顺序一致
+    FIELDS = (
+        'id', 'title', 'content', 'score', 'num_comments', 'created_utc',
+        'author', 'subreddit', 'url', 'search_pattern', 'upvote_ratio',
+        'is_self', 'domain', 'extracted_at',
+    )
+
+    __slots__ = (
+        'id', 'title', 'content', 'score', 'num_comments', 'created_ts',
+        'author', 'subreddit', 'url', 'search_pattern', 'upvote_ratio',
+        'is_self', 'domain', 'extracted_at',
+    )
+
+    def __init__(self, id, title, content, score, num_comments, created_ts,
+                 author, subreddit, url, search_pattern, upvote_ratio,
+                 is_self, domain, extracted_at):
+        self.id = id
+        self.title = title
+        self.content = content
+        self.score = score
+        self.num_comments = num_comments
+        self.created_ts = created_ts
+        self.author = author
+        self.subreddit = subreddit
+        self.url = url
+        self.search_pattern = search_pattern
+        self.upvote_ratio = upvote_ratio
+        self.is_self = is_self
+        self.domain = domain
+        self.extracted_at = extracted_at
+
+    @classmethod
+    def from_submission(cls, post, search_pattern, subreddit_name, extracted_at):
+        """从 praw Submission 构建记录"""
+        return cls(
+            post.id,
+            post.title,
+            post.selftext,
+            post.score,
+            post.num_comments,
+            post.created_utc,
+            str(post.author) if post.author else '[deleted]',
+            subreddit_name,
+            f"https://reddit.com{post.permalink}",
+            search_pattern,
+            post.upvote_ratio,
+            post.is_self,
+            post.domain,
+            extracted_at,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """从 posts 表的一行（按列顺序）构建记录"""
+        values = list(row)
+        values[5] = _to_timestamp(values[5])
+        values[13] = _to_datetime(values[13])
+        return cls(*values)
+
+    @property
+    def created_utc(self):
+        return datetime.fromtimestamp(self.created_ts)
+
+    def __getitem__(self, key):
+        # 兼容旧代码中 post['id'] 的字典式访问
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def keys(self):
+        return self.FIELDS
+
+    def as_row(self):
+        """转换为与 posts 表列顺序一致的元组"""
+        return (
+            self.id, self.title, self.content, self.score,
+            self.num_comments, self.created_utc, self.author,
+            self.subreddit, self.url, self.search_pattern,
+            self.upvote_ratio, self.is_self, self.domain,
+            self.extracted_at,
+        )
+
+    def values(self):
+        """按 FIELDS 顺序的字段值（写文件用）"""
+        return self.as_row()
+
+    def to_dict(self):
+        return dict(zip(self.FIELDS, self.values()))
+
+    def __repr__(self):
+        return f"PostRecord(id={self.id!r}, subreddit={self.subreddit!r})"
+
+
+class CommentRecord:
+    """评论记录 - 使用 __slots__ 减少每条记录的内存占用"""
+
+    # CSV/JSON 的字段顺序（与原来的评论字典一致）；comments 表的列顺序见 as_row
+    FIELDS = ('post_id', 'comment_id', 'body', 'score', 'created_utc', 'author')
+
+    __slots__ = ('comment_id', 'post_id', 'body', 'score', 'created_ts', 'author')
+
+    def __init__(self, comment_id, post_id, body, score, created_ts, author):
+        self.comment_id = comment_id
+        self.post_id = post_id
+        self.body = body
+        self.score = score
+        self.created_ts = created_ts
+        self.author = author
+
+    @classmethod
+    def from_comment(cls, comment, post_id):
+        """从 praw Comment 构建记录"""
+        return cls(
+            comment.id,
+            post_id,
+            comment.body,
+            comment.score,
+            comment.created_utc,
+            str(comment.author) if comment.author else '[deleted]',
+        )
+
+    @property
+    def created_utc(self):
+        return datetime.fromtimestamp(self.created_ts)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def keys(self):
+        return self.FIELDS
+
+    def as_row(self):
+        """转换为与 comments 表列顺序一致的元组"""
+        return (
+            self.comment_id, self.post_id, self.body,
+            self.score, self.created_utc, self.author,
+        )
+
+    def values(self):
+        """按 FIELDS 顺序的字段值（写文件用）"""
+        return (
+            self.post_id, self.comment_id, self.body,
+            self.score, self.created_utc, self.author,
+        )
+
+    def to_dict(self):
+        return dict(zip(self.FIELDS, self.values()))
+
+    def __repr__(self):
+        return f"CommentRecord(comment_id={self.comment_id!r}, post_id={self.post_id!r})"
+
+
+def records_to_dataframe(records, record_cls):
+    """将记录列表转换为 DataFrame（按列构建，不生成中间字典）"""
+    import pandas as pd
+    return pd.DataFrame.from_records(
+        (record.values() for record in records),
+        columns=record_cls.FIELDS,
+    )
+
+
+def dump_json(records, f, indent=2):
+    """逐条写出 JSON 数组，避免一次性构建全部字典"""
+    empty = True
+    f.write('[')
+    for record in records:
+        f.write('\n' if empty else ',\n')
+        f.write(json.dumps(record.to_dict(), ensure_ascii=False, indent=indent, default=str))
+        empty = False
+    f.write(']' if empty else '\n]')
@@ -1,26 +1,153 @@
-import praw
-import pandas as pd
-import re
-import json
 import time
 from datetime import datetime
 import logging
 import sqlite3
 
 import os
-from dotenv import load_dotenv
 
-# 加载 .env 文件（默认查找项目根目录的 .env）
-load_dotenv()  # 等价于 load_dotenv(".env")
+import comment_stats
+import metrics
+from records import PostRecord, CommentRecord, records_to_dataframe, dump_json
 
+# praw / pandas / dotenv 都在首次使用时才导入，保证只读的 Web 层启动时不加载它们
+logger = logging.getLogger(__name__)
 
+# 爬取热点路径的指标
+API_LATENCY = metrics.histogram(
+    'reddit_api_request_seconds', 'Reddit API 请求耗时（秒）', ('endpoint',))
+SLEEP_SECONDS = metrics.counter(
+    'crawl_sleep_seconds_total', '为避免 API 限制而休眠的总时长（秒）', ('endpoint',))
+SEARCH_DURATION = metrics.histogram(
+    'crawl_search_posts_seconds', 'search_posts 总耗时（秒）')
+RELEVANCE_DURATION = metrics.histogram(
+    'crawl_relevance_check_seconds', '_is_relevant_post 单次匹配耗时（秒）')
+POSTS_SEEN = metrics.counter(
+    'crawl_posts_seen_total', '搜索返回的帖子数', ('relevant',))
+SEARCH_ERRORS = metrics.counter(
+    'crawl_search_errors_total', '搜索模式出错次数')
+COMMENTS_DURATION = metrics.histogram(
+    'crawl_get_comments_seconds', 'get_comments 总耗时（秒）')
+COMMENTS_FETCHED = metrics.counter(
+    'crawl_comments_fetched_total', '获取的评论数')
+COMMENT_ERRORS = metrics.counter(
+    'crawl_comment_errors_total', '获取评论出错次数')
+SQLITE_DURATION = metrics.histogram(
+    'crawl_save_to_sqlite_seconds', 'save_to_sqlite 总耗时（秒）')
+
+# 默认搜索模式 - 这些都是发现SaaS机会的关键词
+DEFAULT_SEARCH_PATTERNS = [
+    "is there a tool",
+    "i wish there was an app", 
+    "i wish there an app",
+    "how do you guys manage",
+    "How do you guys deal with",
+    "How do you guys get through",
+    "What's your experience with",
+    "What do you guys do when",
+    "Any tips on how you guys",
+    "is there a better way to",
+    "looking for a tool",
+    "need an app for",
+    "wish someone would build",
+    "there should be an app",
+    "anyone know of a tool",
+    "how do you handle",
+    "what tools do you use",
+    "struggling with",
+    "pain point",
+    "frustrating that there's no",
+    "Recommend me a product",
+    "Which product should I buy",
+    "What's the best product",
+    "Looking for recommendations [on/for]",
+    "Suggestions for [product]",
+    "What products should I use for [issue]",
+]
+
+# 默认子版块（选择与SaaS相关的社区）
+DEFAULT_SUBREDDITS = [
+    'entrepreneur',
+    'startups', 
+    'SaaS',
+    'productivity',
+    'smallbusiness',
+    'webdev',
+    'digitalnomad',
+    'freelance',
+    'marketing',
+    'analytics'
+]
+
+
+def ensure_schema(conn):
+    """创建帖子表、评论表、收藏表和评论聚合表（如果不存在）"""
+    # 创建帖子表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS posts (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            content TEXT,
+            score INTEGER,
+            num_comments INTEGER,
+            created_utc TIMESTAMP,
+            author TEXT,
+            subreddit TEXT,
+            url TEXT,
+            search_pattern TEXT,
+            upvote_ratio REAL,
+            is_self BOOLEAN,
+            domain TEXT,
+            extracted_at TIMESTAMP
+        )
+    ''')
+    
+    # 创建评论表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS comments (
+            comment_id TEXT PRIMARY KEY,
+            post_id TEXT,
+            body TEXT,
+            score INTEGER,
+            created_utc TIMESTAMP,
+            author TEXT,
+            FOREIGN KEY (post_id) REFERENCES posts (id)
+        )
+    ''')
+
+    # 创建收藏表（帖子列表通过 LEFT JOIN 显示收藏状态）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS favorites (
+            post_id TEXT PRIMARY KEY,
+            favorited_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (post_id) REFERENCES posts (id)
+        )
+    ''')
+
+    comment_stats.ensure_table(conn)
+
+
+def insert_records(conn, posts_data, comments_data=None):
+    """批量写入帖子和评论记录（不提交事务）"""
+    # 插入帖子数据
+    conn.executemany('''
+        INSERT OR REPLACE INTO posts 
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (post.as_row() for post in posts_data))
+    
+    # 插入评论数据
+    if comments_data:
+        conn.executemany('''
+            INSERT OR REPLACE INTO comments 
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (comment.as_row() for comment in comments_data))
+
+        # 同步更新这些帖子的评论聚合
+        comment_stats.update_post_stats(conn, {comment.post_id for comment in comments_data})
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
 
 class RedditScraper:
-    def __init__(self, client_id, client_secret, user_agent, proxy_url=None):
+    def __init__(self, client_id, client_secret, user_agent, proxy_url=None,
+                 cache_path=None, cache_mode='read-write', **reddit_kwargs):
         """
         初始化Reddit API客户端
         
@@ -29,56 +156,47 @@ class RedditScraper:
             client_secret: Reddit应用的客户端密钥
             user_agent: 用户代理字符串，格式如 "YourAppName/1.0"
             proxy_url: HTTP代理URL，格式如 "http://proxy_host:proxy_port" 或 "socks5://proxy_host:proxy_port"
+            cache_path: API 响应缓存数据库路径，为 None 时不缓存
+            cache_mode: 缓存模式 'read-write' / 'offline'（只从缓存回放）/ 'refresh'
+            reddit_kwargs: 传给 praw.Reddit 的其他配置，例如基准测试中的 oauth_url / reddit_url
         """
+        import praw
+
+        session = None
+        if cache_path:
+            from http_cache import CachedSession
+            session = CachedSession(cache_path, mode=cache_mode)
+
         # 配置代理
         requestor_kwargs = {}
         if proxy_url:
             import requests
-            session = requests.Session()
+            session = session or requests.Session()
             session.proxies = {
                 'http': proxy_url,
                 'https': proxy_url
             }
+        if session is not None:
             requestor_kwargs['session'] = session
         
         self.reddit = praw.Reddit(
             client_id=client_id,
             client_secret=client_secret,
             user_agent=user_agent,
-            requestor_kwargs=requestor_kwargs
+            requestor_kwargs=requestor_kwargs,
+            **reddit_kwargs
         )
+
+        # 请求间隔（秒），避免触发API限制；基准测试和离线回放时为0
+        offline = cache_path and cache_mode == 'offline'
+        self.search_delay = 0 if offline else 1
+        self.comment_delay = 0 if offline else 0.5
         
         # 定义搜索模式 - 这些都是发现SaaS机会的关键词
-        self.search_patterns = [
-            "is there a tool",
-            "i wish there was an app", 
-            "i wish there an app",
-            "how do you guys manage",
-            "How do you guys deal with",
-            "How do you guys get through",
-            "What's your experience with",
-            "What do you guys do when",
-            "Any tips on how you guys",
-            "is there a better way to",
-            "looking for a tool",
-            "need an app for",
-            "wish someone would build",
-            "there should be an app",
-            "anyone know of a tool",
-            "how do you handle",
-            "what tools do you use",
-            "struggling with",
-            "pain point",
-            "frustrating that there's no",
-            "Recommend me a product",
-            "Which product should I buy",
-            "What's the best product",
-            "Looking for recommendations [on/for]",
-            "Suggestions for [product]",
-            "What products should I use for [issue]",
-        ]
+        self.search_patterns = list(DEFAULT_SEARCH_PATTERNS)
     
-    def search_posts(self, subreddit_names, limit=100, time_filter='month'):
+    @SEARCH_DURATION.timed()
+    def search_posts(self, subreddit_names, limit=100, time_filter='month', checkpoint=None):
         """
         搜索相关帖子
         
@@ -86,40 +204,118 @@ class RedditScraper:
             subreddit_names: 子版块名称列表
             limit: 每个搜索模式的结果限制
             time_filter: 时间筛选 ('hour', 'day', 'week', 'month', 'year', 'all')
+            checkpoint: checkpoints.RunCheckpoint，传入时每页结果立即写库并记录进度，
+                        已完成的组合会被跳过，返回值为本次爬取已写入的全部帖子
         """
         all_posts = []
+        # 同一批次共享一个提取时间
+        extracted_at = datetime.now()
         
         for subreddit_name in subreddit_names:
             logger.info(f"正在搜索子版块: {subreddit_name}")
-            subreddit = self.reddit.subreddit(subreddit_name)
             
             for pattern in self.search_patterns:
+                if checkpoint is not None and checkpoint.state(subreddit_name, pattern).done:
+                    logger.info(f"跳过已完成的搜索模式: '{pattern}'")
+                    continue
                 try:
-                    logger.info(f"搜索模式: '{pattern}'")
-                    
-                    # 搜索帖子
-                    search_results = subreddit.search(
-                        pattern, 
-                        limit=limit, 
-                        time_filter=time_filter,
-                        sort='relevance'
-                    )
-                    
-                    for post in search_results:
-                        # 检查标题或内容是否真正匹配我们的模式
-                        if self._is_relevant_post(post, pattern):
-                            post_data = self._extract_post_data(post, pattern, subreddit_name)
-                            all_posts.append(post_data)
-                    
-                    # 避免API限制
-                    time.sleep(1)
-                    
+                    all_posts.extend(self.search_pair(subreddit_name, pattern, limit, time_filter,
+                                                      extracted_at, checkpoint))
                 except Exception as e:
+                    SEARCH_ERRORS.inc()
                     logger.error(f"搜索 '{pattern}' 时出错: {e}")
+                    all_posts.extend(getattr(e, 'partial_posts', []))
                     continue
         
+        if checkpoint is not None:
+            return checkpoint.load_posts()
         return all_posts
+
+    def search_pair(self, subreddit_name, pattern, limit=100, time_filter='month', extracted_at=None,
+                    checkpoint=None, stats=None):
+        """
+        搜索单个 (子版块, 搜索模式) 组合，出错时直接抛出异常
+
+        翻页出错时，异常的 partial_posts 属性为出错前已找到的相关帖子。
+        stats 为 dict 时，返回或抛出异常前写入 stats['fetched']（已遍历的搜索结果数，
+        调用方据此计算实际请求的页数）。
+        """
+        if extracted_at is None:
+            extracted_at = datetime.now()
+        posts = []
+
+        logger.info(f"搜索模式: '{pattern}'")
+
+        # 从检查点恢复：从 after 游标继续，并扣除已遍历的数量
+        params = {}
+        fetched = 0
+        if checkpoint is not None:
+            state = checkpoint.state(subreddit_name, pattern)
+            if state.after:
+                params['after'] = state.after
+                fetched = state.fetched
+        
+        # 搜索帖子
+        search_results = self.reddit.subreddit(subreddit_name).search(
+            pattern, 
+            limit=max(limit - fetched, 0), 
+            time_filter=time_filter,
+            sort='relevance',
+            params=params
+        )
+        
+        results = iter(search_results)
+        pending = []
+        while True:
+            cursor = search_results.params.get('after')
+            listing = getattr(search_results, '_listing', None)
+            try:
+                # ListingGenerator 在需要下一页时才真正发起请求，其余 next() 只是读取当前页，
+                # 请求下一页时会替换 _listing，只有这种情况才记录 API 耗时
+                started = time.perf_counter()
+                post = next(results, None)
+                if getattr(search_results, '_listing', None) is not listing:
+                    API_LATENCY.observe(time.perf_counter() - started, endpoint='search')
+            except Exception as e:
+                # 请求下一页失败时，已处理完的页仍然写入检查点，恢复时从 cursor 继续
+                if checkpoint is not None and fetched:
+                    checkpoint.flush(subreddit_name, pattern, pending, cursor, fetched)
+                # 出错前已找到的帖子随异常返回，调用方可以保留
+                e.partial_posts = posts
+                if stats is not None:
+                    stats['fetched'] = fetched
+                raise
+            if post is None:
+                break
+
+            # 取到新的一页时，上一页已经处理完，把它的结果和游标一起写入检查点
+            if checkpoint is not None and fetched and search_results.params.get('after') != cursor:
+                checkpoint.flush(subreddit_name, pattern, pending, cursor, fetched)
+                pending = []
+            fetched += 1
+
+            # 检查标题或内容是否真正匹配我们的模式
+            if self._is_relevant_post(post, pattern):
+                POSTS_SEEN.inc(relevant='true')
+                post_data = self._extract_post_data(post, pattern, subreddit_name, extracted_at)
+                posts.append(post_data)
+                pending.append(post_data)
+            else:
+                POSTS_SEEN.inc(relevant='false')
+
+        if checkpoint is not None:
+            checkpoint.flush(subreddit_name, pattern, pending, search_results.params.get('after'), fetched,
+                             done=True)
+        if stats is not None:
+            stats['fetched'] = fetched
+        
+        # 避免API限制
+        time.sleep(self.search_delay)
+        SLEEP_SECONDS.inc(self.search_delay, endpoint='search')
+
+        return posts
     
+    @RELEVANCE_DURATION.timed()
     def _is_relevant_post(self, post, pattern):
         """检查帖子是否真正相关"""
         text_to_check = f"{post.title} {post.selftext}".lower()
@@ -133,25 +329,13 @@ class RedditScraper:
         
         return any(variation in text_to_check for variation in pattern_variations)
     
-    def _extract_post_data(self, post, search_pattern, subreddit_name):
+    def _extract_post_data(self, post, search_pattern, subreddit_name, extracted_at=None):
         """提取帖子数据"""
-        return {
-            'id': post.id,
-            'title': post.title,
-            'content': post.selftext,
-            'score': post.score,
-            'num_comments': post.num_comments,
-            'created_utc': datetime.fromtimestamp(post.created_utc),
-            'author': str(post.author) if post.author else '[deleted]',
-            'subreddit': subreddit_name,
-            'url': f"https://reddit.com{post.permalink}",
-            'search_pattern': search_pattern,
-            'upvote_ratio': post.upvote_ratio,
-            'is_self': post.is_self,
-            'domain': post.domain,
-            'extracted_at': datetime.now()
-        }
+        if extracted_at is None:
+            extracted_at = datetime.now()
+        return PostRecord.from_submission(post, search_pattern, subreddit_name, extracted_at)
     
+    @COMMENTS_DURATION.timed()
     def get_comments(self, post_ids, max_comments=50):
         """获取帖子评论"""
         comments_data = []
@@ -159,34 +343,36 @@ class RedditScraper:
         for post_id in post_ids:
             try:
                 post = self.reddit.submission(id=post_id)
-                post.comments.replace_more(limit=0)  # 移除 "更多评论" 的占位符
+                with API_LATENCY.time(endpoint='comments'):
+                    post.comments.replace_more(limit=0)  # 移除 "更多评论" 的占位符
+                    comment_list = post.comments.list()[:max_comments]
                 
-                for comment in post.comments.list()[:max_comments]:
+                for comment in comment_list:
                     if hasattr(comment, 'body'):
-                        comments_data.append({
-                            'post_id': post_id,
-                            'comment_id': comment.id,
-                            'body': comment.body,
-                            'score': comment.score,
-                            'created_utc': datetime.fromtimestamp(comment.created_utc),
-                            'author': str(comment.author) if comment.author else '[deleted]'
-                        })
+                        comments_data.append(CommentRecord.from_comment(comment, post_id))
+                        COMMENTS_FETCHED.inc()
                 
-                time.sleep(0.5)  # 避免API限制
+                time.sleep(self.comment_delay)  # 避免API限制
+                SLEEP_SECONDS.inc(self.comment_delay, endpoint='comments')
                 
             except Exception as e:
+                COMMENT_ERRORS.inc()
                 logger.error(f"获取帖子 {post_id} 的评论时出错: {e}")
                 continue
         
         return comments_data
     
-    def save_to_files(self, posts_data, comments_data=None, output_dir="reddit_data", save_to_sqlite=True):
-        """保存数据到文件"""
+    def save_to_files(self, posts_data, comments_data=None, output_dir="reddit_data", save_to_sqlite=True,
+                      posts_saved=False):
+        """保存数据到文件
+
+        posts_saved 为 True 表示帖子已写入数据库（如由检查点逐页写入），只把评论写入数据库
+        """
         import os
         os.makedirs(output_dir, exist_ok=True)
         
         # 保存帖子数据
-        posts_df = pd.DataFrame(posts_data)
+        posts_df = records_to_dataframe(posts_data, PostRecord)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         posts_file = f"{output_dir}/reddit_posts_{timestamp}.csv"
@@ -196,91 +382,44 @@ class RedditScraper:
         # 保存为JSON格式（便于后续AI分析）
         json_file = f"{output_dir}/reddit_posts_{timestamp}.json"
         with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(posts_data, f, ensure_ascii=False, indent=2, default=str)
+            dump_json(posts_data, f)
         logger.info(f"帖子数据已保存到: {json_file}")
         
         # 保存评论数据
+        comments_file = None
         if comments_data:
-            comments_df = pd.DataFrame(comments_data)
+            comments_df = records_to_dataframe(comments_data, CommentRecord)
             comments_file = f"{output_dir}/reddit_comments_{timestamp}.csv"
             comments_df.to_csv(comments_file, index=False, encoding='utf-8')
             logger.info(f"评论数据已保存到: {comments_file}")
 
         # 保存到SQLite
         if save_to_sqlite:
-            self.save_to_sqlite(posts_data, comments_data, output_dir)
+            if not posts_saved:
+                self.save_to_sqlite(posts_data, comments_data, output_dir)
+            elif comments_data:
+                self.save_to_sqlite([], comments_data, output_dir)
+            # 文件内容已在数据库中，记录下来以便 retention.py 按策略清理
+            from retention import record_imported_files
+            record_imported_files(f"{output_dir}/reddit_data.db", [posts_file, json_file, comments_file])
         
         return posts_file, json_file
 
+    @SQLITE_DURATION.timed()
     def save_to_sqlite(self, posts_data, comments_data=None, db_path="reddit_data"):
         """保存数据到SQLite数据库"""
         db_file = f"{db_path}/reddit_data.db"
         
         with sqlite3.connect(db_file) as conn:
-            # 创建帖子表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS posts (
-                    id TEXT PRIMARY KEY,
-                    title TEXT,
-                    content TEXT,
-                    score INTEGER,
-                    num_comments INTEGER,
-                    created_utc TIMESTAMP,
-                    author TEXT,
-                    subreddit TEXT,
-                    url TEXT,
-                    search_pattern TEXT,
-                    upvote_ratio REAL,
-                    is_self BOOLEAN,
-                    domain TEXT,
-                    extracted_at TIMESTAMP
-                )
-            ''')
-            
-            # 创建评论表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS comments (
-                    comment_id TEXT PRIMARY KEY,
-                    post_id TEXT,
-                    body TEXT,
-                    score INTEGER,
-                    created_utc TIMESTAMP,
-                    author TEXT,
-                    FOREIGN KEY (post_id) REFERENCES posts (id)
-                )
-            ''')
-            
-            # 插入帖子数据
-            for post in posts_data:
-                conn.execute('''
-                    INSERT OR REPLACE INTO posts 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    post['id'], post['title'], post['content'], post['score'],
-                    post['num_comments'], post['created_utc'], post['author'],
-                    post['subreddit'], post['url'], post['search_pattern'],
-                    post['upvote_ratio'], post['is_self'], post['domain'],
-                    post['extracted_at']
-                ))
-            
-            # 插入评论数据
-            if comments_data:
-                for comment in comments_data:
-                    conn.execute('''
-                        INSERT OR REPLACE INTO comments 
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        comment['comment_id'], comment['post_id'], comment['body'],
-                        comment['score'], comment['created_utc'], comment['author']
-                    ))
-            
+            ensure_schema(conn)
+            insert_records(conn, posts_data, comments_data)
             conn.commit()
         
         logger.info(f"数据已保存到SQLite数据库: {db_file}")
     
     def analyze_patterns(self, posts_data):
         """分析搜索模式的效果"""
-        df = pd.DataFrame(posts_data)
+        df = records_to_dataframe(posts_data, PostRecord)
         
         pattern_analysis = df.groupby('search_pattern').agg({
             'score': ['count', 'mean', 'sum'],
@@ -297,8 +436,87 @@ class RedditScraper:
         
         return pattern_analysis
 
+# 爬取参数的默认值；保存在 crawl_runs.params 中的参数缺少某项时使用这里的值
+CRAWL_DEFAULTS = {
+    'subreddits': DEFAULT_SUBREDDITS,
+    'patterns': DEFAULT_SEARCH_PATTERNS,
+    'limit': 50,
+    'time_filter': 'month',
+    'get_comments': True,
+    'comment_posts': 20,
+    'max_comments': 30,
+}
+
+
+def crawl_params(params=None):
+    """用 CRAWL_DEFAULTS 补全爬取参数"""
+    return {**CRAWL_DEFAULTS, **(params or {})}
+
+
+def run_crawl(scraper, store, run_id, params, profile=False, output_dir="reddit_data"):
+    """
+    执行（或恢复）一次已创建的爬取：搜索（按检查点）→ 评论 → 保存文件 → 更新状态 → 指标报告
+
+    命令行和 /scrape 共用。参数全部来自保存的 params（缺少的项用 CRAWL_DEFAULTS），
+    恢复时与首次运行使用相同的 limit / time_filter。出错时爬取标记为 failed 并重新抛出异常。
+
+    Returns:
+        dict: posts, comments, posts_file, json_file, metrics_file, profile_files
+    """
+    from profiling import maybe_profile
+
+    params = crawl_params(params)
+    result = {'posts': [], 'comments': [], 'posts_file': None, 'json_file': None}
+    profiler = maybe_profile(profile, output_dir=output_dir)
+    try:
+        # 只收集本线程（本次爬取）更新的指标，并发的爬取互不影响
+        with metrics.collect() as crawl_metrics, profiler:
+            scraper.search_patterns = list(params['patterns'])
+            with profiler.phase('search'):
+                posts = scraper.search_posts(
+                    subreddit_names=params['subreddits'],
+                    limit=params['limit'],
+                    time_filter=params['time_filter'],
+                    checkpoint=store.checkpoint(run_id)
+                )
+            result['posts'] = posts
+            logger.info(f"找到 {len(posts)} 个相关帖子")
+
+            # 获取评论（会增加API调用次数）
+            if params['get_comments'] and posts:
+                post_ids = [post['id'] for post in posts[:params['comment_posts']]]
+                with profiler.phase('comments'):
+                    result['comments'] = scraper.get_comments(post_ids, max_comments=params['max_comments'])
+                logger.info(f"获取了 {len(result['comments'])} 条评论")
+
+            if posts:
+                with profiler.phase('save'):
+                    # 帖子已由检查点写入数据库
+                    result['posts_file'], result['json_file'] = scraper.save_to_files(
+                        posts, result['comments'], output_dir, posts_saved=True)
+    except BaseException as e:
+        store.set_status(run_id, 'failed', str(e) or type(e).__name__)
+        raise
+    store.set_status(run_id, 'completed')
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    result['metrics_file'] = metrics.write_report(
+        f"{output_dir}/crawl_metrics_{timestamp}_{run_id}.json", registry=crawl_metrics)
+    result['profile_files'] = profiler.write(timestamp)
+    return result
+
+
 # 使用示例
-def main():
+def main(profile=False, cache_path=None, cache_mode=None, resume=None, force=False):
+    from dotenv import load_dotenv
+    from checkpoints import CheckpointStore
+
+    # 加载 .env 文件（默认查找项目根目录的 .env）
+    load_dotenv()  # 等价于 load_dotenv(".env")
+
+    # 配置日志
+    logging.basicConfig(level=logging.INFO)
+
     # 配置你的Reddit API credentials
     CLIENT_ID = os.getenv("CLIENT_ID")
     CLIENT_SECRET = os.getenv("CLIENT_SECRET")
@@ -314,48 +532,64 @@ def main():
     PROXY_URL = os.getenv("PROXY_URL")
     
     # 初始化爬虫
-    scraper = RedditScraper(CLIENT_ID, CLIENT_SECRET, USER_AGENT, PROXY_URL)
-    
-    # 定义要搜索的子版块（选择与SaaS相关的社区）
-    target_subreddits = [
-        'entrepreneur',
-        'startups', 
-        'SaaS',
-        'productivity',
-        'smallbusiness',
-        'webdev',
-        'digitalnomad',
-        'freelance',
-        'marketing',
-        'analytics'
-    ]
-    
-    # 搜索帖子
+    # API 响应缓存（可选），离线模式下整次爬取只从缓存回放
+    cache_path = cache_path or os.getenv("REDDIT_CACHE")
+    # .env 中留空的 REDDIT_CACHE_MODE= 会被读成空字符串，同样使用默认模式
+    cache_mode = cache_mode or os.getenv("REDDIT_CACHE_MODE") or 'read-write'
+    scraper = RedditScraper(CLIENT_ID, CLIENT_SECRET, USER_AGENT, PROXY_URL,
+                            cache_path=cache_path, cache_mode=cache_mode)
+
+    # 爬取记录和检查点：中断后可用 --resume <run_id> 从上次的进度继续
+    store = CheckpointStore("reddit_data")
+    if resume:
+        run = store.get_run(resume)
+        if run is None:
+            raise SystemExit(f"未找到爬取记录: {resume}")
+        if not store.claim_run(resume, force=force):
+            raise SystemExit(f"爬取 {resume} 正在运行，不能恢复（确认进程已退出时可加 --force）")
+        run_id, params = resume, run['params']
+        print(f"恢复爬取: {run_id}")
+    else:
+        # 定义要搜索的子版块（选择与SaaS相关的社区），每个模式限制50个结果，搜索最近一个月的内容
+        params = crawl_params()
+        run_id = store.create_run(params)
+        print(f"爬取记录: {run_id}（中断后可用 --resume {run_id} 继续）")
+
     print("开始搜索相关帖子...")
-    posts = scraper.search_posts(
-        subreddit_names=target_subreddits,
-        limit=50,  # 每个模式限制50个结果
-        time_filter='month'  # 搜索最近一个月的内容
-    )
-    
+    result = run_crawl(scraper, store, run_id, params, profile=profile)
+    posts = result['posts']
     print(f"找到 {len(posts)} 个相关帖子")
-    
-    # 获取评论（可选，会增加API调用次数）
-    print("获取评论数据...")
-    post_ids = [post['id'] for post in posts[:20]]  # 只获取前20个帖子的评论
-    comments = scraper.get_comments(post_ids, max_comments=30)
-    
-    print(f"获取了 {len(comments)} 条评论")
-    
-    # 保存数据
-    posts_file, json_file = scraper.save_to_files(posts, comments)
+    print(f"获取了 {len(result['comments'])} 条评论")
     
     # 分析模式效果
-    scraper.analyze_patterns(posts)
+    if posts:
+        scraper.analyze_patterns(posts)
     
     print(f"\n数据已保存，可以用于后续AI分析")
-    print(f"帖子文件: {posts_file}")
-    print(f"JSON文件: {json_file}")
+    print(f"帖子文件: {result['posts_file']}")
+    print(f"JSON文件: {result['json_file']}")
+    print(f"指标报告: {result['metrics_file']}")
+    if result['profile_files']:
+        print(f"性能分析: {', '.join(result['profile_files'])}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Reddit SaaS 机会爬虫')
+    parser.add_argument('--profile', action='store_true',
+                        help='开启性能分析，在输出目录写出火焰图（collapsed stack）和 Top-N 摘要')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='缓存 API 响应到指定的 SQLite 文件，例如 reddit_data/http_cache.db')
+    parser.add_argument('--cache-mode', choices=['read-write', 'offline', 'refresh'],
+                        help='offline: 只从缓存回放，不访问网络；refresh: 总是请求网络并更新缓存')
+    parser.add_argument('--resume', metavar='RUN_ID', help='从检查点恢复中断的爬取')
+    parser.add_argument('--force', action='store_true',
+                        help='与 --resume 一起使用：不检查爬取是否仍在运行（进程崩溃或重启后立即恢复）')
+    args = parser.parse_args()
+    if args.cache_mode and not args.cache:
+        parser.error('--cache-mode 需要同时指定 --cache')
+    if args.force and not args.resume:
+        parser.error('--force 需要同时指定 --resume')
+
+    main(profile=args.profile, cache_path=args.cache, cache_mode=args.cache_mode, resume=args.resume,
+         force=args.force)
\ No newline at end of file
@@ -0,0 +1,476 @@
+"""数据保留、归档和压缩
+
+长期爬取后 reddit_data/ 会不断积累每次运行的 CSV/JSON 文件，reddit_data.db 也只增不减。
+按保留策略（RetentionPolicy）依次执行：
+
+  1. 归档正文：发布超过 full_text_days 天、分数低于 keep_score 且未收藏的帖子，
+     其正文和评论正文压缩后移到 archive.db（安装了 zstandard 时用 zstd，否则用 zlib），
+     主库中的 content / body 置为 NULL，页面、API 和导出通过 queries.restore_archived_text 读回
+  2. 清理文件：imported_files 表记录了已写入数据库的每次爬取文件，
+     超过 keep_files_days 天且文件未被修改过的会被删除；已记录的 reddit_posts_<ts>.json
+     同批写出的 CSV 会先补记（评论 CSV 只在评论都已在数据库中时补记）
+  3. 清理 http_cache.db 中超过 http_cache_days 天的响应
+  4. 增量 VACUUM：主库切换为 auto_vacuum=INCREMENTAL（首次切换需要一次完整 VACUUM），
+     之后每次只回收空闲页，并执行 PRAGMA optimize 更新查询规划统计
+
+每次运行输出回收的磁盘空间，--report 写出的报告中包含本次更新的 retention_* 指标。
+
+用法:
+    python retention.py --dry-run
+    python retention.py --full-text-days 60 --keep-score 20
+    python retention.py --policy retention.json
+"""
+import csv
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RETENTION_BYTES = metrics.counter(
+    'retention_reclaimed_bytes_total', '保留策略回收的磁盘空间（字节）', ('source',))
+RETENTION_ROWS = metrics.counter(
+    'retention_archived_rows_total', '归档正文的行数', ('kind',))
+
+
+class RetentionPolicy:
+    """
+    保留策略
+
+    Args:
+        full_text_days: 保留完整正文的天数（按帖子发布时间），0 表示不归档
+        keep_score: 分数不低于该值的帖子始终保留完整正文
+        keep_favorites: 收藏的帖子始终保留完整正文
+        keep_files_days: 已导入数据库的爬取文件保留天数，None 表示不删除
+        http_cache_days: HTTP 缓存保留天数，None 表示不清理
+        vacuum: 是否执行增量 VACUUM
+        batch_size: 每个事务归档的行数
+    """
+
+    FIELDS = ('full_text_days', 'keep_score', 'keep_favorites', 'keep_files_days',
+              'http_cache_days', 'vacuum', 'batch_size')
+
+    def __init__(self, full_text_days=90, keep_score=10, keep_favorites=True, keep_files_days=7,
+                 http_cache_days=7, vacuum=True, batch_size=500):
+        self.full_text_days = full_text_days
+        self.keep_score = keep_score
+        self.keep_favorites = keep_favorites
+        self.keep_files_days = keep_files_days
+        self.http_cache_days = http_cache_days
+        self.vacuum = vacuum
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"未知的保留策略字段: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+# ---- 压缩 ----
+
+def _codec():
+    try:
+        import zstandard
+    except ImportError:
+        return 'zlib', lambda data: zlib.compress(data, 9)
+    compressor = zstandard.ZstdCompressor(level=19)
+    return 'zstd', compressor.compress
+
+
+def _decompress(codec, data):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# ---- 已导入文件 ----
+
+def ensure_imported_files_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS imported_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            rows INTEGER,
+            imported_at TIMESTAMP
+        )
+    ''')
+
+
+def record_imported_file(conn, path, rows=None):
+    """记录一个内容已写入数据库的文件（不提交事务）"""
+    stat = os.stat(path)
+    conn.execute('INSERT OR REPLACE INTO imported_files VALUES (?, ?, ?, ?, ?)',
+                 (os.path.abspath(path), stat.st_size, stat.st_mtime, rows, datetime.now()))
+
+
+def is_imported(conn, path):
+    """文件已导入且之后未被修改"""
+    row = conn.execute('SELECT size, mtime FROM imported_files WHERE path = ?',
+                       (os.path.abspath(path),)).fetchone()
+    if row is None:
+        return False
+    stat = os.stat(path)
+    return row[0] == stat.st_size and row[1] == stat.st_mtime
+
+
+def _comments_in_db(conn, path):
+    """评论 CSV 中的评论是否都已写入数据库"""
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            comment_ids = [row['comment_id'] for row in csv.DictReader(f)]
+    except (OSError, KeyError, csv.Error) as e:
+        logger.warning(f"无法读取评论文件 {path}: {e}")
+        return False
+    return all(conn.execute('SELECT 1 FROM comments WHERE comment_id = ?', (comment_id,)).fetchone()
+               for comment_id in comment_ids)
+
+
+def sibling_files(conn, json_path):
+    """与 reddit_posts_<ts>.json 同一次 save_to_files 写出、内容已在数据库中的 CSV 文件"""
+    directory, name = os.path.split(json_path)
+    match = re.fullmatch(r'reddit_posts_(\d{8}_\d{6})\.json', name)
+    if not match:
+        return []
+    posts_csv = os.path.join(directory, f"reddit_posts_{match.group(1)}.csv")
+    comments_csv = os.path.join(directory, f"reddit_comments_{match.group(1)}.csv")
+    files = [posts_csv] if os.path.exists(posts_csv) else []
+    if os.path.exists(comments_csv) and _comments_in_db(conn, comments_csv):
+        files.append(comments_csv)
+    return files
+
+
+def record_sibling_files(conn, json_path, imported_at=None):
+    """把帖子 JSON 同批写出的 CSV 也记录为已导入（已记录的保持不变），不提交事务"""
+    for path in sibling_files(conn, json_path):
+        stat = os.stat(path)
+        conn.execute('INSERT OR IGNORE INTO imported_files VALUES (?, ?, ?, ?, ?)',
+                     (os.path.abspath(path), stat.st_size, stat.st_mtime, None, imported_at or datetime.now()))
+
+
+def backfill_sibling_files(conn):
+    """补记已导入的帖子 JSON 同批写出的 CSV，导入时间沿用 JSON 的记录"""
+    rows = conn.execute("SELECT path, imported_at FROM imported_files "
+                        "WHERE path LIKE '%reddit_posts_%.json'").fetchall()
+    for path, imported_at in rows:
+        record_sibling_files(conn, path, imported_at)
+
+
+def record_imported_files(db_file, paths):
+    """记录 save_to_files 写出且已同时写入数据库的文件"""
+    with sqlite3.connect(db_file) as conn:
+        ensure_imported_files_table(conn)
+        for path in paths:
+            if path and os.path.exists(path):
+                record_imported_file(conn, path)
+
+
+def prune_imported_files(conn, keep_days, dry_run=False):
+    """删除超过 keep_days 天的已导入文件，返回 (文件数, 字节数)"""
+    cutoff = datetime.now() - timedelta(days=keep_days)
+    rows = conn.execute('SELECT path, size, mtime FROM imported_files WHERE imported_at < ?',
+                        (cutoff,)).fetchall()
+    files = 0
+    reclaimed = 0
+    for path, size, mtime in rows:
+        if not os.path.exists(path):
+            if not dry_run:
+                conn.execute('DELETE FROM imported_files WHERE path = ?', (path,))
+            continue
+        stat = os.stat(path)
+        if stat.st_size != size or stat.st_mtime != mtime:
+            # 导入后文件被修改过，内容不一定都在数据库中
+            logger.warning(f"文件导入后被修改，跳过: {path}")
+            continue
+        files += 1
+        reclaimed += stat.st_size
+        if not dry_run:
+            os.remove(path)
+            conn.execute('DELETE FROM imported_files WHERE path = ?', (path,))
+    return files, reclaimed
+
+
+# ---- 正文归档 ----
+
+def ensure_archive(conn, archive_file):
+    """把归档库 ATTACH 为 archive 并创建表"""
+    conn.execute('ATTACH DATABASE ? AS archive', (archive_file,))
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.text_archive (
+            kind TEXT,
+            id TEXT,
+            codec TEXT,
+            data BLOB,
+            size INTEGER,
+            archived_at TIMESTAMP,
+            PRIMARY KEY (kind, id)
+        )
+    ''')
+
+
+def _has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (name,)).fetchone() is not None
+
+
+def _stale_posts_clause(conn, policy):
+    """需要归档的帖子条件（表别名 p），返回 (条件, 参数)"""
+    cutoff = datetime.now() - timedelta(days=policy.full_text_days)
+    clause = 'p.created_utc < ? AND p.score < ?'
+    params = [cutoff, policy.keep_score]
+    if policy.keep_favorites and _has_table(conn, 'favorites'):
+        clause += ' AND p.id NOT IN (SELECT post_id FROM favorites)'
+    return clause, params
+
+
+def _archive_batches(conn, kind, select, key, update, params, policy, dry_run):
+    """
+    按批归档 select 返回的 (id, 文本)，返回 (行数, 原始字节数, 压缩后字节数)
+
+    key 为 id 列名，按 key 顺序分页（key > 上一批最后的 id），每批只扫描新的行
+    """
+    codec, compress = _codec()
+    rows_total = raw_total = stored_total = 0
+
+    if dry_run:
+        for _, text in conn.execute(select, params):
+            rows_total += 1
+            raw_total += len(text.encode('utf-8'))
+        return rows_total, raw_total, 0
+
+    last_id = ''
+    while True:
+        rows = conn.execute(f'{select} AND {key} > ? ORDER BY {key} LIMIT ?',
+                            params + [last_id, policy.batch_size]).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        now = datetime.now()
+        archived = []
+        for row_id, text in rows:
+            raw = text.encode('utf-8')
+            data = compress(raw)
+            archived.append((kind, row_id, codec, data, len(raw), now))
+            raw_total += len(raw)
+            stored_total += len(data)
+        # 写归档和清空正文在同一事务中（连接为自动提交模式，需显式开启事务）
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('INSERT OR REPLACE INTO archive.text_archive VALUES (?, ?, ?, ?, ?, ?)', archived)
+            conn.executemany(update, ((row_id,) for row_id, _ in rows))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        rows_total += len(rows)
+
+    RETENTION_ROWS.inc(rows_total, kind=kind)
+    return rows_total, raw_total, stored_total
+
+
+def archive_stale_text(conn, policy, dry_run=False):
+    """归档过期帖子及其评论的正文，返回各类的 (行数, 原始字节数, 压缩后字节数)"""
+    clause, params = _stale_posts_clause(conn, policy)
+    result = {}
+    result['posts'] = _archive_batches(
+        conn, 'post',
+        f"SELECT p.id, p.content FROM posts p WHERE p.content IS NOT NULL AND p.content != '' AND {clause}",
+        'p.id',
+        'UPDATE posts SET content = NULL WHERE id = ?',
+        params, policy, dry_run)
+    result['comments'] = _archive_batches(
+        conn, 'comment',
+        f'''SELECT c.comment_id, c.body FROM comments c JOIN posts p ON p.id = c.post_id
+            WHERE c.body IS NOT NULL AND c.body != '' AND {clause}''',
+        'c.comment_id',
+        'UPDATE comments SET body = NULL WHERE comment_id = ?',
+        params, policy, dry_run)
+    return result
+
+
+def load_archived_text(archive_file, kind, ids):
+    """从归档库读取正文，返回 {id: 文本}；kind 为 'post' 或 'comment'"""
+    ids = list(dict.fromkeys(ids))
+    if not ids or not os.path.exists(archive_file):
+        return {}
+    texts = {}
+    conn = sqlite3.connect(archive_file)
+    try:
+        # SQLite 默认最多 999 个绑定参数
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            for row_id, codec, data in conn.execute(
+                    f'SELECT id, codec, data FROM text_archive WHERE kind = ? AND id IN ({placeholders})',
+                    [kind] + chunk):
+                texts[row_id] = _decompress(codec, data).decode('utf-8')
+    finally:
+        conn.close()
+    return texts
+
+
+# ---- VACUUM ----
+
+def incremental_vacuum(conn):
+    """回收空闲页，返回回收的页数；首次会把数据库切换为增量 auto_vacuum 模式"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        logger.info("切换为 auto_vacuum=INCREMENTAL（需要一次完整 VACUUM）")
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        before = conn.execute('PRAGMA page_count').fetchone()[0]
+        conn.execute('VACUUM')
+        return before - conn.execute('PRAGMA page_count').fetchone()[0]
+
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # incremental_vacuum 每返回一行回收一页，必须取完结果才会全部执行
+    conn.execute('PRAGMA incremental_vacuum').fetchall()
+    return free_pages
+
+
+def _file_size(path):
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def apply_retention(output_dir="reddit_data", policy=None, dry_run=False):
+    """按策略执行一次保留任务，返回报告（dict），report['metrics'] 为本次更新的 retention_* 指标"""
+    with metrics.collect() as run_metrics:
+        report = _apply_retention(output_dir, policy, dry_run)
+    report['metrics'] = run_metrics.snapshot()
+    return report
+
+
+def _apply_retention(output_dir, policy, dry_run):
+    policy = policy or RetentionPolicy()
+    db_file = f"{output_dir}/reddit_data.db"
+    archive_file = f"{output_dir}/archive.db"
+    cache_file = f"{output_dir}/http_cache.db"
+    start = time.perf_counter()
+
+    sizes_before = {name: _file_size(path) for name, path in
+                    (('db', db_file), ('archive', archive_file), ('http_cache', cache_file))}
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'dry_run': dry_run,
+        'policy': policy.to_dict(),
+    }
+
+    if dry_run:
+        # dry run 以只读方式打开，不创建任何表或文件
+        if not os.path.exists(db_file):
+            raise FileNotFoundError(f"数据库不存在: {db_file}")
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_file)}?mode=ro", uri=True, isolation_level=None)
+    else:
+        conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        if not dry_run:
+            from reddit_scraper import ensure_schema
+            ensure_schema(conn)
+            ensure_imported_files_table(conn)
+
+        if policy.full_text_days and _has_table(conn, 'posts') and _has_table(conn, 'comments'):
+            if not dry_run:
+                ensure_archive(conn, archive_file)
+            report['archived'] = {
+                kind: {'rows': rows, 'text_bytes': raw, 'compressed_bytes': stored}
+                for kind, (rows, raw, stored) in archive_stale_text(conn, policy, dry_run).items()
+            }
+
+        if policy.keep_files_days is not None and _has_table(conn, 'imported_files'):
+            if not dry_run:
+                backfill_sibling_files(conn)
+            files, reclaimed = prune_imported_files(conn, policy.keep_files_days, dry_run)
+            report['files'] = {'deleted': files, 'bytes': reclaimed}
+            if not dry_run:
+                RETENTION_BYTES.inc(reclaimed, source='files')
+
+        if policy.http_cache_days is not None and os.path.exists(cache_file):
+            from http_cache import ResponseCache
+            if not dry_run:
+                cache = ResponseCache(cache_file)
+                purged = cache.purge(policy.http_cache_days * 86400)
+                incremental_vacuum(cache._conn())
+                report['http_cache'] = {'purged': purged}
+
+        if policy.vacuum and not dry_run:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            pages = incremental_vacuum(conn)
+            conn.execute('PRAGMA optimize')
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            report['vacuum'] = {'pages': pages, 'bytes': pages * page_size}
+    finally:
+        conn.close()
+
+    sizes_after = {name: _file_size(path) for name, path in
+                   (('db', db_file), ('archive', archive_file), ('http_cache', cache_file))}
+    reclaimed = sum(sizes_before.values()) - sum(sizes_after.values()) + report.get('files', {}).get('bytes', 0)
+    if not dry_run:
+        RETENTION_BYTES.inc(max(sizes_before['db'] - sizes_after['db'], 0), source='db')
+
+    report['sizes_before'] = sizes_before
+    report['sizes_after'] = sizes_after
+    report['reclaimed_bytes'] = reclaimed
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def _mb(value):
+    return f"{value / 1024 / 1024:.2f} MB"
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='reddit_data 的保留、归档和压缩')
+    parser.add_argument('--output-dir', default='reddit_data')
+    parser.add_argument('--policy', help='JSON 格式的保留策略文件（字段见 RetentionPolicy）')
+    parser.add_argument('--full-text-days', type=int, help='保留完整正文的天数，0 表示不归档')
+    parser.add_argument('--keep-score', type=int, help='分数不低于该值的帖子保留完整正文')
+    parser.add_argument('--keep-files-days', type=int, help='已导入文件的保留天数')
+    parser.add_argument('--http-cache-days', type=int, help='HTTP 缓存保留天数')
+    parser.add_argument('--no-vacuum', action='store_true', help='不执行 VACUUM')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不修改任何数据')
+    parser.add_argument('--report', help='把报告写入 JSON 文件')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    policy = RetentionPolicy.from_file(args.policy) if args.policy else RetentionPolicy()
+    for field in ('full_text_days', 'keep_score', 'keep_files_days', 'http_cache_days'):
+        value = getattr(args, field)
+        if value is not None:
+            setattr(policy, field, value)
+    if args.no_vacuum:
+        policy.vacuum = False
+
+    report = apply_retention(args.output_dir, policy, args.dry_run)
+
+    for kind, stats in report.get('archived', {}).items():
+        logger.info(f"归档{kind}: {stats['rows']} 行, 正文 {_mb(stats['text_bytes'])} -> {_mb(stats['compressed_bytes'])}")
+    if 'files' in report:
+        logger.info(f"删除已导入文件: {report['files']['deleted']} 个, {_mb(report['files']['bytes'])}")
+    if 'vacuum' in report:
+        logger.info(f"VACUUM 回收: {report['vacuum']['pages']} 页")
+    logger.info(f"数据库: {_mb(report['sizes_before']['db'])} -> {_mb(report['sizes_after']['db'])}, "
+                f"归档库: {_mb(report['sizes_after']['archive'])}, "
+                f"共回收 {_mb(report['reclaimed_bytes'])}{'（dry run）' if args.dry_run else ''}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
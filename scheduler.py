@@ -0,0 +1,296 @@
+"""定时循环爬取
+
+按固定间隔运行爬取任务，并根据每个 (子版块, 搜索模式) 组合的历史产出
+分配 API 预算（每次运行允许的搜索请求页数）：
+
+  - 每个组合的「每次 API 调用得到的相关帖子数」用 Gamma-Poisson 模型估计，
+    每次规划时从后验分布中采样（Thompson sampling），产出高的组合分到更多页，
+    数据少的组合因为方差大仍有机会被选中（探索）
+  - 历史统计按 decay 衰减，适应子版块热度的变化
+  - 最近连续多次没有产出的组合会被跳过，只以 reprobe_prob 的概率重新试探
+
+每次运行更新的指标（scheduler_*、爬虫的请求/写库指标）写入 scheduler_metrics_<时间>.json。
+
+首次运行时用 posts 表中已有的数据（即 /analytics 中的产出）初始化统计。
+
+用法:
+    python scheduler.py --interval 3600 --budget 60
+    python scheduler.py --once --budget 20
+"""
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Reddit 每个列表请求最多返回 100 条
+PAGE_SIZE = 100
+
+SCHEDULER_RUNS = metrics.counter(
+    'scheduler_runs_total', '定时爬取运行次数')
+SCHEDULER_PAIRS = metrics.counter(
+    'scheduler_pairs_total', '定时爬取中各组合的处理结果', ('outcome',))
+SCHEDULER_PAGES = metrics.counter(
+    'scheduler_pages_total', '定时爬取实际请求的搜索页数')
+
+
+class PairStats:
+    """单个 (子版块, 搜索模式) 组合的历史统计"""
+
+    __slots__ = ('subreddit', 'pattern', 'runs', 'api_calls', 'relevant_posts',
+                 'consecutive_empty', 'last_run_at')
+
+    def __init__(self, subreddit, pattern, runs=0, api_calls=0.0, relevant_posts=0.0,
+                 consecutive_empty=0, last_run_at=None):
+        self.subreddit = subreddit
+        self.pattern = pattern
+        self.runs = runs
+        self.api_calls = api_calls
+        self.relevant_posts = relevant_posts
+        self.consecutive_empty = consecutive_empty
+        self.last_run_at = last_run_at
+
+
+class YieldStore:
+    """crawl_pair_stats 表的读写"""
+
+    def __init__(self, db_file="reddit_data/reddit_data.db"):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_pair_stats (
+                    subreddit TEXT,
+                    pattern TEXT,
+                    runs INTEGER,
+                    api_calls REAL,
+                    relevant_posts REAL,
+                    consecutive_empty INTEGER,
+                    last_run_at TIMESTAMP,
+                    PRIMARY KEY (subreddit, pattern)
+                )
+            ''')
+
+    def load(self):
+        with sqlite3.connect(self.db_file) as conn:
+            rows = conn.execute('''
+                SELECT subreddit, pattern, runs, api_calls, relevant_posts, consecutive_empty, last_run_at
+                FROM crawl_pair_stats
+            ''').fetchall()
+        return {(row[0], row[1]): PairStats(*row) for row in rows}
+
+    def bootstrap_from_posts(self):
+        """统计表为空时，用 posts 表中已有的产出初始化（请求页数按帖子数折算，至少一页）"""
+        with sqlite3.connect(self.db_file) as conn:
+            if conn.execute('SELECT COUNT(*) FROM crawl_pair_stats').fetchone()[0]:
+                return 0
+            has_posts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts'").fetchone()
+            if not has_posts:
+                return 0
+            cursor = conn.execute('''
+                INSERT INTO crawl_pair_stats
+                    (subreddit, pattern, runs, api_calls, relevant_posts, consecutive_empty, last_run_at)
+                SELECT subreddit, search_pattern, 0, MAX(1, (COUNT(*) + ? - 1) / ?), COUNT(*), 0,
+                       MAX(extracted_at)
+                FROM posts
+                GROUP BY subreddit, search_pattern
+            ''', (PAGE_SIZE, PAGE_SIZE))
+            return cursor.rowcount
+
+    def record(self, subreddit, pattern, pages, found, decay):
+        """记录一次搜索的结果，历史值按 decay 衰减"""
+        with sqlite3.connect(self.db_file) as conn:
+            conn.execute('''
+                INSERT INTO crawl_pair_stats
+                    (subreddit, pattern, runs, api_calls, relevant_posts, consecutive_empty, last_run_at)
+                VALUES (?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT (subreddit, pattern) DO UPDATE SET
+                    runs = runs + 1,
+                    api_calls = api_calls * ? + excluded.api_calls,
+                    relevant_posts = relevant_posts * ? + excluded.relevant_posts,
+                    consecutive_empty = CASE WHEN excluded.relevant_posts > 0 THEN 0
+                                             ELSE consecutive_empty + 1 END,
+                    last_run_at = excluded.last_run_at
+            ''', (subreddit, pattern, pages, found, 0 if found else 1, datetime.now(), decay, decay))
+
+
+class CrawlScheduler:
+    """
+    按历史产出分配预算的循环爬取调度器
+
+    Args:
+        scraper: RedditScraper 实例
+        subreddits / patterns: 参与调度的子版块和搜索模式
+        budget: 每次运行允许的搜索请求页数（每页最多 100 条）
+        max_pages: 单个组合每次最多分配的页数
+        skip_after: 连续多少次没有产出后跳过该组合
+        reprobe_prob: 被跳过的组合每次仍被重新试探的概率
+        decay: 历史统计的衰减系数
+        prior_alpha / prior_beta: Gamma 先验参数（先验均值 = alpha / beta 个相关帖子每页）
+    """
+
+    def __init__(self, scraper, subreddits, patterns, output_dir="reddit_data", budget=60,
+                 max_pages=5, time_filter='week', skip_after=3, reprobe_prob=0.1,
+                 decay=0.9, prior_alpha=1.0, prior_beta=1.0, seed=None):
+        self.scraper = scraper
+        self.subreddits = list(subreddits)
+        self.patterns = list(patterns)
+        self.output_dir = output_dir
+        self.budget = budget
+        self.max_pages = max_pages
+        self.time_filter = time_filter
+        self.skip_after = skip_after
+        self.reprobe_prob = reprobe_prob
+        self.decay = decay
+        self.prior_alpha = prior_alpha
+        self.prior_beta = prior_beta
+        self.rng = random.Random(seed)
+        self.store = YieldStore(f"{output_dir}/reddit_data.db")
+        self._stop = threading.Event()
+
+    def plan(self):
+        """返回本次运行的计划 [(子版块, 搜索模式, 页数), ...]，按采样产出从高到低排列"""
+        stats = self.store.load()
+        candidates = []
+        skipped = 0
+
+        for subreddit in self.subreddits:
+            for pattern in self.patterns:
+                s = stats.get((subreddit, pattern)) or PairStats(subreddit, pattern)
+                if s.consecutive_empty >= self.skip_after and self.rng.random() >= self.reprobe_prob:
+                    skipped += 1
+                    continue
+                # 从后验 Gamma(alpha + 相关帖子数, beta + 请求页数) 中采样每页产出
+                rate = self.rng.gammavariate(self.prior_alpha + s.relevant_posts,
+                                             1.0 / (self.prior_beta + s.api_calls))
+                candidates.append((rate, subreddit, pattern))
+
+        SCHEDULER_PAIRS.inc(skipped, outcome='skipped')
+        if not candidates:
+            return []
+
+        candidates.sort(reverse=True)
+        total_rate = sum(rate for rate, _, _ in candidates) or 1.0
+        remaining = self.budget
+        plan = []
+        for rate, subreddit, pattern in candidates:
+            if remaining <= 0:
+                break
+            share = max(1, round(self.budget * rate / total_rate))
+            pages = min(share, self.max_pages, remaining)
+            plan.append((subreddit, pattern, pages))
+            remaining -= pages
+
+        logger.info(f"本次计划: {len(plan)} 个组合, {self.budget - remaining} 页, 跳过 {skipped} 个组合")
+        return plan
+
+    def run_once(self):
+        """执行一次调度，返回本次保存的帖子数；本次更新的指标写入 {output_dir}/scheduler_metrics_<时间>.json"""
+        extracted_at = datetime.now()
+        total_posts = 0
+
+        with metrics.collect() as run_metrics:
+            try:
+                SCHEDULER_RUNS.inc()
+                for subreddit, pattern, pages in self.plan():
+                    total_posts += self._crawl_pair(subreddit, pattern, pages, extracted_at)
+            finally:
+                report = metrics.write_report(
+                    f"{self.output_dir}/scheduler_metrics_{extracted_at.strftime('%Y%m%d_%H%M%S')}.json",
+                    registry=run_metrics)
+
+        logger.info(f"定时爬取完成: 保存 {total_posts} 个帖子，指标报告: {report}")
+        return total_posts
+
+    def _crawl_pair(self, subreddit, pattern, pages, extracted_at):
+        """搜索一个组合并记录产出，返回保存的帖子数"""
+        search_stats = {}
+        try:
+            posts = self.scraper.search_pair(subreddit, pattern, pages * PAGE_SIZE,
+                                             self.time_filter, extracted_at, stats=search_stats)
+            outcome = 'found' if posts else 'empty'
+        except Exception as e:
+            # 出错也记录一次（按已找到的帖子计），持续出错的组合和无产出的组合一样会被跳过
+            posts = getattr(e, 'partial_posts', [])
+            outcome = 'error'
+            logger.error(f"定时爬取 ({subreddit}, '{pattern}') 出错: {e}")
+
+        if posts:
+            self.scraper.save_to_sqlite(posts, db_path=self.output_dir)
+        # 按实际遍历的结果数记录请求页数，结果不足一页或出错时也至少发起了一次请求
+        used_pages = max(1, math.ceil(search_stats.get('fetched', 0) / PAGE_SIZE))
+        self.store.record(subreddit, pattern, used_pages, len(posts), self.decay)
+        SCHEDULER_PAGES.inc(used_pages)
+        SCHEDULER_PAIRS.inc(outcome=outcome)
+        return len(posts)
+
+    def run_forever(self, interval):
+        """每隔 interval 秒运行一次，直到调用 stop()"""
+        added = self.store.bootstrap_from_posts()
+        if added:
+            logger.info(f"已从 posts 表初始化 {added} 个组合的历史产出")
+
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"定时爬取运行出错: {e}")
+            self._stop.wait(max(interval - (time.monotonic() - started), 0))
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    import argparse
+    from dotenv import load_dotenv
+    from reddit_scraper import RedditScraper, DEFAULT_SEARCH_PATTERNS, DEFAULT_SUBREDDITS
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='按历史产出分配预算的定时爬取')
+    parser.add_argument('--interval', type=int, default=3600, help='运行间隔（秒）')
+    parser.add_argument('--budget', type=int, default=60, help='每次运行的搜索请求页数')
+    parser.add_argument('--max-pages', type=int, default=5, help='单个组合每次最多页数')
+    parser.add_argument('--time-filter', default='week')
+    parser.add_argument('--skip-after', type=int, default=3, help='连续多少次无产出后跳过')
+    parser.add_argument('--subreddits', nargs='+', default=DEFAULT_SUBREDDITS)
+    parser.add_argument('--patterns', nargs='+', default=DEFAULT_SEARCH_PATTERNS)
+    parser.add_argument('--output-dir', default='reddit_data')
+    parser.add_argument('--once', action='store_true', help='只运行一次')
+    args = parser.parse_args()
+
+    scraper = RedditScraper(os.getenv("CLIENT_ID"), os.getenv("CLIENT_SECRET"),
+                            "SaaSOpportunityFinder/1.0", os.getenv("PROXY_URL"))
+    scheduler = CrawlScheduler(
+        scraper, args.subreddits, args.patterns,
+        output_dir=args.output_dir,
+        budget=args.budget,
+        max_pages=args.max_pages,
+        time_filter=args.time_filter,
+        skip_after=args.skip_after,
+    )
+
+    if args.once:
+        scheduler.store.bootstrap_from_posts()
+        scheduler.run_once()
+        return
+
+    try:
+        scheduler.run_forever(args.interval)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""多进程分片爬取
+
+协调者把 (子版块, 搜索模式) 矩阵拆成工作项写入基于 SQLite 的队列，
+N 个工作进程（各自使用一组 API 凭据）以租约方式领取工作项并调用
+RedditScraper.search_pair，结果统一交给单独的写入进程写入 reddit_data.db，
+避免多个进程同时写库造成的锁竞争。
+
+失败的工作项会重新排队，直到达到最大尝试次数；工作进程崩溃时，
+其持有的租约到期后会被其他进程重新领取。
+
+用法:
+    python sharded_crawl.py --workers 4 --limit 50
+    python sharded_crawl.py --workers 2 --subreddits SaaS startups --patterns "pain point"
+
+凭据：环境变量 REDDIT_CREDENTIALS 指向 JSON 文件（或直接为 JSON 字符串），
+格式为 [{"client_id": "...", "client_secret": "..."}, ...]；
+未设置时所有工作进程共用 CLIENT_ID / CLIENT_SECRET。
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = "reddit_data/crawl_queue.db"
+USER_AGENT = "SaaSOpportunityFinder/1.0"
+
+
+class WorkQueue:
+    """基于 SQLite 的工作队列，工作项以租约方式领取"""
+
+    def __init__(self, db_file=QUEUE_DB, lease_seconds=300, max_attempts=3):
+        self.db_file = db_file
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    subreddit TEXT NOT NULL,
+                    pattern TEXT NOT NULL,
+                    search_limit INTEGER,
+                    time_filter TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    result_count INTEGER,
+                    last_error TEXT,
+                    updated_at TIMESTAMP
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_crawl_queue_job_status ON crawl_queue (job_id, status)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, job_id, subreddits, patterns, limit, time_filter):
+        """把 (子版块, 搜索模式) 矩阵写入队列，返回工作项数量"""
+        items = [(job_id, s, p, limit, time_filter, datetime.now()) for s in subreddits for p in patterns]
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN')
+            conn.executemany('''
+                INSERT INTO crawl_queue (job_id, subreddit, pattern, search_limit, time_filter, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', items)
+            conn.execute('COMMIT')
+        return len(items)
+
+    def claim(self, job_id, owner):
+        """领取一个待处理或租约已过期的工作项，没有可领取的返回 None"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE 获取写锁，保证同一工作项不会被两个进程同时领取
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT * FROM crawl_queue
+                WHERE job_id = ?
+                  AND attempts < ?
+                  AND (status = 'pending' OR (status = 'leased' AND lease_expires_at < ?))
+                ORDER BY attempts, id
+                LIMIT 1
+            ''', (job_id, self.max_attempts, now)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute('''
+                UPDATE crawl_queue
+                SET status = 'leased', attempts = attempts + 1, lease_owner = ?,
+                    lease_expires_at = ?, updated_at = ?
+                WHERE id = ?
+            ''', (owner, now + self.lease_seconds, datetime.now(), row['id']))
+            conn.execute('COMMIT')
+            item = dict(row)
+            item['attempts'] += 1
+            return item
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, item_id, owner, result_count):
+        """标记工作项完成；租约已被他人接管时忽略"""
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                UPDATE crawl_queue
+                SET status = 'done', result_count = ?, lease_expires_at = NULL, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'leased'
+            ''', (result_count, datetime.now(), item_id, owner))
+
+    def fail(self, item_id, owner, error):
+        """标记工作项失败；未达到最大尝试次数时重新排队"""
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                UPDATE crawl_queue
+                SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END,
+                    last_error = ?, lease_expires_at = NULL, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'leased'
+            ''', (self.max_attempts, str(error)[:500], datetime.now(), item_id, owner))
+
+    def expire_exhausted(self, job_id):
+        """把租约已过期且尝试次数用尽的工作项标记为失败"""
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                UPDATE crawl_queue SET status = 'failed', last_error = COALESCE(last_error, '租约过期')
+                WHERE job_id = ? AND status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+            ''', (job_id, time.time(), self.max_attempts))
+
+    def has_outstanding(self, job_id):
+        """是否还有未完成（待处理或租约中）的工作项"""
+        with closing(self._connect()) as conn:
+            return conn.execute('''
+                SELECT 1 FROM crawl_queue
+                WHERE job_id = ? AND status IN ('pending', 'leased') AND attempts <= ?
+                LIMIT 1
+            ''', (job_id, self.max_attempts)).fetchone() is not None
+
+    def stats(self, job_id):
+        with closing(self._connect()) as conn:
+            rows = conn.execute('''
+                SELECT status, COUNT(*) AS items, COALESCE(SUM(result_count), 0) AS posts
+                FROM crawl_queue WHERE job_id = ? GROUP BY status
+            ''', (job_id,)).fetchall()
+        return {row['status']: {'items': row['items'], 'posts': row['posts']} for row in rows}
+
+
+def load_credentials():
+    """读取多组 API 凭据"""
+    raw = os.getenv("REDDIT_CREDENTIALS")
+    if raw:
+        if os.path.exists(raw):
+            with open(raw, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return json.loads(raw)
+    return [{'client_id': os.getenv("CLIENT_ID"), 'client_secret': os.getenv("CLIENT_SECRET")}]
+
+
+def _writer_process(result_queue, queue_db, lease_seconds, max_attempts, output_dir, batch_size):
+    """唯一的写库进程：写入帖子后再标记工作项完成"""
+    from reddit_scraper import ensure_schema, insert_records
+
+    work_queue = WorkQueue(queue_db, lease_seconds, max_attempts)
+    os.makedirs(output_dir, exist_ok=True)
+    conn = sqlite3.connect(f"{output_dir}/reddit_data.db", timeout=30)
+    ensure_schema(conn)
+
+    done = False
+    while not done:
+        batch = [result_queue.get()]
+        # 合并同一时刻到达的多个结果，减少事务次数
+        while len(batch) < batch_size:
+            try:
+                batch.append(result_queue.get_nowait())
+            except queue_module.Empty:
+                break
+
+        if None in batch:
+            done = True
+            batch = [item for item in batch if item is not None]
+        if not batch:
+            continue
+
+        with conn:
+            for _, _, posts in batch:
+                insert_records(conn, posts)
+        for item_id, owner, posts in batch:
+            work_queue.complete(item_id, owner, len(posts))
+
+    conn.close()
+
+
+def _worker_process(worker_index, job_id, credentials, reddit_kwargs, search_delay,
+                    queue_db, lease_seconds, max_attempts, result_queue, poll_interval):
+    """工作进程：循环领取工作项直到队列中没有未完成的工作"""
+    from reddit_scraper import RedditScraper
+
+    logging.basicConfig(level=logging.INFO)
+    owner = f"{os.getpid()}-{worker_index}"
+    work_queue = WorkQueue(queue_db, lease_seconds, max_attempts)
+    scraper = RedditScraper(credentials['client_id'], credentials['client_secret'], USER_AGENT,
+                            credentials.get('proxy_url') or os.getenv("PROXY_URL"), **reddit_kwargs)
+    if search_delay is not None:
+        scraper.search_delay = search_delay
+
+    while True:
+        item = work_queue.claim(job_id, owner)
+        if item is None:
+            work_queue.expire_exhausted(job_id)
+            if not work_queue.has_outstanding(job_id):
+                break
+            # 其他进程持有的租约可能过期，稍后重试
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            posts = scraper.search_pair(item['subreddit'], item['pattern'],
+                                        item['search_limit'], item['time_filter'])
+        except Exception as e:
+            logger.error(f"工作项 {item['id']} ({item['subreddit']}, '{item['pattern']}') 失败: {e}")
+            work_queue.fail(item['id'], owner, e)
+            continue
+
+        result_queue.put((item['id'], owner, posts))
+
+
+def run_sharded_crawl(subreddit_names, patterns, workers=4, limit=100, time_filter='month',
+                      output_dir="reddit_data", credentials=None, reddit_kwargs=None,
+                      search_delay=None, queue_db=QUEUE_DB, lease_seconds=300, max_attempts=3,
+                      poll_interval=1.0, writer_batch_size=16):
+    """
+    运行一次分片爬取
+
+    Args:
+        subreddit_names: 子版块名称列表
+        patterns: 搜索模式列表
+        workers: 工作进程数
+        credentials: 凭据列表，工作进程按序号轮流使用；默认由 load_credentials() 读取
+        reddit_kwargs: 传给 praw.Reddit 的其他配置
+        search_delay: 覆盖每次搜索后的休眠时长
+        lease_seconds: 租约时长，超时未完成的工作项会被重新领取
+        max_attempts: 每个工作项的最大尝试次数
+
+    Returns:
+        dict: job_id、耗时以及各状态的工作项/帖子统计
+    """
+    credentials = credentials or load_credentials()
+    reddit_kwargs = reddit_kwargs or {}
+    job_id = uuid.uuid4().hex[:12]
+
+    work_queue = WorkQueue(queue_db, lease_seconds, max_attempts)
+    total = work_queue.enqueue(job_id, subreddit_names, patterns, limit, time_filter)
+    logger.info(f"分片爬取任务 {job_id}: {total} 个工作项, {workers} 个工作进程")
+
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    start = time.perf_counter()
+
+    writer = ctx.Process(target=_writer_process, name='crawl-writer',
+                         args=(result_queue, queue_db, lease_seconds, max_attempts, output_dir, writer_batch_size))
+    writer.start()
+
+    processes = []
+    for i in range(workers):
+        process = ctx.Process(target=_worker_process, name=f'crawl-worker-{i}', args=(
+            i, job_id, credentials[i % len(credentials)], reddit_kwargs, search_delay,
+            queue_db, lease_seconds, max_attempts, result_queue, poll_interval,
+        ))
+        process.start()
+        processes.append(process)
+
+    for process in processes:
+        process.join()
+
+    # 所有工作进程结束后通知写入进程退出
+    result_queue.put(None)
+    writer.join()
+
+    elapsed = time.perf_counter() - start
+    stats = work_queue.stats(job_id)
+    posts = sum(s['posts'] for s in stats.values())
+    logger.info(f"分片爬取任务 {job_id} 完成: {posts} 个帖子, 耗时 {elapsed:.1f}s, 状态 {stats}")
+
+    return {
+        'job_id': job_id,
+        'workers': workers,
+        'items': total,
+        'seconds': elapsed,
+        'posts': posts,
+        'stats': stats,
+    }
+
+
+def main():
+    import argparse
+    from dotenv import load_dotenv
+    from reddit_scraper import DEFAULT_SEARCH_PATTERNS, DEFAULT_SUBREDDITS
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='多进程分片爬取')
+    parser.add_argument('--workers', type=int, default=4, help='工作进程数')
+    parser.add_argument('--subreddits', nargs='+', default=DEFAULT_SUBREDDITS)
+    parser.add_argument('--patterns', nargs='+', default=DEFAULT_SEARCH_PATTERNS)
+    parser.add_argument('--limit', type=int, default=50, help='每个搜索模式的结果限制')
+    parser.add_argument('--time-filter', default='month')
+    parser.add_argument('--output-dir', default='reddit_data')
+    parser.add_argument('--lease-seconds', type=int, default=300)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    args = parser.parse_args()
+
+    result = run_sharded_crawl(
+        args.subreddits, args.patterns,
+        workers=args.workers,
+        limit=args.limit,
+        time_filter=args.time_filter,
+        output_dir=args.output_dir,
+        queue_db=f"{args.output_dir}/crawl_queue.db",
+        lease_seconds=args.lease_seconds,
+        max_attempts=args.max_attempts,
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
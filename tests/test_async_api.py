@@ -0,0 +1,53 @@
+"""ASGI 读取 API 的 /metrics 接口"""
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from async_api import ReadAPI
+from reddit_scraper import ensure_schema
+
+
+@pytest.fixture
+def api(tmp_path):
+    db_file = str(tmp_path / 'reddit_data.db')
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+    api = ReadAPI(db_file, pool_size=2)
+    yield api
+    api.shutdown()
+
+
+def get(api, path):
+    """直接调用 ASGI 应用，返回 (状态码, 响应头, 响应体)"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b''}
+    asyncio.run(api(scope, receive, send))
+    start, body = messages
+    return start['status'], dict(start['headers']), body['body']
+
+
+def test_metrics_endpoint_renders_prometheus_text(api):
+    status, _, body = get(api, '/api/posts')
+    assert status == 200
+    assert json.loads(body)['total_count'] == 0
+
+    status, headers, body = get(api, '/metrics')
+    assert status == 200
+    assert headers[b'content-type'] == b'text/plain; version=0.0.4; charset=utf-8'
+    assert 'asgi_requests_total{method="GET",route="/api/posts",status="200"}' in body.decode('utf-8')
+
+
+def test_unknown_route_is_json(api):
+    status, headers, body = get(api, '/nope')
+    assert status == 404
+    assert headers[b'content-type'] == b'application/json; charset=utf-8'
+    assert json.loads(body) == {'error': '接口不存在'}
@@ -0,0 +1,194 @@
+"""检查点：中断后从 after 游标继续，不重复请求已完成的页"""
+from types import SimpleNamespace
+
+import pytest
+
+from checkpoints import CheckpointStore
+from reddit_scraper import RedditScraper, run_crawl
+
+SUBREDDIT = 'SaaS'
+PATTERN = 'is there a tool'
+PAGE_SIZE = 100
+
+
+def make_posts(n):
+    """n 个搜索结果，偶数编号的帖子与搜索模式相关"""
+    return [
+        SimpleNamespace(
+            id=f"p{i:04d}",
+            title=f"{PATTERN} for invoices #{i}" if i % 2 == 0 else f"unrelated #{i}",
+            selftext='',
+            score=i,
+            num_comments=0,
+            created_utc=1700000000 + i,
+            author='someone',
+            permalink=f"/r/{SUBREDDIT}/comments/p{i:04d}/",
+            upvote_ratio=1.0,
+            is_self=True,
+            domain=f"self.{SUBREDDIT}",
+        )
+        for i in range(n)
+    ]
+
+
+class FakeListing:
+    """模拟 praw ListingGenerator：按页请求，params['after'] 为翻页游标，每次请求替换 _listing"""
+
+    def __init__(self, reddit, limit, params):
+        self.reddit = reddit
+        self.limit = limit
+        self.params = dict(params)
+        self._listing = None
+
+    def __iter__(self):
+        ids = [post.id for post in self.reddit.posts]
+        after = self.params.get('after')
+        start = ids.index(after) + 1 if after else 0
+        yielded = 0
+        while yielded < self.limit:
+            self.reddit.requests.append(self.params.get('after'))
+            if len(self.reddit.requests) in self.reddit.fail_requests:
+                raise ConnectionError('模拟的网络错误')
+            page = self.reddit.posts[start:start + PAGE_SIZE]
+            if not page:
+                return
+            self._listing = page
+            self.params['after'] = page[-1].id
+            for post in page:
+                if yielded >= self.limit:
+                    return
+                yield post
+                yielded += 1
+            start += PAGE_SIZE
+
+
+class FakeReddit:
+    def __init__(self, posts, fail_requests=()):
+        self.posts = posts
+        self.fail_requests = set(fail_requests)
+        self.requests = []
+
+    def subreddit(self, name):
+        return SimpleNamespace(
+            search=lambda pattern, limit, time_filter, sort, params: FakeListing(self, limit, params))
+
+
+def make_scraper(reddit):
+    scraper = RedditScraper.__new__(RedditScraper)
+    scraper.reddit = reddit
+    scraper.search_delay = 0
+    scraper.search_patterns = [PATTERN]
+    return scraper
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(str(tmp_path))
+
+
+def test_resume_continues_from_last_page(store):
+    posts = make_posts(250)
+    relevant = [post.id for post in posts if int(post.id[1:]) % 2 == 0]
+    run_id = store.create_run({'subreddits': [SUBREDDIT], 'patterns': [PATTERN]})
+
+    # 第三页请求失败：前两页已写库，检查点停在第二页末尾
+    first = FakeReddit(posts, fail_requests={3})
+    saved = make_scraper(first).search_posts([SUBREDDIT], limit=250, checkpoint=store.checkpoint(run_id))
+    assert sorted(post.id for post in saved) == relevant[:100]
+
+    state = store.checkpoint(run_id).state(SUBREDDIT, PATTERN)
+    assert (state.after, state.fetched, state.flushed, state.done) == ('p0199', 200, 100, False)
+
+    # 恢复时只请求剩下的一页
+    assert store.claim_run(run_id, stale_seconds=0)
+    second = FakeReddit(posts)
+    saved = make_scraper(second).search_posts([SUBREDDIT], limit=250, checkpoint=store.checkpoint(run_id))
+    assert second.requests == ['p0199']
+    assert sorted(post.id for post in saved) == relevant
+
+    state = store.checkpoint(run_id).state(SUBREDDIT, PATTERN)
+    assert (state.fetched, state.flushed, state.done) == (250, 125, True)
+
+
+def test_completed_pairs_are_skipped(store):
+    posts = make_posts(50)
+    run_id = store.create_run({'subreddits': [SUBREDDIT], 'patterns': [PATTERN]})
+    make_scraper(FakeReddit(posts)).search_posts([SUBREDDIT], limit=50, checkpoint=store.checkpoint(run_id))
+
+    again = FakeReddit(posts)
+    saved = make_scraper(again).search_posts([SUBREDDIT], limit=50, checkpoint=store.checkpoint(run_id))
+    assert again.requests == []
+    assert len(saved) == 25
+
+
+def test_active_run_cannot_be_claimed(store):
+    run_id = store.create_run({'subreddits': [SUBREDDIT], 'patterns': [PATTERN]})
+    assert not store.claim_run(run_id)
+
+    store.set_status(run_id, 'failed', 'interrupted')
+    assert store.claim_run(run_id)
+    assert store.get_run(run_id)['status'] == 'running'
+    assert not store.claim_run(run_id)
+
+
+def test_read_only_listing_creates_nothing(tmp_path):
+    output_dir = tmp_path / 'missing'
+    assert CheckpointStore(str(output_dir), read_only=True).list_runs() == []
+    assert not output_dir.exists()
+
+
+def crawl_scraper(posts):
+    """run_crawl 用的爬虫：搜索走 FakeReddit，评论和写文件只记录调用"""
+    reddit = FakeReddit(posts)
+    scraper = make_scraper(reddit)
+    scraper.calls = []
+    scraper.get_comments = lambda post_ids, max_comments: scraper.calls.append(('comments', len(post_ids))) or []
+    scraper.save_to_files = lambda posts, comments, output_dir, posts_saved: (
+        scraper.calls.append(('save', len(posts), posts_saved)) or ('posts.csv', 'posts.json'))
+    return scraper
+
+
+def test_run_crawl_uses_stored_params_with_defaults(store, tmp_path):
+    # 命令行旧版本创建的爬取没有 get_comments 等参数
+    run_id = store.create_run({'subreddits': [SUBREDDIT], 'patterns': [PATTERN], 'limit': 120,
+                               'time_filter': 'week'})
+    scraper = crawl_scraper(make_posts(250))
+    result = run_crawl(scraper, store, run_id, store.get_run(run_id)['params'], output_dir=str(tmp_path))
+
+    assert len(result['posts']) == 60
+    assert scraper.calls == [('comments', 20), ('save', 60, True)]
+    assert store.get_run(run_id)['status'] == 'completed'
+    assert result['metrics_file'].endswith(f"_{run_id}.json")
+
+
+def test_resume_uses_stored_limit(store, tmp_path):
+    posts = make_posts(250)
+    params = {'subreddits': [SUBREDDIT], 'patterns': [PATTERN], 'limit': 150, 'get_comments': False}
+    run_id = store.create_run(params)
+    first = FakeReddit(posts, fail_requests={2})
+    make_scraper(first).search_posts([SUBREDDIT], limit=150, checkpoint=store.checkpoint(run_id))
+
+    store.set_status(run_id, 'failed', 'interrupted')
+    assert store.claim_run(run_id)
+    scraper = crawl_scraper(posts)
+    result = run_crawl(scraper, store, run_id, store.get_run(run_id)['params'], output_dir=str(tmp_path))
+
+    # 从第二页继续，只取到第 150 条
+    assert scraper.reddit.requests == ['p0099']
+    assert len(result['posts']) == 75
+    assert scraper.calls == [('save', 75, True)]
+
+
+def test_failed_crawl_is_marked_failed(store, tmp_path):
+    run_id = store.create_run({'subreddits': [SUBREDDIT], 'patterns': [PATTERN], 'get_comments': False})
+    scraper = crawl_scraper(make_posts(10))
+    scraper.save_to_files = lambda *args, **kwargs: 1 / 0
+    with pytest.raises(ZeroDivisionError):
+        run_crawl(scraper, store, run_id, store.get_run(run_id)['params'], output_dir=str(tmp_path))
+    assert store.get_run(run_id)['status'] == 'failed'
+
+
+def test_force_claims_running_run(store):
+    run_id = store.create_run({'subreddits': [SUBREDDIT], 'patterns': [PATTERN]})
+    assert not store.claim_run(run_id)
+    assert store.claim_run(run_id, force=True)
@@ -0,0 +1,83 @@
+"""写入评论时的帖子评论聚合"""
+import json
+import sqlite3
+
+import pytest
+
+import comment_stats
+from records import CommentRecord, PostRecord
+from reddit_scraper import ensure_schema, insert_records
+
+
+def post(post_id):
+    return PostRecord(post_id, 'title', 'content', 1, 0, 1700000000, 'op', 'SaaS', '', 'is there a tool',
+                      1.0, True, 'self.SaaS', None)
+
+
+def comment(comment_id, post_id, body, score=1, author='someone'):
+    return CommentRecord(comment_id, post_id, body, score, 1700000000, author)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'reddit_data.db'))
+    conn.row_factory = sqlite3.Row
+    ensure_schema(conn)
+    yield conn
+    conn.close()
+
+
+def stats(conn, post_id):
+    row = conn.execute('SELECT * FROM post_comment_stats WHERE post_id = ?', (post_id,)).fetchone()
+    return dict(row) if row else None
+
+
+@pytest.mark.parametrize('text, products, urls', [
+    ('We moved from trello to Notion and ZAPIER', ['Trello', 'Notion', 'Zapier'], []),
+    ('I took notion of it', [], []),
+    ('zoom in on the data, I excel at this', [], []),
+    ('Zoom calls and Excel sheets', ['Zoom', 'Excel'], []),
+    ('try notion.so/templates or https://airtable.com.', [], ['notion.so/templates', 'https://airtable.com']),
+    ('Google Sheets beats excel-lent spreadsheets; see Monday.com', ['Google Sheets', 'Monday.com'], []),
+])
+def test_extract_mentions(text, products, urls):
+    assert comment_stats.extract_mentions(text) == (products, urls)
+
+
+def test_insert_records_updates_stats(conn):
+    insert_records(conn, [post('p1'), post('p2')], [
+        comment('c1', 'p1', 'Use Airtable', score=5, author='a'),
+        comment('c2', 'p1', 'Airtable or Zapier: https://zapier.com', score=-3, author='b'),
+        comment('c3', 'p1', 'no idea', score=2, author='a'),
+    ])
+
+    row = stats(conn, 'p1')
+    assert (row['comment_count'], row['unique_authors'], row['total_score'], row['top_score']) == (3, 2, 4, 5)
+    assert row['top_comment_id'] == 'c1'
+    assert row['recommendation_count'] == 2
+    assert json.loads(row['products']) == {'Airtable': 2, 'Zapier': 1}
+    assert json.loads(row['urls']) == ['https://zapier.com']
+    assert row['engagement'] == 3 + 4
+    assert stats(conn, 'p2') is None
+
+    # 新评论写入后重新计算整个帖子的聚合
+    insert_records(conn, [], [comment('c4', 'p1', 'Notion', score=10, author='c')])
+    row = stats(conn, 'p1')
+    assert (row['comment_count'], row['top_comment_id'], row['recommendation_count']) == (4, 'c4', 3)
+
+
+def test_archived_comments_keep_existing_stats(conn):
+    insert_records(conn, [post('p1'), post('p2')], [
+        comment('c1', 'p1', 'Use Airtable'),
+        comment('c2', 'p2', 'Use Trello'),
+    ])
+    before = stats(conn, 'p1')
+    # retention.py 归档后评论正文为 NULL
+    conn.execute("UPDATE comments SET body = NULL WHERE post_id = 'p1'")
+
+    comment_stats.update_post_stats(conn, ['p1'])
+    assert stats(conn, 'p1') == before
+
+    assert comment_stats.rebuild(conn) == 1
+    assert stats(conn, 'p1') == before
+    assert json.loads(stats(conn, 'p2')['products']) == {'Trello': 1}
@@ -0,0 +1,72 @@
+"""流式批量导出"""
+import csv
+import io
+import json
+import sqlite3
+
+import pytest
+
+import export
+from records import CommentRecord, PostRecord
+from reddit_scraper import ensure_schema, insert_records
+
+
+def post(post_id, score, subreddit='SaaS'):
+    return PostRecord(post_id, f"title {post_id}", f"content {post_id}", score, 3, 1700000000, 'op',
+                      subreddit, '', 'is there a tool', 1.0, True, f"self.{subreddit}", None)
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = str(tmp_path / 'reddit_data.db')
+    posts = [post(f"p{i}", score=i) for i in range(5)] + [post('other', 100, subreddit='webdev')]
+    comments = [CommentRecord(f"p{i}-c{n}", f"p{i}", f"comment {n}", n, 1700000000, 'someone')
+                for i in range(5) for n in range(3)]
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        insert_records(conn, posts, comments)
+    return db_file
+
+
+def export_bytes(db_file, fmt, **kwargs):
+    return b''.join(export.stream_export(db_file, fmt, **kwargs))
+
+
+def ndjson_rows(db_file, **kwargs):
+    return [json.loads(line) for line in export_bytes(db_file, 'ndjson', **kwargs).splitlines()]
+
+
+def test_csv_header_without_results(db_file):
+    body = export_bytes(db_file, 'csv', filters={'subreddit': 'missing', 'search_pattern': '', 'min_score': 0,
+                                                 'sort': 'score_desc'})
+    [header] = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+    assert header[:3] == ['id', 'title', 'content']
+
+
+def test_csv_rows_across_chunks(db_file):
+    body = export_bytes(db_file, 'csv', chunk_size=2)
+    rows = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+    assert rows[0][0] == 'id'
+    assert sorted(row[0] for row in rows[1:]) == ['other', 'p0', 'p1', 'p2', 'p3', 'p4']
+
+
+def test_limit_applies_to_posts_not_joined_rows(db_file):
+    filters = {'subreddit': 'SaaS', 'search_pattern': '', 'min_score': 0, 'sort': 'score_desc'}
+    rows = ndjson_rows(db_file, filters=filters, with_comments=True, limit=2, chunk_size=4)
+    # 两个帖子，每个 3 条评论
+    assert len(rows) == 6
+    assert [row['id'] for row in rows] == ['p4'] * 3 + ['p3'] * 3
+    assert [row['comment_score'] for row in rows[:3]] == [2, 1, 0]
+
+    assert [row['id'] for row in ndjson_rows(db_file, filters=filters, limit=2)] == ['p4', 'p3']
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'fmt': 'xml'},
+    {'fmt': 'csv', 'chunk_size': 0},
+    {'fmt': 'ndjson', 'chunk_size': -1},
+])
+def test_invalid_arguments_rejected_on_call(db_file, kwargs):
+    # 参数在创建生成器时就校验，而不是在开始迭代后
+    with pytest.raises(ValueError):
+        export.stream_export(db_file, **kwargs)
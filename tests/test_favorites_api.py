@@ -0,0 +1,100 @@
+"""批量收藏接口和收藏状态缓存"""
+import sqlite3
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+import favorites_api
+from reddit_scraper import ensure_schema
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'reddit_data.db')
+    with sqlite3.connect(db_file) as conn:
+        ensure_schema(conn)
+        conn.executemany('INSERT INTO posts (id, title) VALUES (?, ?)',
+                         [(f"p{i}", f"post {i}") for i in range(5)])
+    monkeypatch.setattr(favorites_api, 'DB_PATH', db_file)
+    favorites_api.favorite_ids.invalidate()
+
+    app = flask.Flask(__name__)
+    app.register_blueprint(favorites_api.favorites_api)
+    return app.test_client()
+
+
+def favorited(client, *ids):
+    return client.get(f"/api/favorites/status?ids={','.join(ids)}").get_json()
+
+
+def test_batch_upsert_is_idempotent(client):
+    response = client.post('/api/favorites/batch', json={'favorite': ['p0', 'p1', 'p1', 'missing']})
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'favorited': 2, 'unfavorited': 0, 'missing': ['missing']}
+
+    # 重复收藏不报错，也不会新增
+    response = client.post('/api/favorites/batch', json={'favorite': ['p0', 'p2']})
+    assert response.get_json()['favorited'] == 1
+    assert favorited(client, 'p0', 'p1', 'p2', 'p3') == {'p0': True, 'p1': True, 'p2': True, 'p3': False}
+
+
+def test_batch_add_and_remove_in_one_request(client):
+    client.post('/api/favorites/batch', json={'favorite': ['p0', 'p1']})
+    response = client.post('/api/favorites/batch', json={'favorite': ['p3'], 'unfavorite': ['p0', 'p4']})
+    assert response.get_json() == {'success': True, 'favorited': 1, 'unfavorited': 1, 'missing': []}
+    assert favorited(client, 'p0', 'p1', 'p3', 'p4') == {'p0': False, 'p1': True, 'p3': True, 'p4': False}
+
+
+def test_batch_rejects_empty_and_oversized_requests(client, monkeypatch):
+    assert client.post('/api/favorites/batch', json={}).status_code == 400
+
+    monkeypatch.setattr(favorites_api, 'MAX_BATCH_SIZE', 2)
+    response = client.post('/api/favorites/batch', json={'favorite': ['p0', 'p1', 'p2']})
+    assert response.status_code == 400
+    assert favorited(client, 'p0') == {'p0': False}
+
+
+@pytest.mark.parametrize('payload', [
+    {'favorite': 'p1'},
+    {'favorite': [{'id': 'p1'}]},
+    {'favorite': ['p1', 2]},
+    {'unfavorite': ['']},
+    ['p1'],
+    'p1',
+])
+def test_batch_rejects_malformed_payloads(client, payload):
+    response = client.post('/api/favorites/batch', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert favorited(client, 'p1') == {'p1': False}
+
+
+def test_batch_rejects_non_json_body(client):
+    response = client.post('/api/favorites/batch', data='favorite=p1')
+    assert response.status_code == 400
+
+
+def test_toggle_invalidates_cached_ids(client):
+    assert favorited(client, 'p0') == {'p0': False}
+    assert client.post('/api/favorite', json={'post_id': 'p0'}).get_json()['status'] == 'favorited'
+    assert 'p0' in favorites_api.favorite_ids
+    assert client.post('/api/favorite', json={'post_id': 'p0'}).get_json()['status'] == 'unfavorited'
+    assert 'p0' not in favorites_api.favorite_ids
+    assert client.post('/api/favorite', json={'post_id': 'missing'}).status_code == 404
+
+
+def test_cached_ids_expire_after_ttl(client, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(favorites_api.time, 'monotonic', lambda: now[0])
+    favorites_api.favorite_ids.invalidate()
+    assert favorited(client, 'p0') == {'p0': False}
+
+    # 其他进程直接写库，本进程的缓存在 CACHE_TTL 内不变
+    with sqlite3.connect(favorites_api.DB_PATH) as conn:
+        conn.execute("INSERT INTO favorites (post_id) VALUES ('p0')")
+    now[0] += favorites_api.CACHE_TTL - 1
+    assert favorited(client, 'p0') == {'p0': False}
+
+    now[0] += 1
+    assert favorited(client, 'p0') == {'p0': True}
@@ -0,0 +1,121 @@
+"""Reddit API 响应的磁盘缓存"""
+import pytest
+
+requests = pytest.importorskip('requests')
+
+import http_cache
+from http_cache import CacheMiss, CachedSession
+
+SEARCH_URL = 'https://oauth.reddit.com/r/SaaS/search'
+COMMENTS_URL = 'https://oauth.reddit.com/comments/abc123'
+TOKEN_URL = 'https://www.reddit.com/api/v1/access_token'
+
+
+class StubAdapter(requests.adapters.BaseAdapter):
+    """不访问网络的传输层：记录请求，返回带限流响应头的 JSON"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request.url)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = requests.structures.CaseInsensitiveDict({
+            'Content-Type': 'application/json',
+            'X-Ratelimit-Remaining': '0',
+            'X-Ratelimit-Reset': '600',
+        })
+        response._content = f'{{"n": {len(self.requests)}}}'.encode('utf-8')
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / 'http_cache.db')
+
+
+def session(cache_file, mode='read-write'):
+    session = CachedSession(cache_file, mode=mode)
+    adapter = StubAdapter()
+    session.mount('https://', adapter)
+    return session, adapter
+
+
+def test_cached_response_strips_ratelimit_headers(cache_file):
+    online, adapter = session(cache_file)
+    first = online.get(SEARCH_URL, params={'q': 'tool', 'limit': 100})
+    assert first.headers['X-Ratelimit-Remaining'] == '0'
+
+    # 参数顺序不同也命中同一条缓存
+    second = online.get(SEARCH_URL, params={'limit': 100, 'q': 'tool'})
+    assert len(adapter.requests) == 1
+    assert second.json() == first.json() == {'n': 1}
+    assert second.headers['Content-Type'] == 'application/json'
+    assert not any(name.lower().startswith('x-ratelimit') for name in second.headers)
+
+
+def test_ttl_per_endpoint(cache_file, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_cache.time, 'time', lambda: now[0])
+    online, adapter = session(cache_file)
+    online.get(SEARCH_URL, params={'q': 'tool'})
+    online.get(COMMENTS_URL)
+
+    # 搜索 6 小时过期，评论 24 小时内仍有效
+    now[0] += 6 * 3600 + 1
+    online.get(SEARCH_URL, params={'q': 'tool'})
+    online.get(COMMENTS_URL)
+    assert len(adapter.requests) == 3
+    assert adapter.requests[-1].startswith(SEARCH_URL)
+
+    now[0] += 18 * 3600
+    online.get(COMMENTS_URL)
+    assert len(adapter.requests) == 4
+
+
+def test_offline_replays_and_raises_on_miss(cache_file, monkeypatch):
+    online, _ = session(cache_file)
+    online.get(SEARCH_URL, params={'q': 'tool'})
+
+    # 离线回放忽略有效期
+    monkeypatch.setattr(http_cache.time, 'time', lambda: 10 ** 12)
+    offline, adapter = session(cache_file, mode='offline')
+    assert offline.get(SEARCH_URL, params={'q': 'tool'}).json() == {'n': 1}
+    with pytest.raises(CacheMiss):
+        offline.get(SEARCH_URL, params={'q': 'other'})
+    with pytest.raises(CacheMiss):
+        offline.post('https://oauth.reddit.com/api/comment', data={'text': 'hi'})
+    assert adapter.requests == []
+
+
+def test_offline_fakes_token(cache_file):
+    offline, adapter = session(cache_file, mode='offline')
+    response = offline.post(TOKEN_URL, data={'grant_type': 'client_credentials'})
+    assert response.status_code == 200
+    assert response.json()['access_token'] == 'offline-replay'
+    assert adapter.requests == []
+
+
+def test_refresh_always_requests(cache_file):
+    online, _ = session(cache_file)
+    online.get(SEARCH_URL, params={'q': 'tool'})
+
+    refresh, adapter = session(cache_file, mode='refresh')
+    assert refresh.get(SEARCH_URL, params={'q': 'tool'}).json() == {'n': 1}
+    assert len(adapter.requests) == 1
+
+    # 刷新后的响应写回缓存
+    offline, _ = session(cache_file, mode='offline')
+    assert offline.get(SEARCH_URL, params={'q': 'tool'}).json() == {'n': 1}
+
+
+def test_unknown_mode_is_rejected(cache_file):
+    with pytest.raises(ValueError):
+        CachedSession(cache_file, mode='write-only')
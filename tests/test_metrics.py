@@ -0,0 +1,48 @@
+"""单次爬取的指标收集"""
+import json
+import threading
+
+import metrics
+
+REQUESTS = metrics.counter('test_collect_requests_total', '测试计数器', ('endpoint',))
+LATENCY = metrics.histogram('test_collect_latency_seconds', '测试直方图')
+
+
+def crawl(n, results):
+    with metrics.collect() as registry:
+        for _ in range(n):
+            REQUESTS.inc(endpoint='search')
+            LATENCY.observe(0.01)
+        results[n] = registry.snapshot()
+
+
+def test_concurrent_collections_do_not_mix():
+    before = REQUESTS.snapshot().get('endpoint=search', 0)
+    results = {}
+    threads = [threading.Thread(target=crawl, args=(n, results)) for n in (3, 7)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for n in (3, 7):
+        assert results[n]['test_collect_requests_total']['values'] == {'endpoint=search': n}
+        assert results[n]['test_collect_latency_seconds']['values']['']['count'] == n
+    # 全局注册表照常累计
+    assert REQUESTS.snapshot()['endpoint=search'] == before + 10
+
+
+def test_nested_collections_and_report(tmp_path):
+    with metrics.collect() as outer:
+        REQUESTS.inc(endpoint='outer')
+        with metrics.collect() as inner:
+            REQUESTS.inc(endpoint='inner')
+    assert outer.snapshot()['test_collect_requests_total']['values'] == {'endpoint=outer': 1, 'endpoint=inner': 1}
+    assert inner.snapshot()['test_collect_requests_total']['values'] == {'endpoint=inner': 1}
+
+    REQUESTS.inc(endpoint='outside')
+    assert 'endpoint=outside' not in outer.snapshot()['test_collect_requests_total']['values']
+
+    path = metrics.write_report(str(tmp_path / 'report.json'), registry=inner)
+    with open(path, encoding='utf-8') as f:
+        assert list(json.load(f)['metrics']) == ['test_collect_requests_total']
@@ -0,0 +1,160 @@
+"""正文归档、读回和 dry run"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import export
+import queries
+import retention
+from records import CommentRecord, PostRecord, dump_json
+from reddit_scraper import ensure_schema, insert_records
+
+OLD = datetime(2020, 1, 1).timestamp()
+
+
+def post(post_id, score=1, created=OLD):
+    return PostRecord(post_id, f"title {post_id}", f"body of {post_id} " * 20, score, 2, created, 'op',
+                      'SaaS', '', 'is there a tool', 1.0, True, 'self.SaaS', datetime.now())
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    posts = [post(f"p{i:02d}") for i in range(12)]
+    posts.append(post('recent', created=datetime.now().timestamp()))
+    posts.append(post('popular', score=50))
+    posts.append(post('favourite'))
+    comments = [CommentRecord(f"{p.id}-c{n}", p.id, f"Try Airtable for {p.id} #{n}", n, OLD, 'someone')
+                for p in posts for n in range(2)]
+    with sqlite3.connect(str(tmp_path / 'reddit_data.db')) as conn:
+        ensure_schema(conn)
+        insert_records(conn, posts, comments)
+        conn.execute("INSERT INTO favorites (post_id) VALUES ('favourite')")
+    return str(tmp_path)
+
+
+def policy():
+    # 小批量，覆盖分页归档
+    return retention.RetentionPolicy(keep_files_days=None, http_cache_days=None, batch_size=5)
+
+
+def connect(output_dir):
+    conn = sqlite3.connect(os.path.join(output_dir, 'reddit_data.db'))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_dry_run_is_read_only(output_dir):
+    with connect(output_dir) as conn:
+        schema = conn.execute('SELECT name FROM sqlite_master ORDER BY name').fetchall()
+
+    report = retention.apply_retention(output_dir, policy(), dry_run=True)
+    assert report['archived']['posts']['rows'] == 12
+    assert report['archived']['comments']['rows'] == 24
+    assert report['metrics'] == {}
+
+    assert not os.path.exists(os.path.join(output_dir, 'archive.db'))
+    with connect(output_dir) as conn:
+        assert conn.execute('SELECT name FROM sqlite_master ORDER BY name').fetchall() == schema
+        assert conn.execute('SELECT COUNT(*) FROM posts WHERE content IS NULL').fetchone()[0] == 0
+
+
+def test_dry_run_without_database(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        retention.apply_retention(str(tmp_path / 'missing'), policy(), dry_run=True)
+    assert not (tmp_path / 'missing').exists()
+
+
+def test_archive_and_restore(output_dir):
+    with connect(output_dir) as conn:
+        original = {row['id']: row['content'] for row in conn.execute('SELECT id, content FROM posts')}
+        stats_before = conn.execute('SELECT * FROM post_comment_stats ORDER BY post_id').fetchall()
+
+    report = retention.apply_retention(output_dir, policy())
+    assert report['archived']['posts']['rows'] == 12
+    assert report['archived']['comments']['rows'] == 24
+    # 报告包含本次运行的指标增量
+    assert report['metrics']['retention_archived_rows_total']['values'] == {'kind=comment': 24, 'kind=post': 12}
+    json.dumps(report)
+
+    with connect(output_dir) as conn:
+        archived = {row[0] for row in conn.execute('SELECT id FROM posts WHERE content IS NULL')}
+        assert archived == {f"p{i:02d}" for i in range(12)}
+        assert conn.execute('SELECT COUNT(*) FROM comments WHERE body IS NULL').fetchone()[0] == 24
+        # 评论聚合在归档前写入，保持不变
+        assert conn.execute('SELECT * FROM post_comment_stats ORDER BY post_id').fetchall() == stats_before
+
+        # 共用查询层从 archive.db 读回正文
+        detail, comments, _ = queries.get_post_detail(conn, 'p03')
+        assert detail['content'] == original['p03']
+        assert [c['body'] for c in comments] == ['Try Airtable for p03 #1', 'Try Airtable for p03 #0']
+
+        posts, total = queries.list_posts(conn, {'sort': 'score_asc'}, per_page=100)
+        assert total == 15
+        assert {p['id']: p['content'] for p in posts} == original
+
+        results = queries.search_posts(conn, 'title p07')
+        assert results[0]['content'] == original['p07'][:200] + '...'
+
+    # 导出同样读回正文
+    rows = [json.loads(line) for line in b''.join(export.stream_export(
+        os.path.join(output_dir, 'reddit_data.db'), 'ndjson', with_comments=True, chunk_size=4)).splitlines()]
+    assert len(rows) == 30
+    assert all(row['content'] == original[row['id']] for row in rows)
+    assert all(row['comment_body'].startswith('Try Airtable') for row in rows)
+
+    # 再次运行没有新的可归档内容
+    report = retention.apply_retention(output_dir, policy())
+    assert report['archived']['posts']['rows'] == 0
+    assert report['archived']['comments']['rows'] == 0
+
+
+def test_load_archived_text_in_chunks(tmp_path):
+    archive_file = str(tmp_path / 'archive.db')
+    conn = sqlite3.connect(':memory:', isolation_level=None)
+    retention.ensure_archive(conn, archive_file)
+    codec, compress = retention._codec()
+    conn.executemany('INSERT INTO archive.text_archive VALUES (?, ?, ?, ?, ?, ?)',
+                     [('comment', f"c{i}", codec, compress(f"text {i}".encode()), 6, datetime.now())
+                      for i in range(1200)])
+    conn.close()
+
+    texts = retention.load_archived_text(archive_file, 'comment', [f"c{i}" for i in range(1200)] + ['c0'])
+    assert len(texts) == 1200
+    assert texts['c1199'] == 'text 1199'
+    assert retention.load_archived_text(archive_file, 'post', ['c0']) == {}
+
+
+def write_crawl_files(output_dir, timestamp, post_id, comment_ids=None):
+    """模拟 save_to_files 写出的一批文件"""
+    with open(os.path.join(output_dir, f"reddit_posts_{timestamp}.json"), 'w', encoding='utf-8') as f:
+        dump_json([post(post_id)], f)
+    with open(os.path.join(output_dir, f"reddit_posts_{timestamp}.csv"), 'w', encoding='utf-8') as f:
+        f.write(f"id,title\n{post_id},title {post_id}\n")
+    if comment_ids is not None:
+        with open(os.path.join(output_dir, f"reddit_comments_{timestamp}.csv"), 'w', encoding='utf-8') as f:
+            f.write('comment_id,post_id,body\n' + ''.join(f"{c},{post_id},text\n" for c in comment_ids))
+
+
+def test_sibling_csv_files_are_pruned(output_dir):
+    import utils
+
+    write_crawl_files(output_dir, '20200101_000000', 'p00', ['p00-c0', 'p00-c1'])
+    # 评论不在数据库中的 CSV 不能删除
+    write_crawl_files(output_dir, '20200102_000000', 'p01', ['unknown-comment'])
+    utils.import_all_files_to_sqlite(output_dir)
+
+    # 旧版本只记录了 JSON
+    write_crawl_files(output_dir, '20200103_000000', 'p02')
+    with connect(output_dir) as conn:
+        retention.record_imported_file(conn, os.path.join(output_dir, 'reddit_posts_20200103_000000.json'))
+        conn.execute("UPDATE imported_files SET imported_at = '2020-01-04 00:00:00'")
+
+    files_policy = retention.RetentionPolicy(full_text_days=0, keep_files_days=7, http_cache_days=None,
+                                             vacuum=False)
+    report = retention.apply_retention(output_dir, files_policy)
+    assert report['files']['deleted'] == 7
+    assert sorted(name for name in os.listdir(output_dir) if name.startswith('reddit_')) == [
+        'reddit_comments_20200102_000000.csv', 'reddit_data.db']
@@ -0,0 +1,89 @@
+"""按历史产出分配预算的定时爬取"""
+import glob
+import json
+import os
+
+import pytest
+
+from scheduler import PAGE_SIZE, CrawlScheduler
+
+SUBREDDITS = ['SaaS', 'startups', 'webdev', 'freelance']
+PATTERNS = ['is there a tool', 'pain point', 'struggling with']
+
+
+class FakeScraper:
+    """search_pair 按 yields 返回相关帖子数，save_to_sqlite 只记录调用"""
+
+    def __init__(self, yields=None):
+        self.yields = yields or {}
+        self.searches = []
+        self.saved = 0
+
+    def search_pair(self, subreddit, pattern, limit, time_filter, extracted_at, stats=None):
+        self.searches.append((subreddit, pattern, limit))
+        found = self.yields.get((subreddit, pattern), 0)
+        stats['fetched'] = limit
+        return [{'id': f"{subreddit}-{pattern}-{i}"} for i in range(found)]
+
+    def save_to_sqlite(self, posts, db_path):
+        self.saved += len(posts)
+
+
+def make_scheduler(tmp_path, scraper=None, **kwargs):
+    return CrawlScheduler(scraper or FakeScraper(), SUBREDDITS, PATTERNS, output_dir=str(tmp_path), **kwargs)
+
+
+def test_run_once_writes_metrics_report(tmp_path):
+    scraper = FakeScraper({('SaaS', 'pain point'): 3})
+    scheduler = make_scheduler(tmp_path, scraper, budget=len(SUBREDDITS) * len(PATTERNS), seed=1)
+    assert scheduler.run_once() == 3
+
+    [report_file] = glob.glob(os.path.join(str(tmp_path), 'scheduler_metrics_*.json'))
+    with open(report_file, encoding='utf-8') as f:
+        report = json.load(f)['metrics']
+    assert report['scheduler_runs_total']['values'] == {'': 1.0}
+    pages = sum(limit // PAGE_SIZE for _, _, limit in scraper.searches)
+    assert sum(report['scheduler_pages_total']['values'].values()) == pages
+    assert sum(report['scheduler_pairs_total']['values'].values()) == len(scraper.searches)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('budget, max_pages', [(3, 5), (10, 2), (60, 5), (100, 3)])
+def test_plan_respects_budget_and_max_pages(tmp_path, seed, budget, max_pages):
+    scheduler = make_scheduler(tmp_path, budget=budget, max_pages=max_pages, seed=seed)
+    # 产出差别很大的历史，高产组合的份额会超过 max_pages
+    scheduler.store.record('SaaS', 'pain point', 1, 80, scheduler.decay)
+    scheduler.store.record('webdev', 'struggling with', 5, 1, scheduler.decay)
+
+    plan = scheduler.plan()
+    assert plan
+    assert sum(pages for _, _, pages in plan) <= budget
+    assert all(1 <= pages <= max_pages for _, _, pages in plan)
+    assert len({(subreddit, pattern) for subreddit, pattern, _ in plan}) == len(plan)
+
+
+def test_plan_is_reproducible_with_seed(tmp_path):
+    assert make_scheduler(tmp_path, seed=7).plan() == make_scheduler(tmp_path, seed=7).plan()
+
+
+def test_plan_skips_pairs_after_empty_runs(tmp_path):
+    scheduler = make_scheduler(tmp_path, budget=100, skip_after=2, reprobe_prob=0.0, seed=3)
+    for _ in range(2):
+        scheduler.store.record('SaaS', 'pain point', 1, 0, scheduler.decay)
+    # 只连续一次无产出的组合不跳过
+    scheduler.store.record('webdev', 'pain point', 1, 0, scheduler.decay)
+
+    planned = {(subreddit, pattern) for subreddit, pattern, _ in scheduler.plan()}
+    assert ('SaaS', 'pain point') not in planned
+    assert ('webdev', 'pain point') in planned
+    assert len(planned) == len(SUBREDDITS) * len(PATTERNS) - 1
+
+    # 有产出后重新计数
+    scheduler.store.record('SaaS', 'pain point', 1, 4, scheduler.decay)
+    assert ('SaaS', 'pain point') in {(s, p) for s, p, _ in scheduler.plan()}
+
+
+def test_skipped_pairs_are_reprobed(tmp_path):
+    scheduler = make_scheduler(tmp_path, budget=100, skip_after=1, reprobe_prob=1.0, seed=3)
+    scheduler.store.record('SaaS', 'pain point', 1, 0, scheduler.decay)
+    assert ('SaaS', 'pain point') in {(s, p) for s, p, _ in scheduler.plan()}
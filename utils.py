@@ -4,10 +4,20 @@ import logging
 import json
 from datetime import datetime, timedelta
 
+import comment_stats
+import metrics
+import retention
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+IMPORT_DURATION = metrics.histogram(
+    'import_all_files_seconds', 'import_all_files_to_sqlite 总耗时（秒）')
+ROWS_IMPORTED = metrics.counter(
+    'import_rows_total', '从文件导入的行数', ('table',))
+
+@IMPORT_DURATION.timed()
 def import_all_files_to_sqlite(output_dir="reddit_data"):
     """将目录下所有JSON文件导入SQLite"""
     db_file = f"{output_dir}/reddit_data.db"
@@ -50,10 +60,15 @@ def import_all_files_to_sqlite(output_dir="reddit_data"):
                 FOREIGN KEY (post_id) REFERENCES posts (id)
             )
         ''')
+        comment_stats.ensure_table(conn)
+        retention.ensure_imported_files_table(conn)
         
         # 导入帖子数据
         posts_imported = 0
         for file_path in post_files:
+            # 已导入且之后未修改的文件跳过
+            if retention.is_imported(conn, file_path):
+                continue
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     posts_data = json.load(f)
@@ -77,13 +92,17 @@ def import_all_files_to_sqlite(output_dir="reddit_data"):
                     ))
                     posts_imported += 1
                 
+                retention.record_imported_file(conn, file_path, len(posts_data))
                 logger.info(f"已导入帖子文件: {file_path}")
             except Exception as e:
                 logger.error(f"导入帖子文件 {file_path} 时出错: {e}")
         
         # 导入评论数据
         comments_imported = 0
+        commented_posts = set()
         for file_path in comment_files:
+            if retention.is_imported(conn, file_path):
+                continue
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     comments_data = json.load(f)
@@ -101,13 +120,23 @@ def import_all_files_to_sqlite(output_dir="reddit_data"):
                         comment['score'], comment['created_utc'], comment['author']
                     ))
                     comments_imported += 1
+                    commented_posts.add(comment['post_id'])
                 
+                retention.record_imported_file(conn, file_path, len(comments_data))
                 logger.info(f"已导入评论文件: {file_path}")
             except Exception as e:
                 logger.error(f"导入评论文件 {file_path} 时出错: {e}")
         
+        # 更新导入评论的帖子的评论聚合
+        comment_stats.update_post_stats(conn, commented_posts)
+        
+        # 帖子 JSON 同一次保存写出的 CSV 一并记录为已导入，以便 retention.py 清理
+        retention.backfill_sibling_files(conn)
+        
         conn.commit()
     
+    ROWS_IMPORTED.inc(posts_imported, table='posts')
+    ROWS_IMPORTED.inc(comments_imported, table='comments')
     logger.info(f"导入完成: {posts_imported} 个帖子, {comments_imported} 条评论")
     return posts_imported, comments_imported
 